@@ -0,0 +1,179 @@
+"""
+Offline benchmark / load test for the backend.
+
+Runs the FastAPI app in-process against the fake chat model (no API key or network needed),
+drives each endpoint at several concurrency levels and reports throughput, p50/p95/p99
+latency and memory. Results can be saved as a baseline and compared on later runs.
+
+Usage:
+    python benchmark.py --concurrency 1,8,32 --requests 64 --output benchmark_baseline.json
+    python benchmark.py --compare benchmark_baseline.json
+"""
+import os
+import sys
+import json
+import time
+import asyncio
+import argparse
+import tempfile
+import resource
+
+ENDPOINTS = ["/analyze", "/chatbot", "/recommend_dishes", "/generate_slogan"]
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Offline benchmark for the restaurant analyser backend.")
+    parser.add_argument("--endpoints", default=",".join(ENDPOINTS), help="Comma-separated endpoints to drive.")
+    parser.add_argument("--concurrency", default="1,8,32", help="Comma-separated concurrency levels.")
+    parser.add_argument("--requests", type=int, default=64, help="Requests per endpoint and concurrency level.")
+    parser.add_argument("--latency-ms", type=float, default=200.0, help="Fake LLM median latency.")
+    parser.add_argument("--latency-distribution", default="lognormal", choices=["fixed", "uniform", "lognormal"])
+    parser.add_argument("--latency-jitter", type=float, default=0.3)
+    parser.add_argument("--chunks-per-second", type=float, default=500.0)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--quota-rate", type=float, default=0.0)
+    parser.add_argument("--cached", action="store_true", help="Let /analyze hit the cache instead of the LLM.")
+    parser.add_argument("--seed", type=int, default=1234)
+    parser.add_argument("--output", help="Write results to this JSON file.")
+    parser.add_argument("--compare", help="Compare results with a previous JSON baseline.")
+    parser.add_argument("--threshold", type=float, default=0.2, help="Allowed relative regression (0.2 = 20%%).")
+    return parser.parse_args()
+
+def configure_environment():
+    """Points the app at throwaway storage and lifts local limits before it is imported."""
+    os.environ.setdefault("ANALYSIS_STORE_PATH", os.path.join(tempfile.mkdtemp(), "benchmark_store.db"))
+    os.environ.setdefault("LLM_REQUESTS_PER_MINUTE", "1000000")
+    os.environ.setdefault("LLM_TOKENS_PER_MINUTE", "1000000000")
+    os.environ.setdefault("MAX_CONCURRENT_LLM_CALLS", "1024")
+    os.environ.setdefault("MAX_QUEUED_LLM_CALLS", "4096")
+
+def current_rss_mb() -> float:
+    """Resident memory of this process in MB (falls back to peak RSS off Linux)."""
+    try:
+        with open("/proc/self/statm") as f:
+            pages = int(f.read().split()[1])
+        return pages * os.sysconf("SC_PAGE_SIZE") / (1024 * 1024)
+    except (OSError, ValueError):
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+def percentile(sorted_values: list, pct: float) -> float:
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, max(0, round(pct / 100 * len(sorted_values) + 0.5) - 1))
+    return sorted_values[index]
+
+def build_payload(endpoint: str, index: int, analysis_id: str, cached: bool) -> dict:
+    if endpoint == "/analyze":
+        name = "Benchmark Bistro" if cached else f"Benchmark Bistro {index}"
+        return {"restaurant_name": name, "analysis_type": "Overall Analysis",
+                "restaurant_location": "Hyderabad", "bypass_cache": not cached}
+    if endpoint == "/chatbot":
+        # Phrased so the fast path does not answer it and the LLM is exercised
+        return {"analysis_id": analysis_id, "user_question": "Tell me more about the food here."}
+    return {"analysis_id": analysis_id}
+
+async def run_level(client, endpoint: str, concurrency: int, total: int, analysis_id: str, cached: bool) -> dict:
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies = []
+    errors = 0
+
+    async def one(index: int):
+        nonlocal errors
+        async with semaphore:
+            start = time.perf_counter()
+            response = await client.post(endpoint, json=build_payload(endpoint, index, analysis_id, cached))
+            latencies.append(time.perf_counter() - start)
+            if response.status_code != 200:
+                errors += 1
+
+    wall_start = time.perf_counter()
+    await asyncio.gather(*(one(i) for i in range(total)))
+    wall = time.perf_counter() - wall_start
+    latencies.sort()
+    return {
+        "requests": total,
+        "errors": errors,
+        "throughput_rps": total / wall if wall else 0.0,
+        "p50_ms": percentile(latencies, 50) * 1000,
+        "p95_ms": percentile(latencies, 95) * 1000,
+        "p99_ms": percentile(latencies, 99) * 1000,
+        "rss_mb": current_rss_mb(),
+    }
+
+async def run_benchmark(args) -> dict:
+    import httpx
+    import chains
+    from fake_llm import FakeChatModel
+    from main import app
+
+    chains.set_chat_model_factory(lambda **_: FakeChatModel(
+        latency_ms=args.latency_ms,
+        latency_distribution=args.latency_distribution,
+        latency_jitter=args.latency_jitter,
+        chunks_per_second=args.chunks_per_second,
+        error_rate=args.error_rate,
+        quota_rate=args.quota_rate,
+        seed=args.seed,
+    ))
+
+    endpoints = [e.strip() for e in args.endpoints.split(",") if e.strip()]
+    levels = [int(c) for c in args.concurrency.split(",") if c.strip()]
+    results = {}
+
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://benchmark", timeout=None) as client:
+        seed_response = await client.post("/analyze", json=build_payload("/analyze", -1, "", cached=True))
+        seed_response.raise_for_status()
+        analysis_id = seed_response.json()["analysis_id"]
+
+        for endpoint in endpoints:
+            results[endpoint] = {}
+            for concurrency in levels:
+                stats = await run_level(client, endpoint, concurrency, args.requests, analysis_id, args.cached)
+                results[endpoint][str(concurrency)] = stats
+                print(f"{endpoint:<18} c={concurrency:<4} {stats['throughput_rps']:8.1f} req/s  "
+                      f"p50 {stats['p50_ms']:7.1f} ms  p95 {stats['p95_ms']:7.1f} ms  p99 {stats['p99_ms']:7.1f} ms  "
+                      f"errors {stats['errors']:<3} rss {stats['rss_mb']:.1f} MB")
+    return results
+
+def compare(results: dict, baseline: dict, threshold: float) -> list:
+    """Returns a list of human-readable regressions against the baseline."""
+    regressions = []
+    for endpoint, levels in results.items():
+        for concurrency, stats in levels.items():
+            base = baseline.get("results", {}).get(endpoint, {}).get(concurrency)
+            if not base:
+                continue
+            if stats["p95_ms"] > base["p95_ms"] * (1 + threshold):
+                regressions.append(f"{endpoint} c={concurrency}: p95 {base['p95_ms']:.1f} -> {stats['p95_ms']:.1f} ms")
+            if stats["throughput_rps"] < base["throughput_rps"] * (1 - threshold):
+                regressions.append(f"{endpoint} c={concurrency}: throughput {base['throughput_rps']:.1f} -> {stats['throughput_rps']:.1f} req/s")
+    return regressions
+
+def main():
+    args = parse_args()
+    configure_environment()
+    results = asyncio.run(run_benchmark(args))
+
+    report = {
+        "created_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "config": {key: value for key, value in vars(args).items() if key not in ("output", "compare")},
+        "results": results,
+    }
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"Results written to {args.output}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            regressions = compare(results, json.load(f), args.threshold)
+        if regressions:
+            print("Regressions against baseline:")
+            for line in regressions:
+                print(f"  {line}")
+            sys.exit(1)
+        print("No regressions against baseline.")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,111 @@
+import os
+import time
+import asyncio
+from collections import OrderedDict
+
+# --- In-Memory Analysis Cache ---
+# Sits in front of the analysis chain so popular restaurants are not re-analysed on every
+# request. Entries expire after a TTL, the least recently used entry is evicted once the
+# cache is full, and concurrent requests for the same key share a single in-flight LLM call.
+
+def normalize_key_part(value: str | None) -> str:
+    """Lower-cases and collapses whitespace so 'Pista  House' and 'pista house' match."""
+    if not value:
+        return ""
+    return " ".join(value.lower().split())
+
+def make_analysis_key(restaurant_name: str, restaurant_location: str | None, analysis_type: str) -> tuple:
+    return (
+        normalize_key_part(restaurant_name),
+        normalize_key_part(restaurant_location),
+        normalize_key_part(analysis_type),
+    )
+
+class AnalysisCache:
+    def __init__(self, max_entries: int = 1024, ttl_seconds: float = 3600):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._entries = OrderedDict()  # key -> (expires_at, value)
+        self._in_flight = {}           # key -> asyncio.Task
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+
+    def get(self, key):
+        """Returns the cached value, or None if missing or expired."""
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        expires_at, value = entry
+        if expires_at < time.monotonic():
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return value
+
+    def set(self, key, value):
+        self._entries[key] = (time.monotonic() + self.ttl_seconds, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def record_lookup(self, hit: bool):
+        """Counts a lookup answered outside get_or_compute (e.g. assembled from several entries)."""
+        if hit:
+            self.hits += 1
+        else:
+            self.misses += 1
+
+    def invalidate(self, key):
+        self._entries.pop(key, None)
+
+    def clear(self):
+        self._entries.clear()
+
+    async def get_or_compute(self, key, compute, refresh: bool = False):
+        """
+        Returns the cached value for `key`, or awaits `compute()` to produce it.
+        Identical concurrent calls wait on the same task instead of calling `compute` again.
+        With refresh=True the cached value is ignored and replaced with a fresh one.
+        """
+        if not refresh:
+            value = self.get(key)
+            if value is not None:
+                self.hits += 1
+                return value
+
+        task = self._in_flight.get(key)
+        if task is not None:
+            self.coalesced += 1
+        else:
+            self.misses += 1
+            task = asyncio.ensure_future(self._compute_and_store(key, compute))
+            self._in_flight[key] = task
+        # Shield the shared task so one disconnecting client does not cancel it for the others
+        return await asyncio.shield(task)
+
+    async def _compute_and_store(self, key, compute):
+        try:
+            value = await compute()
+            self.set(key, value)
+            return value
+        finally:
+            self._in_flight.pop(key, None)
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "ttl_seconds": self.ttl_seconds,
+            "hits": self.hits,
+            "misses": self.misses,
+            "coalesced": self.coalesced,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+        }
+
+# Shared cache for parsed /analyze results in this worker
+analysis_cache = AnalysisCache(
+    max_entries=int(os.getenv("ANALYSIS_CACHE_MAX_ENTRIES", "1024")),
+    ttl_seconds=float(os.getenv("ANALYSIS_CACHE_TTL_SECONDS", "3600")),
+)
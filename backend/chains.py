@@ -1,54 +1,228 @@
 import os
 from dotenv import load_dotenv
 import json
-from langchain_core.prompts import PromptTemplate
-from langchain_google_genai import ChatGoogleGenerativeAI
+import asyncio
+import threading
+
+# LangChain and the provider SDKs are imported on first use (see get_chain), so importing
+# this module - and booting a worker - stays fast.
 
 # Import the new, more robust prompts
 from prompts import (
     ANALYSIS_PROMPT,
+    ANALYSIS_FIELD_SCHEMA,
+    ANALYSIS_TYPE_DEFAULT_FIELDS,
+    FIELD_SELECTIVE_ANALYSIS_PROMPT,
+    ANALYSIS_REQUEST_END,
+    MENU_CONTEXT_SECTION,
     CHATBOT_PROMPT,
     DISH_RECOMMENDATION_PROMPT,
     SLOGAN_GENERATION_PROMPT
 )
 
+from limits import is_quota_error, estimate_tokens
+from hedging import hedged_caller, HEDGING_ENABLED, CALL_DEADLINES, DeadlineExceededError
+from metrics import timed_stage, record_llm_usage, record_llm_failure
+
 # Load environment variables from .env file
 load_dotenv()
 
+# Default model used by every chain unless a caller asks for something else
+DEFAULT_MODEL = "gemini-2.5-flash-preview-05-20"
+# Model that slow or failed calls are hedged to; empty means a second call to the same model
+FALLBACK_MODEL = os.getenv("LLM_FALLBACK_MODEL", "")
+
+# --- Chain Registry ---
+# Building a ChatGoogleGenerativeAI client opens a fresh transport (and TLS session)
+# every time, so we build each (prompt, model, temperature, JSON-mode) combination once
+# per worker and reuse it. The client keeps its connection pool alive between calls.
+_chain_registry = {}
+_registry_lock = threading.Lock()
+_registry_api_key = None
+_chain_specs = {}  # id(chain) -> (prompt_template, input_variables, temperature, json_mode)
+
+# Optional replacement for ChatGoogleGenerativeAI (e.g. the fake model used by benchmarks).
+# Called as factory(model=..., temperature=..., json_mode=...) and needs no API key.
+_chat_model_factory = None
+
+def set_chat_model_factory(factory):
+    """
+    Makes every chain use chat models built by `factory` instead of Gemini; pass None to
+    go back to Gemini. Existing chains are dropped so the change applies immediately.
+    """
+    global _chat_model_factory
+    _chat_model_factory = factory
+    reset_chain_registry()
+
+def _fake_chat_model_factory(model=None, **_):
+    from fake_llm import FakeChatModel
+    # The fallback model can be given its own latency and error settings via FAKE_LLM_FALLBACK_*
+    return FakeChatModel.from_env("FAKE_LLM_FALLBACK_" if FALLBACK_MODEL and model == FALLBACK_MODEL else "FAKE_LLM_")
+
+if os.getenv("LLM_PROVIDER", "google").lower() == "fake":
+    _chat_model_factory = _fake_chat_model_factory
+
 def _get_api_key_or_raise():
     """Helper to ensure the API key is loaded."""
     api_key = os.getenv("GOOGLE_API_KEY")
     if not api_key:
         raise ValueError("CRITICAL ERROR: GOOGLE_API_KEY was not found. Please check your .env file.")
-    print(f"API Key: {api_key[:10]}...") # Debug print
     return api_key
 
-def get_restaurant_analysis_chain():
+def reset_chain_registry(reload_env: bool = False):
     """
-    Creates and returns a LangChain chain for restaurant analysis.
-    This now uses the modern LCEL syntax (prompt | llm).
+    Drops every cached client and chain so they are rebuilt on next use.
+    Call this after rotating GOOGLE_API_KEY; pass reload_env=True to re-read the .env file
+    (and with it LLM_FALLBACK_MODEL) first. Workers do this on SIGHUP.
     """
-    api_key = _get_api_key_or_raise()
-    print("Hello from Gemini!") # Debug print
+    global _registry_api_key, FALLBACK_MODEL
+    if reload_env:
+        load_dotenv(override=True)
+        FALLBACK_MODEL = os.getenv("LLM_FALLBACK_MODEL", "")
+    with _registry_lock:
+        _chain_registry.clear()
+        _chain_specs.clear()
+        _registry_api_key = None
 
-    prompt = PromptTemplate(
-        template=ANALYSIS_PROMPT,
-        input_variables=["input", "analysis_type", "restaurant_location_context"]
-    )
+def get_chain(prompt_template: str, input_variables: list, model: str = DEFAULT_MODEL,
+              temperature: float | None = None, json_mode: bool = False):
+    """
+    Returns a cached `prompt | llm` chain for the given combination, building it on first use.
+    If the API key in the environment changed since the registry was filled, it is rebuilt.
+    """
+    global _registry_api_key
+    api_key = None if _chat_model_factory else _get_api_key_or_raise()
+    key = (prompt_template, model, temperature, json_mode)
+
+    with timed_stage("chain_construction"), _registry_lock:
+        if api_key != _registry_api_key:
+            # Key rotation: every existing client holds the old key, so start fresh
+            _chain_registry.clear()
+            _chain_specs.clear()
+            _registry_api_key = api_key
+
+        chain = _chain_registry.get(key)
+        if chain is None:
+            from langchain_core.prompts import PromptTemplate
+            prompt = PromptTemplate(template=prompt_template, input_variables=input_variables)
+            if _chat_model_factory:
+                llm = _chat_model_factory(model=model, temperature=temperature, json_mode=json_mode)
+            else:
+                llm_kwargs = {"model": model, "google_api_key": api_key}
+                if temperature is not None:
+                    llm_kwargs["temperature"] = temperature
+                if json_mode:
+                    # The new Google GenAI library natively supports JSON mode
+                    llm_kwargs["model_kwargs"] = {"response_mime_type": "application/json"}
+                from langchain_google_genai import ChatGoogleGenerativeAI
+                llm = ChatGoogleGenerativeAI(**llm_kwargs)
+            chain = prompt | llm
+            _chain_registry[key] = chain
+            _chain_specs[id(chain)] = (prompt_template, input_variables, temperature, json_mode)
+        return chain
+
+def get_fallback_chain(chain):
+    """Returns the FALLBACK_MODEL version of a registry chain, or the chain itself if there is none."""
+    spec = _chain_specs.get(id(chain))
+    if not FALLBACK_MODEL or spec is None:
+        return chain
+    prompt_template, input_variables, temperature, json_mode = spec
+    return get_chain(prompt_template, input_variables, FALLBACK_MODEL, temperature, json_mode)
+
+def _has_content(response) -> bool:
+    return bool(str(response.content).strip())
+
+async def ainvoke_chain(chain, inputs: dict, kind: str = "analysis"):
+    """
+    Runs a `prompt | llm` chain, timing prompt rendering and the LLM wait separately
+    and counting the tokens the provider reports. The call is bounded by the deadline for
+    `kind` and hedged to the fallback model when it is slow or fails (see hedging.py).
+    """
+    with timed_stage("prompt_render"):
+        prompt_value = chain.first.invoke(inputs)
+    hedge = None
+    if HEDGING_ENABLED:
+        fallback_llm = get_fallback_chain(chain).last
+        hedge = lambda: fallback_llm.ainvoke(prompt_value)
+    with timed_stage("llm_wait"):
+        try:
+            response = await hedged_caller.call(
+                kind,
+                lambda: chain.last.ainvoke(prompt_value),
+                hedge,
+                estimated_tokens=estimate_tokens(prompt_value.to_string()),
+                is_valid=_has_content,
+            )
+        except Exception:
+            record_llm_failure()
+            raise
+    record_llm_usage(response.usage_metadata)
+    return response
+
+async def astream_chain(chain, inputs: dict, kind: str = "analysis"):
+    """
+    Streaming counterpart of ainvoke_chain; yields the LLM's message chunks as they arrive.
+    The stream must finish within the deadline for `kind` (time spent by the consumer between
+    chunks is not counted) or it is closed with DeadlineExceededError. Streams are not hedged.
+    """
+    with timed_stage("prompt_render"):
+        prompt_value = chain.first.invoke(inputs)
+    aggregate = None
+    deadline = CALL_DEADLINES[kind]
+    with timed_stage("llm_wait"):
+        chunks = chain.last.astream(prompt_value)
+        remaining = deadline
+        try:
+            while True:
+                # Bound each wait separately: a timeout spanning the yields below could cancel the consumer instead
+                started = asyncio.get_running_loop().time()
+                try:
+                    async with asyncio.timeout(remaining):
+                        chunk = await anext(chunks)
+                except StopAsyncIteration:
+                    break
+                except TimeoutError:
+                    hedged_caller.count_deadline_exceeded(kind)
+                    raise DeadlineExceededError(f"The AI model did not finish streaming within {deadline:g} seconds.")
+                remaining -= asyncio.get_running_loop().time() - started
+                aggregate = chunk if aggregate is None else aggregate + chunk
+                yield chunk
+        except Exception:
+            record_llm_failure()
+            raise
+        finally:
+            await chunks.aclose()
+    record_llm_usage(getattr(aggregate, "usage_metadata", None))
+
+def build_field_selective_prompt(fields: list) -> str:
+    """Fills FIELD_SELECTIVE_ANALYSIS_PROMPT with the schema for just the given fields."""
+    schema = json.dumps({field: ANALYSIS_FIELD_SCHEMA[field] for field in fields}, indent=2)
+    # Braces in the schema must be doubled so PromptTemplate does not treat them as variables
+    schema = schema.replace("{", "{{").replace("}", "}}")
+    return FIELD_SELECTIVE_ANALYSIS_PROMPT.replace("[[SCHEMA]]", schema)
+
+def get_restaurant_analysis_chain(fields: list | None = None, with_menu: bool = False):
+    """
+    Returns the LangChain chain for restaurant analysis.
+    This uses the modern LCEL syntax (prompt | llm) and is shared across requests.
+    With `fields`, the prompt only asks for those fields, which keeps the output short.
+    With `with_menu`, the prompt also takes the OCR'd menu as `menu_text`.
+    """
+    template = ANALYSIS_PROMPT if fields is None else build_field_selective_prompt(fields)
+    input_variables = ["input", "analysis_type", "restaurant_location_context"]
+    if with_menu:
+        template = template.replace(ANALYSIS_REQUEST_END, MENU_CONTEXT_SECTION + ANALYSIS_REQUEST_END)
+        input_variables.append("menu_text")
     # Using a fast model for analysis to stay within free tier limits
-    json_llm = ChatGoogleGenerativeAI(
-        model="gemini-2.5-flash-preview-05-20",
+    return get_chain(
+        template,
+        input_variables,
         temperature=0.5,
-        google_api_key=api_key,
-        # The new Google GenAI library natively supports JSON mode
-        model_kwargs={"response_mime_type": "application/json"}
+        json_mode=True,
     )
-    # Modern LCEL syntax: pipe the prompt to the language model
-    chain = prompt | json_llm
-    return chain
 
-def _format_analysis_data_for_chatbot(data: dict) -> str:
-    """Internal helper function to format the analysis data into a string for the chatbot context."""
+def format_analysis_data_for_chatbot(data: dict) -> str:
+    """Formats the analysis data into a string for the chatbot context."""
     # This creates a readable summary of the analysis for the chatbot to use.
     formatted_parts = []
     for key, value in data.items():
@@ -65,55 +239,79 @@ def _format_analysis_data_for_chatbot(data: dict) -> str:
     return "\n".join(formatted_parts)
 
 
-def get_chatbot_response(analysis_text_raw: str, user_question: str) -> str:
-    """
-    Generates a contextual response to a user's question based on the analysis.
-    """
-    api_key = _get_api_key_or_raise()
-    print("Hello from Gemini! It's great to connect.") # Debug print
-    
-    # Using a fast and capable model for chat to avoid quota issues
-    llm = ChatGoogleGenerativeAI(model="gemini-2.5-flash-preview-05-20", google_api_key=api_key, temperature=0.7)
+CHATBOT_INPUT_VARIABLES = ["analysis_content", "conversation_history", "question_details", "question"]
+FIRST_QUESTION_HISTORY = "(This is the first question.)"
+NO_QUESTION_DETAILS = "(Nothing beyond the context above.)"
 
-    try:
-        parsed_analysis_data = json.loads(analysis_text_raw)
-        formatted_analysis_content = _format_analysis_data_for_chatbot(parsed_analysis_data)
-    except Exception as e:
-        return f"Error: Failed to process analysis data for the chatbot: {e}"
+class ChatbotError(Exception):
+    """Raised when the chatbot could not answer; `reply` is the apology to show the user instead."""
+    def __init__(self, reply: str):
+        super().__init__(reply)
+        self.reply = reply
 
-    prompt = PromptTemplate(
-        template=CHATBOT_PROMPT,
-        input_variables=["analysis_content", "question"]
-    )
-    chain = prompt | llm
+def _chatbot_error_reply(e: Exception) -> str:
+    """Turns a failed chatbot call into a user-friendly reply."""
+    print(f"Error invoking chatbot chain: {e}")
+    if is_quota_error(e):
+        return "I'm sorry, but I've reached my request limit for the moment. Please try again in a little while."
+    return f"Sorry, I encountered an error trying to answer that: {e}"
+
+async def aget_chatbot_response(analysis_content: str, user_question: str,
+                                conversation_history: str = FIRST_QUESTION_HISTORY,
+                                question_details: str = "") -> str:
+    """
+    Generates a contextual response to a user's question based on the analysis, awaiting
+    the LLM without blocking the event loop. Takes the already formatted analysis context,
+    so it can be built once per analysis session, the rendered conversation so far, and any
+    extra analysis detail for this particular question. Other failures raise ChatbotError
+    carrying a user-friendly reply, so callers can keep it out of the conversation history.
+    """
+    chain = get_chain(CHATBOT_PROMPT, CHATBOT_INPUT_VARIABLES, temperature=0.7)
     try:
-        response = chain.invoke({"analysis_content": formatted_analysis_content, "question": user_question})
+        response = await ainvoke_chain(chain, {
+            "analysis_content": analysis_content,
+            "conversation_history": conversation_history,
+            "question_details": question_details or NO_QUESTION_DETAILS,
+            "question": user_question,
+        }, "chatbot")
         return response.content
     except Exception as e:
-        print(f"Error invoking chatbot chain: {e}")
-        # Provide a more user-friendly error
-        error_message = str(e)
-        if "quota" in error_message.lower():
-            return "I'm sorry, but I've reached my request limit for the moment. Please try again in a little while."
-        return f"Sorry, I encountered an error trying to answer that: {e}"
-
-# The following functions are kept for potential future use
-def get_dish_recommendation(analysis_text_raw: str) -> str:
-    api_key = _get_api_key_or_raise()
-    llm = ChatGoogleGenerativeAI(model="gemini-2.5-flash-preview-05-20", google_api_key=api_key)
-    formatted_content = _format_analysis_data_for_chatbot(json.loads(analysis_text_raw))
-    prompt = PromptTemplate(template=DISH_RECOMMENDATION_PROMPT, input_variables=["analysis_content"])
-    chain = prompt | llm
-    response = chain.invoke({"analysis_content": formatted_content})
+        if is_quota_error(e) or isinstance(e, DeadlineExceededError):
+            # Let the scheduler turn quota errors into a 429 with Retry-After, and the endpoint a deadline into a 504
+            raise
+        raise ChatbotError(_chatbot_error_reply(e)) from e
+
+async def aget_dish_recommendation(analysis_content: str) -> str:
+    chain = get_chain(DISH_RECOMMENDATION_PROMPT, ["analysis_content"])
+    response = await ainvoke_chain(chain, {"analysis_content": analysis_content}, "dish_recommendation")
     return response.content
 
-def get_slogan_generation(analysis_text_raw: str) -> str:
-    api_key = _get_api_key_or_raise()
-    llm = ChatGoogleGenerativeAI(model="gemini-2.5-flash-preview-05-20", google_api_key=api_key)
-    formatted_content = _format_analysis_data_for_chatbot(json.loads(analysis_text_raw))
-    prompt = PromptTemplate(template=SLOGAN_GENERATION_PROMPT, input_variables=["analysis_content"])
-    chain = prompt | llm
-    response = chain.invoke({"analysis_content": formatted_content})
+async def aget_slogan_generation(analysis_content: str) -> str:
+    chain = get_chain(SLOGAN_GENERATION_PROMPT, ["analysis_content"])
+    response = await ainvoke_chain(chain, {"analysis_content": analysis_content}, "slogan")
     return response.content
 
+# --- Warm-up ---
+
+def warm_up_chains() -> int:
+    """
+    Builds every chain the endpoints use (and its fallback-model version) and renders each
+    prompt once, so the first real requests skip imports and client construction.
+    Returns the number of chains built.
+    """
+    chains = [get_restaurant_analysis_chain(), get_restaurant_analysis_chain(with_menu=True)]
+    for fields in sorted({tuple(fields) for fields in ANALYSIS_TYPE_DEFAULT_FIELDS.values()}):
+        chains.append(get_restaurant_analysis_chain(list(fields)))
+    chains.append(get_chain(CHATBOT_PROMPT, CHATBOT_INPUT_VARIABLES, temperature=0.7))
+    chains.append(get_chain(DISH_RECOMMENDATION_PROMPT, ["analysis_content"]))
+    chains.append(get_chain(SLOGAN_GENERATION_PROMPT, ["analysis_content"]))
+    if FALLBACK_MODEL:
+        chains += [get_fallback_chain(chain) for chain in chains]
+    for chain in chains:
+        chain.first.invoke({name: "" for name in chain.first.input_variables})
+    return len(chains)
 
+async def aping_llm():
+    """Sends a one-word request so the provider client opens its pooled connection. Costs one call."""
+    chain = get_chain(CHATBOT_PROMPT, CHATBOT_INPUT_VARIABLES, temperature=0.7)
+    await chain.last.ainvoke("Reply with the single word OK.")
@@ -0,0 +1,121 @@
+"""
+Prompt-size benchmark for the chatbot.
+
+Replays a long conversation about one analysis and reports the prompt tokens sent per turn by:
+  - legacy:      the full title-cased analysis on every turn, with no memory of earlier turns
+  - full_history: the same context plus the whole transcript, i.e. naive multi-turn memory
+  - compact:     the compact, token-budgeted context (the same prefix every turn) with bounded,
+                 summarised history and per-question detail (current)
+Tokens are estimated the same way the scheduler budgets them (about 4 characters per token).
+Also checks that the compact prompt's prefix (instructions + analysis) is identical on every turn,
+so it can be served from a provider-side prefix cache.
+
+Usage:
+    python chatbot_context_benchmark.py [--turns 20]
+"""
+import argparse
+
+from chains import format_analysis_data_for_chatbot, FIRST_QUESTION_HISTORY, NO_QUESTION_DETAILS
+from prompts import CHATBOT_PROMPT
+from limits import estimate_tokens
+from conversation import Conversation
+from sessions import AnalysisSession
+
+QUESTIONS = [
+    "What would you recommend for a family dinner here?",
+    "And is it good for kids?",
+    "Why is the hygiene rating what it is?",
+    "Would it work for a vegetarian friend?",
+    "How does the food quality compare to the price?",
+    "Is the service friendly?",
+    "What should I avoid ordering if I'm watching my weight?",
+    "Can we book a space for a birthday party of 15 people?",
+]
+
+# Real analyses are far wordier than the fake model's canned one; this is a typical one
+ANALYSIS = {
+    "restaurant_name": "Pista House",
+    "summary": ("Pista House is one of Hyderabad's best-known restaurant chains, founded in 1997 and famous across "
+                "the city for its haleem, which is sold by the thousands during Ramadan and was the first haleem "
+                "to receive a Geographical Indication tag. Beyond haleem it serves a broad menu of Hyderabadi "
+                "biryanis, kebabs, Mughlai curries and Irani-cafe style snacks, and its bakery counters are busy "
+                "all day. Branches range from small takeaway outlets to larger family dining halls."),
+    "healthiness_rating": 2.5,
+    "hygiene_rating": 3.5,
+    "price_rating": 2.0,
+    "food_quality": ("Food quality is consistently praised for rich, authentic flavours. The haleem is slow-cooked "
+                     "for hours with wheat, lentils, mutton and ghee and has a smooth, sticky texture; the chicken "
+                     "and mutton biryanis use fragrant long-grain rice and are generously spiced. Kebabs are "
+                     "tender, though some reviewers find curries oily and heavy. Ingredients are fresh at busy "
+                     "branches, while quieter outlets occasionally get complaints about reheated dishes."),
+    "dietary_options": {
+        "vegetarian": "Yes, a limited selection: paneer curries, veg biryani, dal and bakery items.",
+        "vegan": "No, almost every dish uses ghee, cream or yoghurt and staff cannot reliably adapt them.",
+        "gluten_free": "Partly; rice dishes and kebabs are naturally gluten free, but haleem and breads are not.",
+    },
+    "ambiance": ("Lively and often crowded, with functional decor: bright lighting, simple tables and an open "
+                 "bakery counter. Larger branches have air-conditioned family sections; smaller outlets are "
+                 "mainly for takeaway."),
+    "private_space_for_parties": "Yes, several larger branches have banquet halls for 20 to 100 guests that can be booked in advance.",
+    "popular_dishes": ["Haleem", "Chicken Dum Biryani", "Mutton Biryani", "Double Ka Meetha", "Osmania Biscuits"],
+    "service_experience": ("Service is fast and efficient rather than attentive; staff are used to high volumes and "
+                           "tables turn over quickly. At peak times orders can be mixed up and it can be hard to "
+                           "get a waiter's attention."),
+    "service_time": "Fast",
+    "portion_quantity": "Generous; a single biryani usually serves two light eaters.",
+    "rush_hours": "Weekday evenings from 7 to 10 pm, weekend lunch, and all evening during Ramadan.",
+}
+
+# A typical reply length for the fake transcript
+ANSWER = ("Based on the analysis, the chicken biryani and haleem are the standouts, the portions are "
+          "generous and service is quick, though it gets crowded on weekend evenings.")
+
+def prompt_tokens(analysis_content: str, history: str, question: str, details: str = "") -> int:
+    prompt = CHATBOT_PROMPT.format(analysis_content=analysis_content, conversation_history=history,
+                                   question_details=details or NO_QUESTION_DETAILS, question=question)
+    return estimate_tokens(prompt)
+
+def main():
+    parser = argparse.ArgumentParser(description="Chatbot prompt tokens per turn over a long conversation.")
+    parser.add_argument("--turns", type=int, default=20, help="Questions in the conversation.")
+    args = parser.parse_args()
+
+    analysis = ANALYSIS
+    legacy_context = format_analysis_data_for_chatbot(analysis)
+    session = AnalysisSession("benchmark", analysis, expires_at=0)
+    static_prefix = CHATBOT_PROMPT.split("{conversation_history}")[0]
+    conversation = Conversation("benchmark", "benchmark")
+    transcript = []
+    totals = {"legacy": 0, "full_history": 0, "compact": 0}
+    prefixes = set()
+
+    print(f"{'turn':>4} {'legacy':>8} {'full_history':>13} {'compact':>8}")
+    for turn in range(args.turns):
+        question = QUESTIONS[turn % len(QUESTIONS)]
+        compact_context = session.chatbot_context()
+        details = session.chatbot_details(f"{conversation.last_question()} {question}")
+        prefixes.add(static_prefix.format(analysis_content=compact_context))
+        tokens = {
+            "legacy": prompt_tokens(legacy_context, FIRST_QUESTION_HISTORY, question),
+            "full_history": prompt_tokens(legacy_context, "\n\n".join(transcript) or FIRST_QUESTION_HISTORY, question),
+            "compact": prompt_tokens(compact_context, conversation.render(), question, details),
+        }
+        for name, value in tokens.items():
+            totals[name] += value
+        print(f"{turn + 1:>4} {tokens['legacy']:>8} {tokens['full_history']:>13} {tokens['compact']:>8}")
+        transcript.append(f"User: {question}\nAssistant: {ANSWER}")
+        conversation.add_turn(question, ANSWER)
+
+    print(f"\nMean prompt tokens per turn over {args.turns} turns:")
+    for name, total in totals.items():
+        print(f"  {name:<13} {total / args.turns:8.0f}")
+    print(f"Compact vs full history: {totals['compact'] / totals['full_history'] - 1:+.0%} prompt tokens")
+    print(f"Compact vs legacy (which had no memory): {totals['compact'] / totals['legacy'] - 1:+.0%} prompt tokens")
+    prefix_tokens = estimate_tokens(next(iter(prefixes)))
+    print(f"Compact static prefix: {prefix_tokens} tokens, {len(prefixes)} distinct over {args.turns} turns; "
+          f"{totals['compact'] / args.turns - prefix_tokens:.0f} tokens per turn after it")
+    if len(prefixes) != 1:
+        raise SystemExit("FAIL: the compact prompt prefix changed between turns")
+
+if __name__ == "__main__":
+    main()
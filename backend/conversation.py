@@ -0,0 +1,209 @@
+import os
+import re
+import time
+import asyncio
+import uuid
+from collections import OrderedDict
+
+from prompts import ANALYSIS_FIELD_SCHEMA
+from fastpath import INTENTS
+from limits import estimate_tokens
+from store import analysis_store
+from chains import FIRST_QUESTION_HISTORY
+
+# --- Chatbot Context and Conversations ---
+# The chatbot prompt is laid out as a static prefix (instructions + analysis context) followed by
+# the conversation, any question-specific detail and the question. The analysis is rendered
+# compactly and, when it does not fit CHATBOT_CONTEXT_TOKEN_BUDGET, trimmed once per session by a
+# fixed field priority, never by the question, so the prefix stays byte-identical across turns
+# (rendered once per session here, and eligible for provider-side prefix caching). Fields the
+# question is about but the trimmed context shortened or left out are added in full after the
+# history, within CHATBOT_DETAIL_TOKEN_BUDGET.
+# Conversations keep the last few turns verbatim and fold older ones into a short extractive
+# summary, so the history stays under CHATBOT_HISTORY_TOKEN_BUDGET however long the session runs.
+
+CHATBOT_CONTEXT_TOKEN_BUDGET = int(os.getenv("CHATBOT_CONTEXT_TOKEN_BUDGET", "400"))
+CHATBOT_DETAIL_TOKEN_BUDGET = int(os.getenv("CHATBOT_DETAIL_TOKEN_BUDGET", "150"))
+CHATBOT_HISTORY_TOKEN_BUDGET = int(os.getenv("CHATBOT_HISTORY_TOKEN_BUDGET", "250"))
+CHATBOT_HISTORY_TURNS = int(os.getenv("CHATBOT_HISTORY_TURNS", "3"))  # Turns kept verbatim
+
+# Short labels for the compact context
+_FIELD_LABELS = {
+    "restaurant_name": "name",
+    "healthiness_rating": "healthiness",
+    "hygiene_rating": "hygiene",
+    "price_rating": "price (5=very expensive)",
+    "dietary_options": "diet",
+    "private_space_for_parties": "party space",
+    "popular_dishes": "popular dishes",
+    "service_experience": "service",
+    "portion_quantity": "portions",
+}
+
+# Fields that are kept first when the context has to be trimmed
+_FIELD_PRIORITY = [
+    "restaurant_name", "summary", "healthiness_rating", "hygiene_rating", "price_rating",
+    "popular_dishes", "dietary_options", "food_quality", "service_experience", "service_time",
+    "ambiance", "portion_quantity", "rush_hours", "private_space_for_parties",
+]
+
+# Fields the question is not about are shortened to their first sentence, at most this long
+_BRIEF_MAX_CHARS = 120
+
+# Which fields a question is about: the fast-path intents, plus fields only the LLM answers from
+_FIELD_PATTERNS = {}
+for _, pattern, path, _ in INTENTS:
+    _FIELD_PATTERNS.setdefault(path[0], []).append(pattern)
+_FIELD_PATTERNS["food_quality"] = [r"\bfood\b|\btast|quality|ingredient|\bmenu\b|\beat\b|\bdish"]
+_FIELD_PATTERNS["service_experience"] = [r"\bservice|\bstaff|waiter|friendly|\brude"]
+_FIELD_PATTERNS["popular_dishes"].append(r"\border\b|recommend|\bdish|\btry\b")
+_FIELD_PATTERNS = {field: re.compile("|".join(patterns)) for field, patterns in _FIELD_PATTERNS.items()}
+
+def relevant_fields(text: str) -> list:
+    """Returns the analysis fields a question (or recent conversation) refers to."""
+    text = text.lower()
+    return [field for field, pattern in _FIELD_PATTERNS.items() if pattern.search(text)]
+
+def _first_sentence(text: str, max_chars: int) -> str:
+    sentence = re.split(r"(?<=[.!?])\s", text.strip(), maxsplit=1)[0]
+    return sentence if len(sentence) <= max_chars else sentence[:max_chars].rstrip() + "..."
+
+def _compact_value(value, brief: bool = False) -> str:
+    if isinstance(value, dict):
+        return "; ".join(f"{key.replace('_', '-')}: {_compact_value(item, brief)}" for key, item in value.items())
+    if isinstance(value, list):
+        return ", ".join(str(item) for item in (value[:3] if brief else value))
+    if isinstance(value, float):
+        return f"{value:g}/5"  # Ratings are numbers out of 5
+    return _first_sentence(str(value), _BRIEF_MAX_CHARS) if brief else str(value)
+
+def _compact_line(field: str, value, brief: bool = False) -> str:
+    return f"{_FIELD_LABELS.get(field, field.replace('_', ' '))}: {_compact_value(value, brief)}"
+
+def _line_cost(analysis: dict, field: str, brief: bool = False) -> int:
+    return estimate_tokens(_compact_line(field, analysis[field], brief)) + 1
+
+def select_context_fields(analysis: dict, token_budget: int = CHATBOT_CONTEXT_TOKEN_BUDGET) -> tuple:
+    """
+    Picks how to show each field in the static context, as (field, brief) pairs in schema order.
+    Everything is shown in full if it fits the budget. Otherwise fields are shortened to a first
+    sentence and added by priority while the budget lasts, then lengthened back to full text in
+    the same order while it still lasts. Independent of any question, so it is chosen once per session.
+    """
+    present = [field for field in ANALYSIS_FIELD_SCHEMA if analysis.get(field) not in (None, "", [], {})]
+    full_costs = {field: _line_cost(analysis, field) for field in present}
+    if sum(full_costs.values()) <= token_budget:
+        return tuple((field, False) for field in present)
+    brief_costs = {field: _line_cost(analysis, field, brief=True) for field in present}
+
+    order = [field for field in _FIELD_PRIORITY if field in full_costs]
+    order += [field for field in present if field not in order]
+    chosen = {}
+    used = 0
+    for field in order:
+        if used + brief_costs[field] <= token_budget:
+            chosen[field] = True
+            used += brief_costs[field]
+    for field in order:
+        extra = full_costs[field] - brief_costs[field]
+        if field in chosen and used + extra <= token_budget:
+            chosen[field] = False
+            used += extra
+    return tuple((field, chosen[field]) for field in present if field in chosen)
+
+def question_details(analysis: dict, fields: tuple, question: str, token_budget: int = CHATBOT_DETAIL_TOKEN_BUDGET) -> str:
+    """
+    Renders, in full, the fields a question refers to that the static context (`fields`) shortened
+    or left out, while the budget lasts. Returns "" when the static context already covers them.
+    """
+    shown_in_full = {field for field, brief in fields if not brief}
+    lines = []
+    used = 0
+    for field in relevant_fields(question):
+        if field in shown_in_full or analysis.get(field) in (None, "", [], {}):
+            continue
+        cost = _line_cost(analysis, field)
+        if used + cost <= token_budget:
+            lines.append(_compact_line(field, analysis[field]))
+            used += cost
+    return "\n".join(lines)
+
+def render_context(analysis: dict, fields: tuple) -> str:
+    """Renders the chosen (field, brief) pairs one per line, e.g. 'hygiene: 4/5'."""
+    return "\n".join(_compact_line(field, analysis[field], brief) for field, brief in fields)
+
+class Conversation:
+    def __init__(self, conversation_id: str, analysis_id: str, summary: list | None = None,
+                 turns: list | None = None, version: int = 0):
+        self.conversation_id = conversation_id
+        self.analysis_id = analysis_id
+        self.summary = summary or []  # One short line per turn folded out of `turns`
+        self.turns = turns or []      # [question, answer] pairs kept verbatim
+        self.version = version        # Turns added so far, to tell which of two copies is newer
+
+    def add_turn(self, question: str, answer: str):
+        self.turns.append([question, answer])
+        self.version += 1
+        while len(self.turns) > CHATBOT_HISTORY_TURNS or (
+                len(self.turns) > 1 and estimate_tokens(self.render()) > CHATBOT_HISTORY_TOKEN_BUDGET):
+            old_question, old_answer = self.turns.pop(0)
+            self.summary.append(f"- Asked: {_first_sentence(old_question, 100)} Answered: {_first_sentence(old_answer, 120)}")
+        # The summary itself is bounded too: the oldest points go first
+        while self.summary and estimate_tokens(self.render()) > CHATBOT_HISTORY_TOKEN_BUDGET:
+            self.summary.pop(0)
+
+    def last_question(self) -> str:
+        return self.turns[-1][0] if self.turns else ""
+
+    def render(self) -> str:
+        parts = []
+        if self.summary:
+            parts.append("Earlier in this conversation:\n" + "\n".join(self.summary))
+        for question, answer in self.turns:
+            parts.append(f"User: {question}\nAssistant: {answer}")
+        return "\n\n".join(parts) if parts else FIRST_QUESTION_HISTORY
+
+    def to_dict(self) -> dict:
+        return {"analysis_id": self.analysis_id, "summary": self.summary, "turns": self.turns, "version": self.version}
+
+class ConversationStore:
+    def __init__(self, max_conversations: int = 4096, ttl_seconds: float = 6 * 3600):
+        self.max_conversations = max_conversations
+        self.ttl_seconds = ttl_seconds
+        self._conversations = OrderedDict()  # conversation_id -> (expires_at, Conversation)
+
+    async def get_or_create(self, conversation_id: str | None, analysis_id: str) -> Conversation:
+        """
+        Resumes a conversation from the shared store or this worker, whichever copy is newer:
+        with several workers, the previous turn may have been answered by another one. Unknown
+        or expired ids, and conversations about a different analysis, start afresh (keeping a given id).
+        """
+        conversation = None
+        if conversation_id:
+            entry = self._conversations.get(conversation_id)
+            if entry is not None and entry[0] > time.time():
+                conversation = entry[1]
+            stored = await asyncio.to_thread(analysis_store.get_conversation, conversation_id)
+            if stored is not None and (conversation is None or stored.get("version", 0) >= conversation.version):
+                conversation = Conversation(conversation_id, stored["analysis_id"], stored["summary"],
+                                            stored["turns"], stored.get("version", 0))
+        if conversation is None or conversation.analysis_id != analysis_id:
+            conversation = Conversation(conversation_id or uuid.uuid4().hex, analysis_id)
+        return conversation
+
+    async def save(self, conversation: Conversation):
+        expires_at = time.time() + self.ttl_seconds
+        self._conversations[conversation.conversation_id] = (expires_at, conversation)
+        self._conversations.move_to_end(conversation.conversation_id)
+        while len(self._conversations) > self.max_conversations:
+            self._conversations.popitem(last=False)
+        await asyncio.to_thread(analysis_store.put_conversation, conversation.conversation_id, conversation.to_dict(), expires_at)
+
+    def __len__(self) -> int:
+        return len(self._conversations)
+
+# Shared conversation map for this worker
+chatbot_conversations = ConversationStore(
+    max_conversations=int(os.getenv("CHATBOT_CONVERSATION_MAX_ENTRIES", "4096")),
+    ttl_seconds=float(os.getenv("CHATBOT_CONVERSATION_TTL_SECONDS", str(6 * 3600))),
+)
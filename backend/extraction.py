@@ -0,0 +1,301 @@
+import re
+import json
+
+from pydantic import BaseModel, ConfigDict, ValidationError, field_validator
+
+from prompts import ANALYSIS_FIELD_SCHEMA
+
+try:
+    # orjson parses several times faster than the standard library; fall back if it is missing
+    import orjson
+
+    def _loads(text: str):
+        return orjson.loads(text)
+except ImportError:
+    _loads = json.loads
+
+# --- Robust JSON Extraction ---
+# The model is asked for a bare JSON object, but sometimes wraps it in a ```json fence, adds prose
+# around it, uses single quotes or trailing commas, or gets cut off mid-object. Rather than failing
+# (and making the client pay for a whole new generation), we find the outermost object, repair the
+# common defects, parse it, and validate it against a typed model of the ANALYSIS_PROMPT schema.
+
+class ExtractionError(ValueError):
+    """Raised when no JSON object can be recovered from the model output."""
+    pass
+
+_FENCE_PATTERN = re.compile(r"```(?:json|JSON)?")
+_RATING_FRACTION_PATTERN = re.compile(r"(\d+(?:\.\d+)?)\s*(?:/|out of)\s*(\d+(?:\.\d+)?)", re.IGNORECASE)
+_NUMBER_PATTERN = re.compile(r"\d+(?:\.\d+)?")
+_PYTHON_LITERALS = {"True": "true", "False": "false", "None": "null"}
+_CLOSERS = {"{": "}", "[": "]"}
+# How many cut points to try, from the end backwards, when recovering a truncated object
+_MAX_TRUNCATION_RETRIES = 8
+
+def _find_object(text: str) -> tuple:
+    """
+    Returns (candidate, complete): the outermost {...} in the text, or everything from the first
+    '{' onwards if the object never closes (truncated output).
+    """
+    start = text.find("{")
+    if start == -1:
+        raise ExtractionError("No JSON object found in the AI response.")
+    depth = 0
+    quote = None
+    escape = False
+    for i in range(start, len(text)):
+        char = text[i]
+        if quote:
+            if escape:
+                escape = False
+            elif char == "\\":
+                escape = True
+            elif char == quote:
+                quote = None
+        elif char in "\"'":
+            quote = char
+        elif char in "{[":
+            depth += 1
+        elif char in "}]":
+            depth -= 1
+            if depth == 0:
+                return text[start:i + 1], True
+    return text[start:], False
+
+def _repair(candidate: str) -> tuple:
+    """
+    Rewrites common defects in one pass: single-quoted strings, smart quotes, unquoted keys,
+    Python literals, comments, raw newlines inside strings and trailing commas.
+    Returns (text, open_brackets, cut_points) where cut_points are (offset, open brackets) at
+    each comma, for recovering a truncated object.
+    """
+    out = []
+    stack = []
+    cut_points = []
+    quote = None
+    escape = False
+    i = 0
+    length = len(candidate)
+    while i < length:
+        char = candidate[i]
+        if quote:
+            if escape:
+                escape = False
+                if char == "'":
+                    # \' is not a valid JSON escape; a plain apostrophe is
+                    out[-1] = "'"
+                else:
+                    out.append(char)
+            elif char == "\\":
+                escape = True
+                out.append(char)
+            elif char == quote or (quote == "”" and char == "“"):
+                quote = None
+                out.append('"')
+            elif char == '"':
+                # A double quote inside a single-quoted string must be escaped in JSON
+                out.append('\\"')
+            elif char == "\n":
+                out.append("\\n")
+            elif char == "\r":
+                pass
+            else:
+                out.append(char)
+            i += 1
+            continue
+
+        if char == '"' or char == "'":
+            quote = char
+            out.append('"')
+        elif char == "“":
+            quote = "”"
+            out.append('"')
+        elif char in "{[":
+            stack.append(char)
+            out.append(char)
+        elif char in "}]":
+            # Drop a trailing comma before the closing bracket
+            while out and out[-1].isspace():
+                out.pop()
+            if out and out[-1] == ",":
+                out.pop()
+            if stack:
+                stack.pop()
+            out.append(char)
+        elif char == ",":
+            cut_points.append((len(out), list(stack)))
+            out.append(char)
+        elif char == "/" and candidate.startswith("//", i):
+            newline = candidate.find("\n", i)
+            i = length if newline == -1 else newline
+            continue
+        elif char == "/" and candidate.startswith("/*", i):
+            end = candidate.find("*/", i + 2)
+            i = length if end == -1 else end + 2
+            continue
+        elif char.isalpha():
+            # \w, not [A-Za-z], so non-ASCII letters (isalpha() is true for "é") always match
+            match = re.match(r"\w+", candidate[i:])
+            word = match.group(0)
+            i += len(word)
+            if candidate[i:].lstrip().startswith(":"):
+                # Unquoted key
+                out.append(f'"{word}"')
+            else:
+                out.append(_PYTHON_LITERALS.get(word, word))
+            continue
+        else:
+            out.append(char)
+        i += 1
+
+    if quote:
+        # Truncated inside a string: close it so the value survives
+        out.append('"')
+    return "".join(out), stack, cut_points
+
+def _close(text: str, stack: list) -> str:
+    text = text.rstrip()
+    if text.endswith(","):
+        text = text[:-1]
+    if text.endswith(":"):
+        text += " null"
+    return text + "".join(_CLOSERS[bracket] for bracket in reversed(stack))
+
+def parse_json_object(text: str) -> dict:
+    """
+    Extracts the outermost JSON object from LLM output, repairing it if needed.
+    Raises ExtractionError if nothing usable can be recovered.
+    """
+    candidate, _ = _find_object(_FENCE_PATTERN.sub("", text))
+    try:
+        parsed = _loads(candidate)
+        if isinstance(parsed, dict):
+            return parsed
+    except ValueError:
+        pass
+
+    repaired, stack, cut_points = _repair(candidate)
+    attempts = [_close(repaired, stack)]
+    # If the object was cut off, drop the partial last entry by cutting at an earlier comma
+    for offset, open_brackets in reversed(cut_points[-_MAX_TRUNCATION_RETRIES:]):
+        attempts.append(_close(repaired[:offset], open_brackets))
+    for attempt in attempts:
+        try:
+            parsed = _loads(attempt)
+        except ValueError:
+            continue
+        if isinstance(parsed, dict):
+            return parsed
+    raise ExtractionError("The AI response could not be repaired into a JSON object.")
+
+# --- Typed Analysis Model ---
+
+def normalize_rating(value) -> float | None:
+    """Turns ratings like '4/5', '8 out of 10', '4.5' or 4 into a number on a 0-5 scale."""
+    if value is None or isinstance(value, bool):
+        return None
+    if isinstance(value, (int, float)):
+        rating = float(value)
+    else:
+        text = str(value)
+        match = _RATING_FRACTION_PATTERN.search(text)
+        if match and float(match.group(2)) > 0:
+            rating = float(match.group(1)) / float(match.group(2)) * 5
+        else:
+            match = _NUMBER_PATTERN.search(text)
+            if not match:
+                return None
+            rating = float(match.group(0))
+    return round(min(max(rating, 0.0), 5.0), 1)
+
+def _to_text(value) -> str | None:
+    if value is None:
+        return None
+    if isinstance(value, (dict, list)):
+        return json.dumps(value)
+    return str(value)
+
+class DietaryOptions(BaseModel):
+    model_config = ConfigDict(extra="allow")
+
+    vegetarian: str | None = None
+    vegan: str | None = None
+    gluten_free: str | None = None
+
+    @field_validator("vegetarian", "vegan", "gluten_free", mode="before")
+    @classmethod
+    def _text(cls, value):
+        return _to_text(value)
+
+class RestaurantAnalysis(BaseModel):
+    """Typed view of the ANALYSIS_PROMPT schema. Every field is optional so partial output validates."""
+    model_config = ConfigDict(extra="ignore")
+
+    restaurant_name: str | None = None
+    summary: str | None = None
+    healthiness_rating: float | None = None
+    hygiene_rating: float | None = None
+    price_rating: float | None = None
+    food_quality: str | None = None
+    dietary_options: DietaryOptions | None = None
+    ambiance: str | None = None
+    private_space_for_parties: str | None = None
+    popular_dishes: list[str] | None = None
+    service_experience: str | None = None
+    service_time: str | None = None
+    portion_quantity: str | None = None
+    rush_hours: str | None = None
+
+    @field_validator("healthiness_rating", "hygiene_rating", "price_rating", mode="before")
+    @classmethod
+    def _rating(cls, value):
+        return normalize_rating(value)
+
+    @field_validator("popular_dishes", mode="before")
+    @classmethod
+    def _dishes(cls, value):
+        if value is None:
+            return None
+        if isinstance(value, str):
+            return [dish.strip() for dish in value.split(",") if dish.strip()]
+        if not isinstance(value, list):
+            value = [value]  # A single dish given as a number or object
+        return [_to_text(dish) for dish in value if dish is not None]
+
+    @field_validator("restaurant_name", "summary", "food_quality", "ambiance", "private_space_for_parties",
+                     "service_experience", "service_time", "portion_quantity", "rush_hours", mode="before")
+    @classmethod
+    def _text(cls, value):
+        return _to_text(value)
+
+    @field_validator("dietary_options", mode="before")
+    @classmethod
+    def _dietary(cls, value):
+        return value if isinstance(value, dict) or value is None else None
+
+def validate_analysis(data: dict, fields: list | None = None) -> tuple:
+    """
+    Validates and normalises the requested fields (all schema fields if None).
+    Returns (analysis, missing_fields): fields the model left out are not in `analysis`.
+    Raises ExtractionError if a value cannot be coerced to the schema.
+    """
+    wanted = list(ANALYSIS_FIELD_SCHEMA) if fields is None else fields
+    present = [field for field in wanted if field in data]
+    try:
+        model = RestaurantAnalysis.model_validate({field: data[field] for field in present})
+    except (ValidationError, TypeError) as e:
+        raise ExtractionError(f"Analysis does not match the schema: {e}") from e
+    analysis = model.model_dump(include=set(present), exclude_none=False)
+    ordered = {field: analysis[field] for field in present}
+    return ordered, [field for field in wanted if field not in data]
+
+def normalize_field(field: str, value):
+    """Normalises a single streamed field the same way validate_analysis would."""
+    if field not in ANALYSIS_FIELD_SCHEMA:
+        return value
+    analysis, _ = validate_analysis({field: value}, [field])
+    return analysis[field]
+
+def extract_analysis(text: str, fields: list | None = None) -> tuple:
+    """Full pipeline: locate, repair, parse and validate. Returns (analysis, missing_fields)."""
+    return validate_analysis(parse_json_object(text), fields)
@@ -0,0 +1,104 @@
+"""
+Corpus check and benchmark for the JSON extraction pipeline.
+
+Builds a corpus of malformed model outputs (fences, surrounding prose, single quotes, trailing
+commas, comments, truncation, ...) from a canned analysis, then reports for each kind of defect
+how often the pipeline recovers a valid object, how many fields survive, and how long parsing
+takes, next to the old "strip the fence and json.loads" approach.
+
+Usage:
+    python extraction_benchmark.py [--repeat 200] [--min-recovery 0.95]
+Exits non-zero if the overall recovery rate falls below --min-recovery.
+"""
+import re
+import sys
+import json
+import time
+import argparse
+
+from extraction import extract_analysis, ExtractionError
+from fake_llm import canned_analysis
+
+def build_corpus() -> list:
+    """Returns (category, text) pairs of model outputs with typical defects."""
+    analysis = canned_analysis("Pista House")
+    analysis["summary"] = "Pista House's biryani is famous; it's a Hyderabad institution."
+    clean = json.dumps(analysis, indent=2)
+    corpus = [
+        ("clean", clean),
+        ("fenced", f"```json\n{clean}\n```"),
+        ("leading_prose", f"Here is the analysis you asked for:\n{clean}"),
+        ("trailing_prose", f"{clean}\n\nLet me know if you need anything else!"),
+        ("fenced_with_prose", f"Sure!\n```json\n{clean}\n```\nHope this helps."),
+        ("single_quotes", str(analysis)),
+        ("trailing_commas", re.sub(r"(\"|\])\n(\s*)([}\]])", r"\1,\n\2\3", clean)),
+        ("python_literals", str({**analysis, "private_space_for_parties": None})),
+        ("comments", clean.replace('"ambiance"', '// ambiance is subjective\n  "ambiance"')),
+        ("unquoted_keys", re.sub(r'\n(\s*)"(\w+)":', r"\n\1\2:", clean)),
+        ("raw_newlines", clean.replace("biryani is famous;", "biryani is famous;\nand")),
+        ("smart_quotes", clean.replace('"summary"', "“summary”")),
+        ("null_dish", json.dumps({**analysis, "popular_dishes": ["Chicken Biryani", None]})),
+        ("scalar_dishes", json.dumps({**analysis, "popular_dishes": 5})),
+    ]
+    # Truncated output, cut at several points through the object
+    for percent in (50, 60, 70, 80, 90, 95, 99):
+        corpus.append((f"truncated_{percent}", clean[:len(clean) * percent // 100]))
+    corpus.append(("truncated_fenced", f"```json\n{clean[:len(clean) * 3 // 4]}"))
+    corpus.append(("no_json", "I'm sorry, I couldn't find information about that restaurant."))
+    return corpus
+
+def legacy_parse(text: str) -> dict:
+    """The original clean_json_response + json.loads approach, for comparison."""
+    match = re.search(r'```json\s*([\s\S]*?)\s*```', text)
+    return json.loads(match.group(1).strip() if match else text.strip())
+
+def main():
+    parser = argparse.ArgumentParser(description="Recovery rate and speed of the JSON extraction pipeline.")
+    parser.add_argument("--repeat", type=int, default=200, help="Parses per corpus entry when timing.")
+    parser.add_argument("--min-recovery", type=float, default=0.95, help="Minimum acceptable recovery rate.")
+    args = parser.parse_args()
+
+    corpus = build_corpus()
+    expected_fields = len(canned_analysis(""))
+    # The no_json entry is unrecoverable by design and excluded from the rate
+    recoverable = [(category, text) for category, text in corpus if category != "no_json"]
+
+    recovered = 0
+    legacy_recovered = 0
+    print(f"{'category':<20} {'ok':<4} {'fields':<8} {'legacy':<7} {'parse us':>9}")
+    for category, text in corpus:
+        try:
+            analysis, missing_fields = extract_analysis(text)
+            ok = True
+            fields = f"{len(analysis)}/{expected_fields}"
+        except ExtractionError:
+            ok = False
+            fields = "-"
+        try:
+            legacy_parse(text)
+            legacy_ok = True
+        except ValueError:
+            legacy_ok = False
+
+        start = time.perf_counter()
+        for _ in range(args.repeat):
+            try:
+                extract_analysis(text)
+            except ExtractionError:
+                pass
+        micros = (time.perf_counter() - start) / args.repeat * 1e6
+
+        if category != "no_json":
+            recovered += ok
+            legacy_recovered += legacy_ok
+        print(f"{category:<20} {'yes' if ok else 'no':<4} {fields:<8} {'yes' if legacy_ok else 'no':<7} {micros:9.1f}")
+
+    rate = recovered / len(recoverable)
+    legacy_rate = legacy_recovered / len(recoverable)
+    print(f"\nRecovery rate: {rate:.1%} (legacy parser: {legacy_rate:.1%}) over {len(recoverable)} malformed/clean outputs")
+    if rate < args.min_recovery:
+        print(f"Recovery rate is below the required {args.min_recovery:.0%}.")
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
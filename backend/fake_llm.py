@@ -0,0 +1,211 @@
+import os
+import re
+import json
+import time
+import random
+import asyncio
+from typing import Any
+
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+
+# --- Fake Chat Model ---
+# A drop-in stand-in for ChatGoogleGenerativeAI used for benchmarks and offline testing.
+# It needs no API key or network, answers each of our prompts with plausible canned output
+# (ANALYSIS_PROMPT gets schema-shaped JSON), and can simulate provider latency, streaming
+# speed, random failures and quota errors - either at a fixed rate or by enforcing its own
+# requests/tokens-per-minute limits.
+
+class FakeQuotaError(Exception):
+    """Mimics the provider's quota exhaustion error."""
+    pass
+
+class FakeProviderLimits:
+    """
+    Provider-side RPM/TPM limits, replenished continuously like the real provider's quota.
+    One instance is shared by every fake model that draws on the same quota. Zero disables a
+    limit. The clock is injectable so tests can run in simulated time.
+    """
+    def __init__(self, requests_per_minute: float = 0.0, tokens_per_minute: float = 0.0, clock=time.monotonic):
+        self.requests_per_minute = requests_per_minute
+        self.tokens_per_minute = tokens_per_minute
+        self._clock = clock
+        self._requests = requests_per_minute
+        self._tokens = tokens_per_minute
+        self._updated = clock()
+        self.accepted = 0
+        self.rejected = 0
+
+    def admit(self, tokens: int):
+        """Counts a call against the limits, raising FakeQuotaError if it would exceed them."""
+        now = self._clock()
+        elapsed = now - self._updated
+        self._updated = now
+        self._requests = min(self.requests_per_minute, self._requests + elapsed * self.requests_per_minute / 60)
+        self._tokens = min(self.tokens_per_minute, self._tokens + elapsed * self.tokens_per_minute / 60)
+        if (self.requests_per_minute and self._requests < 1) or (self.tokens_per_minute and self._tokens < tokens):
+            self.rejected += 1
+            raise FakeQuotaError("429 Resource has been exhausted (e.g. check quota).")
+        self._requests -= 1
+        self._tokens -= tokens
+        self.accepted += 1
+
+# Limits built from the environment, per prefix, so all chains share one quota like real API keys do
+_env_limits = {}
+
+def canned_analysis(restaurant_name: str) -> dict:
+    """Returns an analysis shaped like the ANALYSIS_PROMPT schema."""
+    return {
+        "restaurant_name": restaurant_name,
+        "summary": f"{restaurant_name} is a popular local restaurant known for its biryani and family-friendly dining.",
+        "healthiness_rating": "3/5",
+        "hygiene_rating": "4/5",
+        "price_rating": "2/5",
+        "food_quality": "Flavourful dishes made with fresh ingredients; the biryani is consistently praised.",
+        "dietary_options": {
+            "vegetarian": "Yes, several vegetarian curries and biryanis.",
+            "vegan": "No, most dishes use ghee or dairy.",
+            "gluten_free": "No, limited options beyond rice dishes.",
+        },
+        "ambiance": "Casual and busy, with simple decor.",
+        "private_space_for_parties": "Yes, a banquet hall is available for groups.",
+        "popular_dishes": ["Chicken Biryani", "Haleem", "Double Ka Meetha"],
+        "service_experience": "Quick and efficient, if a little rushed at peak times.",
+        "service_time": "Fast",
+        "portion_quantity": "Generous",
+        "rush_hours": "Weekday evenings, Weekend afternoons",
+    }
+
+def _sample_latency(distribution: str, median_ms: float, jitter: float, rng: random.Random) -> float:
+    """Returns a latency in seconds drawn from the configured distribution."""
+    if distribution == "uniform":
+        low = median_ms * (1 - jitter)
+        return max(0.0, rng.uniform(low, median_ms * (1 + jitter))) / 1000
+    if distribution == "lognormal":
+        # median_ms is the median; jitter is the sigma of the underlying normal
+        return median_ms * rng.lognormvariate(0, jitter) / 1000
+    return median_ms / 1000
+
+class FakeChatModel(BaseChatModel):
+    latency_ms: float = 800.0            # Median time to first token
+    latency_distribution: str = "fixed"  # fixed | uniform | lognormal
+    latency_jitter: float = 0.5
+    chunk_chars: int = 40                # Characters per streamed chunk
+    chunks_per_second: float = 50.0
+    error_rate: float = 0.0              # Fraction of calls that fail with a generic error
+    quota_rate: float = 0.0              # Fraction of calls that fail with a quota error
+    limits: Any = None                   # Optional FakeProviderLimits enforced on every call
+    seed: int | None = None
+    rng: Any = None
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self.rng = random.Random(self.seed)
+
+    @classmethod
+    def from_env(cls, prefix: str = "FAKE_LLM_", **overrides):
+        """
+        Builds a fake model configured from FAKE_LLM_* environment variables. With another
+        prefix (e.g. FAKE_LLM_FALLBACK_ for the fallback model), settings missing under that
+        prefix fall back to the FAKE_LLM_* ones. FAKE_LLM_REQUESTS_PER_MINUTE and
+        FAKE_LLM_TOKENS_PER_MINUTE make every model built with the same prefix share one quota.
+        """
+        def env(name: str, default: str) -> str:
+            return os.getenv(prefix + name, os.getenv("FAKE_LLM_" + name, default))
+
+        config = {
+            "latency_ms": float(env("LATENCY_MS", "800")),
+            "latency_distribution": env("LATENCY_DISTRIBUTION", "fixed"),
+            "latency_jitter": float(env("LATENCY_JITTER", "0.5")),
+            "chunk_chars": int(env("CHUNK_CHARS", "40")),
+            "chunks_per_second": float(env("CHUNKS_PER_SECOND", "50")),
+            "error_rate": float(env("ERROR_RATE", "0")),
+            "quota_rate": float(env("QUOTA_RATE", "0")),
+        }
+        requests_per_minute = float(env("REQUESTS_PER_MINUTE", "0"))
+        tokens_per_minute = float(env("TOKENS_PER_MINUTE", "0"))
+        if requests_per_minute or tokens_per_minute:
+            if prefix not in _env_limits:
+                _env_limits[prefix] = FakeProviderLimits(requests_per_minute, tokens_per_minute)
+            config["limits"] = _env_limits[prefix]
+        config.update(overrides)
+        return cls(**config)
+
+    @property
+    def _llm_type(self) -> str:
+        return "fake-gemini"
+
+    def _respond(self, messages) -> str:
+        """Picks canned output based on which of our prompts was sent."""
+        prompt = messages[-1].content if messages else ""
+        if "JSON schema" in prompt:
+            match = re.search(r"Restaurant Name: (.*)", prompt)
+            name = match.group(1).strip() if match else "Unknown Restaurant"
+            # Only return the fields the prompt's schema asks for
+            analysis = {k: v for k, v in canned_analysis(name).items() if f'"{k}"' in prompt}
+            return json.dumps(analysis, indent=2)
+        if "USER'S QUESTION" in prompt:
+            return "Based on the analysis, the restaurant is known for generous portions and quick service."
+        if "recommend 3 standout dishes" in prompt:
+            return ("- **Chicken Biryani:** Fragrant rice layered with tender spiced chicken.\n"
+                    "- **Haleem:** Slow-cooked wheat and meat stew, rich and comforting.\n"
+                    "- **Double Ka Meetha:** A sweet bread pudding soaked in saffron milk.")
+        if "slogan" in prompt.lower():
+            return "Where every plate tells a story of flavour."
+        return "OK"
+
+    def _maybe_fail(self, messages=None, text: str = ""):
+        if self.limits is not None:
+            usage = self._message(messages or [], text).usage_metadata
+            self.limits.admit(usage["total_tokens"])
+        roll = self.rng.random()
+        if roll < self.quota_rate:
+            raise FakeQuotaError("429 Resource has been exhausted (e.g. check quota).")
+        if roll < self.quota_rate + self.error_rate:
+            raise RuntimeError("Fake provider error: 500 Internal error encountered.")
+
+    def _chunks(self, text: str):
+        return [text[i:i + self.chunk_chars] for i in range(0, len(text), self.chunk_chars)] or [""]
+
+    def _message(self, messages, text: str) -> AIMessage:
+        prompt_tokens = sum(len(str(m.content)) for m in messages) // 4
+        completion_tokens = len(text) // 4
+        return AIMessage(content=text, usage_metadata={
+            "input_tokens": prompt_tokens,
+            "output_tokens": completion_tokens,
+            "total_tokens": prompt_tokens + completion_tokens,
+        })
+
+    def _generation_time(self, text: str) -> float:
+        return len(self._chunks(text)) / self.chunks_per_second
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs) -> ChatResult:
+        time.sleep(_sample_latency(self.latency_distribution, self.latency_ms, self.latency_jitter, self.rng))
+        text = self._respond(messages)
+        self._maybe_fail(messages, text)
+        time.sleep(self._generation_time(text))
+        return ChatResult(generations=[ChatGeneration(message=self._message(messages, text))])
+
+    async def _agenerate(self, messages, stop=None, run_manager=None, **kwargs) -> ChatResult:
+        await asyncio.sleep(_sample_latency(self.latency_distribution, self.latency_ms, self.latency_jitter, self.rng))
+        text = self._respond(messages)
+        self._maybe_fail(messages, text)
+        await asyncio.sleep(self._generation_time(text))
+        return ChatResult(generations=[ChatGeneration(message=self._message(messages, text))])
+
+    def _stream(self, messages, stop=None, run_manager=None, **kwargs):
+        time.sleep(_sample_latency(self.latency_distribution, self.latency_ms, self.latency_jitter, self.rng))
+        text = self._respond(messages)
+        self._maybe_fail(messages, text)
+        for chunk in self._chunks(text):
+            time.sleep(1 / self.chunks_per_second)
+            yield ChatGenerationChunk(message=AIMessageChunk(content=chunk))
+
+    async def _astream(self, messages, stop=None, run_manager=None, **kwargs):
+        await asyncio.sleep(_sample_latency(self.latency_distribution, self.latency_ms, self.latency_jitter, self.rng))
+        text = self._respond(messages)
+        self._maybe_fail(messages, text)
+        for chunk in self._chunks(text):
+            await asyncio.sleep(1 / self.chunks_per_second)
+            yield ChatGenerationChunk(message=AIMessageChunk(content=chunk))
@@ -0,0 +1,125 @@
+import re
+
+from extraction import normalize_rating
+
+# --- Fast-Path Chatbot Answers ---
+# Many chatbot questions are simple lookups on fields the analysis already contains
+# ("is there vegan food?", "when is it busy?"). This layer answers those straight from the data,
+# skipping the LLM. A question only qualifies if the whole of it is a known lookup phrasing for
+# exactly one field; anything with extra qualifiers ("...of the haleem", "...every day",
+# "...of 200 people"), numbers, dish names, reasoning or missing data falls through.
+
+# Each intent: (name, topic pattern, field path in the ANALYSIS_PROMPT schema, answer template).
+# The topic pattern says which field a question is about (conversation.py uses it to pick context);
+# LOOKUP_PHRASINGS below decides whether the question is a plain lookup of that field.
+INTENTS = [
+    ("vegan", r"\bvegan", ("dietary_options", "vegan"), "Vegan options: {value}"),
+    ("vegetarian", r"\bveg\b|\bvegetarian|\bveggie", ("dietary_options", "vegetarian"), "Vegetarian options: {value}"),
+    ("gluten_free", r"gluten|celiac|coeliac", ("dietary_options", "gluten_free"), "Gluten-free options: {value}"),
+    ("rush_hours", r"\brush\b|\bbusy\b|\bbusiest\b|crowd|peak (hour|time)", ("rush_hours",), "Typical rush hours: {value}"),
+    ("price", r"expensive|\bcheap|afford|\bprice|\bpricey|\bcost|budget", ("price_rating",), "The price rating is {value}/5, where 5 is very expensive."),
+    ("hygiene", r"hygien|\bclean", ("hygiene_rating",), "The hygiene rating is {value}/5."),
+    ("healthiness", r"\bhealth", ("healthiness_rating",), "The healthiness rating is {value}/5."),
+    ("private_space_for_parties", r"\bpart(y|ies)\b|private (room|space|dining|area)|banquet|birthday|celebrat", ("private_space_for_parties",), "Private space for parties: {value}"),
+    ("popular_dishes", r"popular|must[- ]try|signature|famous (for|dish)|best dish", ("popular_dishes",), "Popular dishes: {value}"),
+    ("service_time", r"how (fast|quick|long)|wait(ing)? time|service time|served quickly", ("service_time",), "Service time: {value}"),
+    ("portion_quantity", r"portion|serving size|\bquantity", ("portion_quantity",), "Portion sizes: {value}"),
+    ("ambiance", r"ambian|atmosphere|decor|\bvibe", ("ambiance",), "Ambiance: {value}"),
+]
+
+# Generic openers and closers of a lookup question, around the intent-specific phrase
+_LOOKUP_LEAD = (
+    r"(?:(?:is there|are there|do (?:they|you) have|does (?:it|this place|the restaurant) (?:have|offer|serve)"
+    r"|(?:do|can) (?:they|you) (?:offer|serve|do)|what(?:'s| is| are|s)?|how(?:'s| is| are)?|tell me about"
+    r"|is (?:it|this place|the restaurant|the food)|are (?:the|there)) )?(?:any |the |a )?"
+)
+_LOOKUP_TAIL = r"(?: (?:here|there|available|like|offered|on the menu|at this (?:place|restaurant)|at the restaurant|in this restaurant))*"
+_OPTIONS = r"(?: (?:options?|food|dishes|choices|items|menu|meals|friendly))?"
+
+# Intent name -> the phrases that, with a lead and tail, make up the whole of a lookup question
+LOOKUP_PHRASINGS = {
+    "vegan": rf"vegan{_OPTIONS}",
+    "vegetarian": rf"(?:veg|vegetarian|veggie|pure veg){_OPTIONS}",
+    "gluten_free": rf"gluten[- ]free{_OPTIONS}|(?:options|food) for (?:celiacs?|coeliacs?)",
+    "rush_hours": r"(?:rush|peak|busiest|busy) (?:hours?|times?)|when (?:is it|does it get) (?:busy|busiest|crowded|packed)|(?:busy|crowded)",
+    "price": r"(?:price|prices|pricing|cost)(?: level| range| rating)?|(?:expensive|cheap|pricey|affordable)"
+             r"|how (?:expensive|pricey|cheap|affordable) is it|how much does (?:it|a meal) cost",
+    "hygiene": r"(?:hygiene|cleanliness)(?: rating| level| standards?)?|(?:clean|hygienic)|how (?:clean|hygienic) is it",
+    "healthiness": r"(?:healthiness|health)(?: rating| level)?|healthy|how healthy is (?:it|the food)",
+    "private_space_for_parties": r"private (?:room|space|area|dining(?: area| room)?)(?: for (?:parties|events|birthdays))?"
+                                 r"|(?:space|room) for (?:parties|events|birthdays)"
+                                 r"|(?:party|parties|banquet|event|function) (?:rooms?|halls?|spaces?|areas?)"
+                                 r"|can (?:i|we) (?:host|have|hold|book) (?:a )?(?:party|birthday party|celebration) (?:here|there)",
+    "popular_dishes": r"(?:popular|signature|famous|best|must[- ]try) (?:dishes|dish|items|food)|what (?:is|are) (?:it|they) (?:famous|known) for",
+    "service_time": r"(?:service|wait|waiting) time|(?:service|food) (?:fast|quick|slow)|how (?:fast|quick) is (?:the )?(?:service|food)|how long is the wait",
+    "portion_quantity": r"(?:portions?|portion sizes?|serving sizes?|quantity)(?: (?:big|large|small|generous))?|how big are (?:the )?portions",
+    "ambiance": r"(?:ambiance|ambience|atmosphere|decor|vibe)",
+}
+
+# Questions that ask for reasoning or comparison need the LLM even if they match a lookup
+_NEEDS_LLM_PATTERN = re.compile(r"\bwhy\b|\bcompare|\bthan\b|\binstead\b|\bversus\b|\bvs\b|\bother restaurant|\bshould i\b")
+# Quantities ("a party of 200", "for 4 people") change the answer, so they go to the LLM too
+_NUMBER_PATTERN = re.compile(r"\d|\b(?:one|two|three|four|five|six|seven|eight|nine|ten|twelve|twenty|fifty|hundred|dozen)\b")
+# Greetings and politeness around the question, stripped before matching
+_FILLER_PATTERN = re.compile(r"^(?:(?:hi|hey|hello|ok|okay|so|and|also|please)\b[,!]? ?)+|[,]? ?\bplease$")
+
+_COMPILED_INTENTS = [(name, re.compile(rf"{_LOOKUP_LEAD}(?:{LOOKUP_PHRASINGS[name]}){_LOOKUP_TAIL}"), path, template)
+                     for name, _, path, template in INTENTS]
+
+def _normalize_question(question: str) -> str:
+    """Lower-cases the question and strips punctuation at the end, fillers and extra whitespace."""
+    text = " ".join(question.lower().replace("\u2019", "'").split())
+    text = text.rstrip("?!. ")
+    return _FILLER_PATTERN.sub("", text).strip()
+
+def _mentions_dish(text: str, analysis: dict) -> bool:
+    dishes = analysis.get("popular_dishes")
+    if not isinstance(dishes, list):
+        return False
+    return any(str(dish).lower() in text for dish in dishes if str(dish).strip())
+
+class FastPathAnswerer:
+    def __init__(self):
+        self.questions = 0
+        self.intent_hits = {name: 0 for name, _, _, _ in INTENTS}
+
+    def answer(self, question: str, analysis: dict) -> str | None:
+        """Returns an answer built from the analysis data, or None if the LLM should handle it."""
+        self.questions += 1
+        text = _normalize_question(question)
+        if _NEEDS_LLM_PATTERN.search(text) or _NUMBER_PATTERN.search(text) or _mentions_dish(text, analysis):
+            return None
+
+        matches = [intent for intent in _COMPILED_INTENTS if intent[1].fullmatch(text)]
+        if len(matches) != 1:
+            return None
+        name, _, path, template = matches[0]
+
+        value = analysis
+        for key in path:
+            if not isinstance(value, dict):
+                return None
+            value = value.get(key)
+        if isinstance(value, list):
+            value = ", ".join(str(item) for item in value)
+        elif path[0].endswith("_rating"):
+            # Ratings are numbers out of 5, but older sessions may still hold strings like "3/5"
+            rating = normalize_rating(value)
+            value = None if rating is None else f"{rating:g}"
+        if not value or str(value).strip().upper() == "N/A":
+            return None
+
+        self.intent_hits[name] += 1
+        return template.format(value=value)
+
+    def stats(self) -> dict:
+        answered = sum(self.intent_hits.values())
+        return {
+            "questions": self.questions,
+            "answered_without_llm": answered,
+            "hit_rate": answered / self.questions if self.questions else 0.0,
+            "intent_hits": dict(self.intent_hits),
+        }
+
+# Shared answerer for this worker
+fast_path_answerer = FastPathAnswerer()
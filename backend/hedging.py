@@ -0,0 +1,162 @@
+import os
+import asyncio
+from collections import deque
+
+from limits import is_quota_error, llm_scheduler
+
+# --- Deadlines, Hedging and Fallback ---
+# Every LLM call runs under a per-kind deadline. If the primary call is still running once it
+# passes the recent p95 latency for its kind, a duplicate ("hedge") is sent to the fallback model
+# (or the same model again when no fallback is configured); the first valid response wins and the
+# other call is cancelled. A primary that fails outright falls back the same way. Hedges cost
+# extra calls, so they are capped to a fraction of all calls and must fit the rate budget.
+
+class DeadlineExceededError(Exception):
+    """Raised when an LLM call (including any hedge) does not finish within its deadline."""
+
+CALL_KINDS = ("analysis", "chatbot", "dish_recommendation", "slogan")
+_DEFAULT_DEADLINES = {"analysis": 60, "chatbot": 20, "dish_recommendation": 30, "slogan": 20}
+
+# Override per kind with e.g. LLM_DEADLINE_CHATBOT_SECONDS=10
+CALL_DEADLINES = {
+    kind: float(os.getenv(f"LLM_DEADLINE_{kind.upper()}_SECONDS", str(_DEFAULT_DEADLINES[kind])))
+    for kind in CALL_KINDS
+}
+
+class LatencyTracker:
+    """Keeps the most recent latencies for one kind of call and reports percentiles over them."""
+    def __init__(self, window: int = 200):
+        self._samples = deque(maxlen=window)
+
+    def __len__(self) -> int:
+        return len(self._samples)
+
+    def record(self, seconds: float):
+        self._samples.append(seconds)
+
+    def percentile(self, fraction: float) -> float | None:
+        if not self._samples:
+            return None
+        ordered = sorted(self._samples)
+        return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+class HedgedCaller:
+    def __init__(self, deadlines: dict, hedge_percentile: float = 0.95, default_hedge_delay: float = 8.0,
+                 min_hedge_delay: float = 0.5, min_samples: int = 20, max_hedge_fraction: float = 0.1,
+                 budget_check=None):
+        self.deadlines = deadlines
+        self.hedge_percentile = hedge_percentile
+        self.default_hedge_delay = default_hedge_delay  # Used until a kind has min_samples latencies
+        self.min_hedge_delay = min_hedge_delay
+        self.min_samples = min_samples
+        self.max_hedge_fraction = max_hedge_fraction
+        # Called as budget_check(estimated_tokens) -> bool before each hedge (e.g. the rate budget)
+        self.budget_check = budget_check
+        self._latency = {}
+        self._counters = {}
+
+    def _count(self, kind: str, name: str):
+        counters = self._counters.setdefault(kind, {
+            "calls": 0, "hedged": 0, "hedge_wins": 0, "fallbacks": 0,
+            "budget_denied": 0, "deadline_exceeded": 0,
+        })
+        counters[name] += 1
+
+    def count_deadline_exceeded(self, kind: str):
+        """Counts a deadline missed outside call(), e.g. by a streamed response."""
+        self._count(kind, "deadline_exceeded")
+
+    def hedge_delay(self, kind: str) -> float:
+        """Seconds to wait for the primary before hedging: the recent latency percentile for `kind`."""
+        tracker = self._latency.get(kind)
+        if tracker is None or len(tracker) < self.min_samples:
+            return self.default_hedge_delay
+        return max(self.min_hedge_delay, tracker.percentile(self.hedge_percentile))
+
+    def _hedge_allowed(self, kind: str, estimated_tokens: int) -> bool:
+        counters = self._counters[kind]
+        # Counting this hedge, stay within the fraction of calls (but a kind's first slow call may hedge)
+        within_cap = counters["hedged"] + counters["fallbacks"] + 1 <= max(1.0, self.max_hedge_fraction * counters["calls"])
+        if within_cap and (self.budget_check is None or self.budget_check(estimated_tokens)):
+            return True
+        self._count(kind, "budget_denied")
+        return False
+
+    async def call(self, kind: str, primary, hedge=None, estimated_tokens: int = 1000, is_valid=None):
+        """
+        Awaits `primary()` under the deadline for `kind`, hedging with `hedge()` when it is slow
+        or fails. Both are zero-argument coroutine factories. A result counts only if
+        is_valid(result) is true; when no result is valid, the last one (or error) is returned.
+        """
+        loop = asyncio.get_running_loop()
+        self._count(kind, "calls")
+        deadline = self.deadlines.get(kind, max(self.deadlines.values()))
+        delay = self.hedge_delay(kind)
+        start = loop.time()
+        tasks = {asyncio.ensure_future(primary()): "primary"}
+        hedge_started = hedge is None
+        last_result = last_error = None
+
+        def start_hedge(reason: str):
+            nonlocal hedge_started
+            hedge_started = True
+            if self._hedge_allowed(kind, estimated_tokens):
+                self._count(kind, reason)
+                tasks[asyncio.ensure_future(hedge())] = "hedge"
+
+        try:
+            async with asyncio.timeout(deadline):
+                while tasks:
+                    timeout = None if hedge_started else max(0.0, delay - (loop.time() - start))
+                    done, _ = await asyncio.wait(tasks, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+                    if not done:
+                        start_hedge("hedged")
+                        continue
+                    for task in done:
+                        source = tasks.pop(task)
+                        if task.exception() is None and (is_valid is None or is_valid(task.result())):
+                            self._latency.setdefault(kind, LatencyTracker()).record(loop.time() - start)
+                            if source == "hedge":
+                                self._count(kind, "hedge_wins")
+                            return task.result()
+                        if task.exception() is None:
+                            last_result = task.result()
+                        else:
+                            last_error = task.exception()
+                        # The same provider would refuse a fallback for quota too
+                        if source == "primary" and not hedge_started and not (last_error and is_quota_error(last_error)):
+                            start_hedge("fallbacks")
+        except TimeoutError:
+            self._count(kind, "deadline_exceeded")
+            raise DeadlineExceededError(f"The AI model did not respond within {deadline:g} seconds.")
+        finally:
+            for task in tasks:
+                task.cancel()
+
+        if last_result is not None:
+            return last_result
+        raise last_error
+
+    def stats(self) -> dict:
+        report = {}
+        for kind, counters in self._counters.items():
+            calls = counters["calls"]
+            hedges = counters["hedged"] + counters["fallbacks"]
+            report[kind] = {
+                **counters,
+                "hedge_rate": hedges / calls if calls else 0.0,
+                "hedge_win_rate": counters["hedge_wins"] / hedges if hedges else 0.0,
+                "hedge_delay_seconds": self.hedge_delay(kind),
+                "deadline_seconds": self.deadlines.get(kind),
+            }
+        return report
+
+# Shared hedging policy for all LLM calls in this worker; LLM_HEDGING=0 keeps deadlines but never hedges
+HEDGING_ENABLED = os.getenv("LLM_HEDGING", "1") == "1"
+hedged_caller = HedgedCaller(
+    CALL_DEADLINES,
+    hedge_percentile=float(os.getenv("LLM_HEDGE_PERCENTILE", "0.95")),
+    default_hedge_delay=float(os.getenv("LLM_HEDGE_DEFAULT_DELAY_SECONDS", "8")),
+    max_hedge_fraction=float(os.getenv("LLM_MAX_HEDGE_FRACTION", "0.1")),
+    budget_check=llm_scheduler.try_reserve,
+)
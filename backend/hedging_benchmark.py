@@ -0,0 +1,119 @@
+"""
+Offline check of LLM deadlines and hedging against fake providers with injected latency.
+
+Serves /chatbot in-process with LLM_PROVIDER=fake: the primary model (FAKE_LLM_* settings) is
+slow and the fallback model (LLM_FALLBACK_MODEL, configured by FAKE_LLM_FALLBACK_*) is fast.
+Checks that:
+  - a slow primary call is hedged to the fallback and the hedge's answer is returned
+  - the losing call is cancelled rather than left running
+  - a call that misses its deadline gets a 504
+  - under a burst of slow calls, hedges stay within LLM_MAX_HEDGE_FRACTION
+
+Usage:
+    python hedging_benchmark.py [--primary-ms 3000] [--fallback-ms 50] [--hedge-delay 0.2] [--burst 50]
+Exits non-zero if any check fails.
+"""
+import os
+import sys
+import time
+import asyncio
+import argparse
+import tempfile
+
+ANALYSIS = '{"restaurant_name": "Pista House", "summary": "A busy Hyderabadi restaurant known for haleem."}'
+QUESTION = "What do people think of the place overall?"  # Not a fast-path lookup, so it reaches the LLM
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Offline check of LLM deadlines and hedging.")
+    parser.add_argument("--primary-ms", type=float, default=3000, help="Latency of the slow primary fake model.")
+    parser.add_argument("--fallback-ms", type=float, default=50, help="Latency of the fast fallback fake model.")
+    parser.add_argument("--hedge-delay", type=float, default=0.2, help="Seconds before a slow call is hedged.")
+    parser.add_argument("--max-hedge-fraction", type=float, default=0.1, help="Cap on hedges as a share of calls.")
+    parser.add_argument("--burst", type=int, default=50, help="Concurrent chatbot calls for the hedge cap check.")
+    return parser.parse_args()
+
+def configure_environment(args):
+    """Points the app at the fake providers; must run before the app modules are imported."""
+    os.environ.update({
+        "LLM_PROVIDER": "fake",
+        "LLM_FALLBACK_MODEL": "fake-fallback",
+        "FAKE_LLM_LATENCY_MS": str(args.primary_ms),
+        "FAKE_LLM_FALLBACK_LATENCY_MS": str(args.fallback_ms),
+        "LLM_HEDGING": "1",
+        "LLM_HEDGE_DEFAULT_DELAY_SECONDS": str(args.hedge_delay),
+        "LLM_MAX_HEDGE_FRACTION": str(args.max_hedge_fraction),
+        # Generous rate and concurrency limits, so only hedging decides what happens
+        "LLM_REQUESTS_PER_MINUTE": "100000",
+        "LLM_TOKENS_PER_MINUTE": "1000000000",
+        "MAX_CONCURRENT_LLM_CALLS": str(args.burst * 2),
+        "MAX_QUEUED_LLM_CALLS": str(args.burst * 2),
+        "ANALYSIS_STORE_PATH": os.path.join(tempfile.mkdtemp(), "hedging_benchmark.db"),
+    })
+
+def running_llm_calls() -> int:
+    """Fake model calls still in flight (a hedge loser that was not cancelled would show up here)."""
+    return sum(1 for task in asyncio.all_tasks()
+               if not task.done() and task.get_coro().__qualname__.endswith("ainvoke"))
+
+async def ask(client) -> tuple:
+    start = time.perf_counter()
+    response = await client.post("/chatbot", json={"analysis_text_raw": ANALYSIS, "user_question": QUESTION})
+    return response.status_code, time.perf_counter() - start
+
+async def run_checks(args) -> list:
+    import httpx
+    import main
+    from hedging import hedged_caller
+
+    failures = []
+
+    def check(ok: bool, message: str):
+        print(f"{'ok  ' if ok else 'FAIL'} {message}")
+        if not ok:
+            failures.append(message)
+
+    async with main.lifespan(main.app):
+        transport = httpx.ASGITransport(app=main.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://benchmark", timeout=60) as client:
+            # 1. One slow call: the hedge should answer shortly after the hedge delay
+            status, seconds = await ask(client)
+            await asyncio.sleep(0)  # Let the cancelled loser finish unwinding
+            stats = hedged_caller.stats()["chatbot"]
+            check(status == 200 and stats["hedge_wins"] == 1,
+                  f"slow primary hedged to the fallback: {status} in {seconds:.2f}s (primary alone takes {args.primary_ms / 1000:g}s)")
+            check(running_llm_calls() == 0, "the losing primary call was cancelled")
+
+            # 2. A deadline shorter than the hedge delay: nothing can answer in time
+            deadline = hedged_caller.deadlines["chatbot"]
+            hedged_caller.deadlines["chatbot"] = args.hedge_delay / 2
+            try:
+                status, seconds = await ask(client)
+            finally:
+                hedged_caller.deadlines["chatbot"] = deadline
+            await asyncio.sleep(0)
+            check(status == 504, f"missed deadline answered with {status} after {seconds:.2f}s")
+            check(running_llm_calls() == 0, "the call that missed its deadline was cancelled")
+
+            # 3. A burst of slow calls: only a capped share may be hedged, the rest wait for the primary
+            before = hedged_caller.stats()["chatbot"]
+            results = await asyncio.gather(*(ask(client) for _ in range(args.burst)))
+            after = hedged_caller.stats()["chatbot"]
+            calls = after["calls"]
+            hedges = after["hedged"] + after["fallbacks"]
+            new_hedges = hedges - before["hedged"] - before["fallbacks"]
+            cap = max(1.0, args.max_hedge_fraction * calls)
+            check(all(status == 200 for status, _ in results), f"all {args.burst} burst calls answered")
+            check(hedges <= cap, f"{hedges} hedges over {calls} calls, within the cap of {cap:g}")
+            check(after["budget_denied"] > before["budget_denied"],
+                  f"{after['budget_denied'] - before['budget_denied']} hedges refused by the cap; {new_hedges} allowed")
+
+    print(f"\nHedging stats: {hedged_caller.stats()['chatbot']}")
+    return failures
+
+def main():
+    args = parse_args()
+    configure_environment(args)
+    sys.exit(1 if asyncio.run(run_checks(args)) else 0)
+
+if __name__ == "__main__":
+    main()
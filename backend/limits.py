@@ -0,0 +1,264 @@
+import os
+import re
+import math
+import time
+import heapq
+import asyncio
+import itertools
+from contextlib import asynccontextmanager
+
+# --- Request Priorities ---
+# Lower numbers are served first when LLM capacity is scarce.
+PRIORITY_INTERACTIVE = 0  # Chatbot questions a user is waiting on
+PRIORITY_ANALYSIS = 1     # Single /analyze requests
+PRIORITY_BATCH = 2        # Batch analysis and enrichment (dish recommendations, slogans)
+
+class OverloadedError(Exception):
+    """Raised when the gate is at capacity and the wait queue is full."""
+    pass
+
+class RateLimitedError(Exception):
+    """Raised when the requests/tokens-per-minute budget is exhausted."""
+    def __init__(self, message: str, retry_after: float):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+    @property
+    def retry_after_header(self) -> str:
+        """Retry-After is whole seconds, rounded up so clients never retry too early."""
+        return str(max(1, math.ceil(self.retry_after)))
+
+class BudgetTooSmallError(Exception):
+    """Raised for a call that can never fit in its share of the rate budget, however long it waits."""
+    pass
+
+def is_quota_error(e: Exception) -> bool:
+    """Recognises a provider-side quota/rate-limit failure (HTTP 429 / ResourceExhausted)."""
+    if type(e).__name__ in ("ResourceExhausted", "TooManyRequests", "RateLimitError"):
+        return True
+    message = str(e).lower()
+    return "quota" in message or "resource_exhausted" in message or re.search(r"\b429\b", message) is not None
+
+def estimate_tokens(text: str) -> int:
+    """Rough token estimate (about four characters per token) used for budgeting before a call."""
+    return max(1, len(text) // 4)
+
+# --- Per-Worker Concurrency Gate ---
+# Limits how many LLM calls a single worker runs at once. Callers beyond the limit wait
+# in a queue of bounded depth, highest priority first; once that queue is full we reject
+# immediately so the endpoint can answer with a fast 503 instead of piling up requests.
+
+class ConcurrencyGate:
+    def __init__(self, max_concurrent: int, max_queued: int):
+        self.max_concurrent = max_concurrent
+        self.max_queued = max_queued
+        self._in_flight = 0
+        self._waiters = []  # heap of (priority, sequence, future)
+        self._sequence = itertools.count()
+
+    @property
+    def in_flight(self) -> int:
+        return self._in_flight
+
+    @property
+    def waiting(self) -> int:
+        return sum(1 for _, _, future in self._waiters if not future.done())
+
+    async def acquire(self, priority: int = PRIORITY_ANALYSIS):
+        if self._in_flight < self.max_concurrent and not self._waiters:
+            self._in_flight += 1
+            return
+        if self.waiting >= self.max_queued:
+            raise OverloadedError(
+                f"Server is busy ({self._in_flight} requests in progress, {self.waiting} queued). Please retry shortly."
+            )
+        future = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._waiters, (priority, next(self._sequence), future))
+        try:
+            # release() hands its slot straight to us, so in_flight is already counted
+            await future
+        except asyncio.CancelledError:
+            if future.done() and not future.cancelled():
+                # We were given a slot just as we were cancelled; pass it on
+                self.release()
+            raise
+
+    def release(self):
+        while self._waiters:
+            _, _, future = heapq.heappop(self._waiters)
+            if not future.done():
+                future.set_result(None)
+                return
+        self._in_flight -= 1
+
+    async def __aenter__(self):
+        await self.acquire()
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        self.release()
+        return False
+
+# --- Token Buckets ---
+
+class TokenBucket:
+    """Refills continuously up to `capacity` per minute. The clock is injectable for offline tests."""
+    def __init__(self, per_minute: float, clock=time.monotonic):
+        self.capacity = per_minute
+        self.rate = per_minute / 60.0
+        self._clock = clock
+        self._level = per_minute
+        self._updated = clock()
+
+    def _refill(self):
+        now = self._clock()
+        self._level = min(self.capacity, self._level + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def level(self) -> float:
+        self._refill()
+        return self._level
+
+    def fits(self, amount: float, floor: float = 0.0) -> bool:
+        """Whether `amount` can ever be taken while leaving `floor`, i.e. once the bucket is full."""
+        return min(amount, self.capacity) + floor <= self.capacity
+
+    def wait_time(self, amount: float, floor: float = 0.0) -> float:
+        """Seconds until `amount` can be taken while leaving at least `floor` in the bucket."""
+        self._refill()
+        needed = min(amount, self.capacity) + floor - self._level
+        return max(0.0, needed / self.rate)
+
+    def take(self, amount: float):
+        self._refill()
+        self._level -= amount
+
+    def drain(self, seconds: float):
+        """Empties the bucket so nothing is allowed for roughly `seconds` (after a provider 429)."""
+        self._refill()
+        self._level = min(self._level, -seconds * self.rate)
+
+# --- Quota-Aware Scheduler ---
+# Every LLM call goes through here. Requests- and tokens-per-minute budgets are enforced
+# before the provider is contacted, so bursts are smoothed out locally instead of failing
+# upstream. A share of each budget is held back for interactive calls, and callers that
+# would have to wait longer than `max_wait_seconds` get a RateLimitedError carrying a
+# Retry-After hint. A call too big for its share of the budget to ever admit it fails
+# straight away with BudgetTooSmallError instead.
+
+class LLMScheduler:
+    def __init__(self, requests_per_minute: float, tokens_per_minute: float,
+                 max_concurrent: int, max_queued: int, max_wait_seconds: float = 10.0,
+                 interactive_reserve: float = 0.2, clock=time.monotonic, sleep=asyncio.sleep):
+        self.request_bucket = TokenBucket(requests_per_minute, clock)
+        self.token_bucket = TokenBucket(tokens_per_minute, clock)
+        self.gate = ConcurrencyGate(max_concurrent, max_queued)
+        self.max_wait_seconds = max_wait_seconds
+        self.interactive_reserve = interactive_reserve
+        self._sleep = sleep
+        self.rate_limited = 0
+        self.provider_quota_errors = 0
+
+    def _reserve(self, priority: int) -> float:
+        # Lower-priority calls may not dip into the share reserved for interactive ones
+        return 0.0 if priority == PRIORITY_INTERACTIVE else self.interactive_reserve
+
+    def _fits(self, priority: int, estimated_tokens: int) -> bool:
+        reserve = self._reserve(priority)
+        return (self.request_bucket.fits(1, floor=reserve * self.request_bucket.capacity)
+                and self.token_bucket.fits(estimated_tokens, floor=reserve * self.token_bucket.capacity))
+
+    def _wait_time(self, priority: int, estimated_tokens: int) -> float:
+        reserve = self._reserve(priority)
+        return max(
+            self.request_bucket.wait_time(1, floor=reserve * self.request_bucket.capacity),
+            self.token_bucket.wait_time(estimated_tokens, floor=reserve * self.token_bucket.capacity),
+        )
+
+    async def _reserve_budget(self, priority: int, estimated_tokens: int):
+        if not self._fits(priority, estimated_tokens):
+            # Waiting would never help, so do not hand out a Retry-After
+            raise BudgetTooSmallError(
+                f"This request needs about {estimated_tokens} tokens, more than the "
+                f"{self.token_bucket.capacity * (1 - self._reserve(priority)):.0f} tokens per minute available to it."
+            )
+        waited = 0.0
+        while True:
+            wait = self._wait_time(priority, estimated_tokens)
+            if wait <= 0:
+                self.request_bucket.take(1)
+                self.token_bucket.take(estimated_tokens)
+                return
+            if waited + wait > self.max_wait_seconds:
+                self.rate_limited += 1
+                raise RateLimitedError(
+                    "The AI request budget is exhausted for the moment. Please try again shortly.",
+                    retry_after=wait,
+                )
+            await self._sleep(wait)
+            waited += wait
+
+    @asynccontextmanager
+    async def slot(self, priority: int = PRIORITY_ANALYSIS, estimated_tokens: int = 1000):
+        """
+        Waits for rate budget and a concurrency slot, then runs the body.
+        Provider quota errors raised inside are turned into RateLimitedError.
+        """
+        await self._reserve_budget(priority, estimated_tokens)
+        try:
+            await self.gate.acquire(priority)
+        except BaseException:
+            # Never got to call the provider, so give the budget back
+            self.request_bucket.take(-1)
+            self.token_bucket.take(-estimated_tokens)
+            raise
+        try:
+            yield
+        except Exception as e:
+            if isinstance(e, RateLimitedError) or not is_quota_error(e):
+                raise
+            # The provider disagrees with our budget; back off for a minute so we stop hammering it
+            self.provider_quota_errors += 1
+            self.request_bucket.drain(60)
+            self.token_bucket.drain(60)
+            raise RateLimitedError(
+                "The AI provider's quota is exhausted for the moment. Please try again later.",
+                retry_after=60,
+            ) from e
+        finally:
+            self.gate.release()
+
+    def try_reserve(self, estimated_tokens: int) -> bool:
+        """
+        Takes budget for an extra call (e.g. a hedge) only if it is available right now,
+        without touching the share reserved for interactive calls.
+        """
+        if not self._fits(PRIORITY_BATCH, estimated_tokens) or self._wait_time(PRIORITY_BATCH, estimated_tokens) > 0:
+            return False
+        self.request_bucket.take(1)
+        self.token_bucket.take(estimated_tokens)
+        return True
+
+    def record_usage(self, estimated_tokens: int, actual_tokens: int | None):
+        """Corrects the token budget once the provider reports how many tokens a call really used."""
+        if actual_tokens:
+            self.token_bucket.take(actual_tokens - estimated_tokens)
+
+    def stats(self) -> dict:
+        return {
+            "in_flight": self.gate.in_flight,
+            "waiting": self.gate.waiting,
+            "request_budget_remaining": self.request_bucket.level(),
+            "token_budget_remaining": self.token_bucket.level(),
+            "rate_limited": self.rate_limited,
+            "provider_quota_errors": self.provider_quota_errors,
+        }
+
+# Shared scheduler for all LLM calls in this worker
+llm_scheduler = LLMScheduler(
+    requests_per_minute=float(os.getenv("LLM_REQUESTS_PER_MINUTE", "60")),
+    tokens_per_minute=float(os.getenv("LLM_TOKENS_PER_MINUTE", "250000")),
+    max_concurrent=int(os.getenv("MAX_CONCURRENT_LLM_CALLS", "8")),
+    max_queued=int(os.getenv("MAX_QUEUED_LLM_CALLS", "32")),
+    max_wait_seconds=float(os.getenv("LLM_MAX_RATE_WAIT_SECONDS", "10")),
+)
@@ -1,9 +1,14 @@
+import time
+IMPORT_STARTED = time.perf_counter()  # Import time is reported on /ready
+
 import os
 import json
-import time
-import re
-from fastapi import FastAPI, HTTPException
+import signal
+import asyncio
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, HTTPException, Request, UploadFile, File, Form
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import StreamingResponse, PlainTextResponse, JSONResponse
 from pydantic import BaseModel
 from dotenv import load_dotenv
 
@@ -13,12 +18,126 @@ load_dotenv()
 # Import your LangChain logic
 # Assuming these files are in the same 'backend' directory
 from chains import (
-    get_restaurant_analysis_chain, get_chatbot_response,
-    get_dish_recommendation, get_slogan_generation
+    get_restaurant_analysis_chain, ainvoke_chain, astream_chain, aget_chatbot_response, ChatbotError,
+    aget_dish_recommendation, aget_slogan_generation, reset_chain_registry
+)
+from prompts import ANALYSIS_PROMPT, ANALYSIS_FIELD_SCHEMA, ANALYSIS_TYPE_DEFAULT_FIELDS
+from limits import (
+    llm_scheduler, OverloadedError, RateLimitedError, BudgetTooSmallError, estimate_tokens,
+    PRIORITY_INTERACTIVE, PRIORITY_ANALYSIS, PRIORITY_BATCH
+)
+from cache import analysis_cache, make_analysis_key, normalize_key_part
+from store import analysis_store
+from streaming import IncrementalJSONFieldParser, format_sse
+from extraction import extract_analysis, validate_analysis, normalize_field, ExtractionError
+from sessions import analysis_sessions
+from conversation import chatbot_conversations
+from fastpath import fast_path_answerer
+from search_index import restaurant_index, DIET_FLAGS
+from hedging import hedged_caller, DeadlineExceededError
+from ocr import menu_ocr, image_hash, OCRError, OCRUnavailableError
+from warmup import startup_warmup, WARMUP_BLOCKING
+from metrics import (
+    REQUEST_LATENCY, SERVER_TIMING_ALWAYS, start_request, timed_stage,
+    format_server_timing, render_prometheus
 )
 
+def reload_llm_config():
+    """
+    SIGHUP handler: re-reads .env and drops every cached LLM client, so a rotated GOOGLE_API_KEY
+    or a new LLM_FALLBACK_MODEL takes effect on the next call without restarting the worker.
+    Deadline, hedging and rate-limit settings are read at startup and still need a restart.
+    """
+    reset_chain_registry(reload_env=True)
+    print(f"[{time.ctime()}] Received SIGHUP: reloaded .env and reset the chain registry.")
+
+def install_reload_signal_handler():
+    """Wires SIGHUP to reload_llm_config (e.g. `kill -HUP <worker pid>`); a no-op where unsupported."""
+    if not hasattr(signal, "SIGHUP"):
+        return
+    try:
+        asyncio.get_running_loop().add_signal_handler(signal.SIGHUP, reload_llm_config)
+    except (NotImplementedError, RuntimeError) as e:
+        print(f"[{time.ctime()}] Could not install the SIGHUP handler: {e}")
+
+# How often each worker deletes expired rows from the shared store (see store.py)
+STORE_PRUNE_INTERVAL_SECONDS = float(os.getenv("STORE_PRUNE_INTERVAL_SECONDS", "3600"))
+
+async def prune_store_periodically():
+    """Deletes expired rows from the shared store every STORE_PRUNE_INTERVAL_SECONDS, off the event loop."""
+    while True:
+        await asyncio.sleep(STORE_PRUNE_INTERVAL_SECONDS)
+        try:
+            removed = await asyncio.to_thread(analysis_store.prune_expired)
+            print(f"[{time.ctime()}] Pruned {removed} expired rows from the analysis store.")
+        except Exception as e:
+            print(f"[{time.ctime()}] Warning: pruning the analysis store failed: {e}")
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """
+    Warms the worker up on startup (see warmup.py) and starts pruning the store; on shutdown
+    stops both and the OCR pool.
+    """
+    install_reload_signal_handler()
+    startup_warmup.imports_done(IMPORT_STARTED)
+    warmup_task = asyncio.create_task(startup_warmup.run())
+    prune_task = asyncio.create_task(prune_store_periodically())
+    if WARMUP_BLOCKING:
+        await warmup_task
+    yield
+    warmup_task.cancel()
+    prune_task.cancel()
+    menu_ocr.shutdown()
+
 # Initialize the FastAPI app
-app = FastAPI()
+app = FastAPI(lifespan=lifespan)
+
+# Limits for /analyze/menu uploads
+MAX_MENU_PAGES = int(os.getenv("MAX_MENU_PAGES", "10"))
+MAX_MENU_IMAGE_BYTES = int(os.getenv("MAX_MENU_IMAGE_BYTES", str(10 * 1024 * 1024)))
+# Whole multipart body: every page at its maximum plus room for the form fields
+MAX_MENU_UPLOAD_BYTES = int(os.getenv("MAX_MENU_UPLOAD_BYTES", str(MAX_MENU_PAGES * MAX_MENU_IMAGE_BYTES + 1024 * 1024)))
+MAX_MENU_TEXT_CHARS = int(os.getenv("MAX_MENU_TEXT_CHARS", "8000"))  # Keeps the prompt size bounded
+UPLOAD_CHUNK_BYTES = 64 * 1024
+
+class UploadSizeLimit:
+    """
+    ASGI middleware that caps the request body on one path. FastAPI receives and spools the
+    whole multipart body before the endpoint runs, so the limit has to be applied here: from
+    Content-Length up front, or while the body streams in when there is none (chunked uploads).
+    """
+    def __init__(self, app, path: str, max_bytes: int):
+        self.app = app
+        self.path = path
+        self.max_bytes = max_bytes
+
+    def _too_large(self) -> str:
+        return f"The upload is larger than {round(self.max_bytes / (1024 * 1024), 1):g} MB."
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["path"] != self.path:
+            return await self.app(scope, receive, send)
+        content_length = dict(scope["headers"]).get(b"content-length", b"")
+        if content_length.isdigit() and int(content_length) > self.max_bytes:
+            response = JSONResponse({"detail": self._too_large()}, status_code=413, headers={"Connection": "close"})
+            return await response(scope, receive, send)
+
+        received = 0
+        async def limited_receive():
+            nonlocal received
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > self.max_bytes:
+                    # FastAPI re-raises HTTPExceptions from body parsing, so this becomes a 413
+                    raise HTTPException(status_code=413, detail=self._too_large())
+            return message
+
+        await self.app(scope, limited_receive, send)
+
+# Innermost, so the early 413 still gets CORS headers and is timed like any other response
+app.add_middleware(UploadSizeLimit, path="/analyze/menu", max_bytes=MAX_MENU_UPLOAD_BYTES)
 
 # Add CORS middleware to allow all origins (for development)
 app.add_middleware(
@@ -29,6 +148,44 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+@app.middleware("http")
+async def record_request_timing(request: Request, call_next):
+    """
+    Records end-to-end latency per endpoint and collects per-stage timings for the request.
+    The timings are returned in a Server-Timing header when ENABLE_SERVER_TIMING=1 or the
+    client sends `X-Server-Timing: 1`.
+    """
+    known_paths = {route.path for route in app.routes}
+    endpoint = request.url.path if request.url.path in known_paths else "other"
+    timings = start_request(endpoint)
+    start_time = time.perf_counter()
+    response = await call_next(request)
+    elapsed = time.perf_counter() - start_time
+    REQUEST_LATENCY.observe(elapsed, endpoint, response.status_code)
+    if request.method == "POST" and response.status_code < 400:
+        startup_warmup.record_success()
+    if SERVER_TIMING_ALWAYS or request.headers.get("x-server-timing") == "1":
+        response.headers["Server-Timing"] = format_server_timing({**timings, "total": elapsed})
+    return response
+
+# Upper bound on how many analyses a single batch request may run at once
+MAX_BATCH_CONCURRENCY = int(os.getenv("MAX_BATCH_CONCURRENCY", "8"))
+
+# Generators available to /enrich, keyed by enrichment kind
+ENRICHERS = {
+    "dish_recommendations": aget_dish_recommendation,
+    "slogan": aget_slogan_generation,
+}
+
+# Rough output sizes used to budget tokens before a call is made
+ANALYSIS_OUTPUT_TOKEN_ESTIMATE = 1200
+ANALYSIS_TOKEN_ESTIMATE = estimate_tokens(ANALYSIS_PROMPT) + ANALYSIS_OUTPUT_TOKEN_ESTIMATE
+FOLLOW_UP_OUTPUT_TOKEN_ESTIMATE = 300
+
+# How often /search picks up analyses written by other workers
+SEARCH_INDEX_SYNC_SECONDS = float(os.getenv("SEARCH_INDEX_SYNC_SECONDS", "5"))
+SEARCH_RANK_COLUMNS = {"healthiness": "healthiness_rating", "hygiene": "hygiene_rating", "price": "price_rating"}
+
 # --- Pydantic Models for Request Bodies ---
 # These define the expected JSON structure for incoming requests
 
@@ -36,27 +193,274 @@ class AnalyzeRequest(BaseModel):
     restaurant_name: str
     analysis_type: str
     restaurant_location: str | None = None # Optional field
+    bypass_cache: bool = False   # Skip the cache entirely for this request
+    refresh_cache: bool = False  # Re-run the analysis and overwrite the cached result
+    fields: list[str] | None = None  # Only generate these fields; defaults depend on analysis_type
+
+class MenuAnalyzeRequest(AnalyzeRequest):
+    menu_text: str  # OCR'd menu; built by /analyze/menu from the uploaded photos
+
+class BatchAnalyzeRequest(BaseModel):
+    items: list[AnalyzeRequest]
+    concurrency: int = 8  # Capped by MAX_BATCH_CONCURRENCY
 
 class ChatbotRequest(BaseModel):
-    analysis_text_raw: str
+    analysis_id: str | None = None        # Returned by /analyze; preferred
+    analysis_text_raw: str | None = None  # Full analysis JSON, for clients without an id
     user_question: str
+    conversation_id: str | None = None    # Returned by the previous /chatbot reply; omit to start a new conversation
 
 class DishRecommendRequest(BaseModel):
-    analysis_text_raw: str
+    analysis_id: str | None = None        # Returned by /analyze; preferred
+    analysis_text_raw: str | None = None  # Full analysis JSON, for clients without an id
 
 class SloganGenerateRequest(BaseModel):
-    analysis_text_raw: str
+    analysis_id: str | None = None        # Returned by /analyze; preferred
+    analysis_text_raw: str | None = None  # Full analysis JSON, for clients without an id
+
+class SearchRequest(BaseModel):
+    location: str | None = None
+    diets: list[str] = []                 # Any of: vegetarian, vegan, gluten_free
+    dish: str | None = None               # Matches popular dishes containing this text
+    min_healthiness: float | None = None
+    min_hygiene: float | None = None
+    max_price: float | None = None
+    rank_by: str = "healthiness"          # healthiness, hygiene or price
+    ascending: bool = False               # e.g. rank_by="price", ascending=True for cheapest first
+    limit: int = 20
+
+class EnrichRequest(BaseModel):
+    analysis_id: str | None = None        # Returned by /analyze; preferred
+    analysis_text_raw: str | None = None  # Full analysis JSON, for clients without an id
+    kinds: list[str] = ["dish_recommendations", "slogan"]
+    stream: bool = False  # Stream one NDJSON line per kind as it completes
 
 # --- Helper Function ---
 
-def clean_json_response(text: str):
+def llm_error_to_http(e: Exception, endpoint: str) -> HTTPException:
+    """Maps an error raised while serving an LLM-backed endpoint to the HTTP error to return."""
+    if isinstance(e, HTTPException):
+        return e
+    if isinstance(e, RateLimitedError):
+        return HTTPException(status_code=429, detail=str(e), headers={"Retry-After": e.retry_after_header})
+    if isinstance(e, OverloadedError):
+        return HTTPException(status_code=503, detail=str(e))
+    if isinstance(e, BudgetTooSmallError):
+        return HTTPException(status_code=413, detail=str(e))
+    if isinstance(e, DeadlineExceededError):
+        return HTTPException(status_code=504, detail=str(e))
+    print(f"[{time.ctime()}] Error in {endpoint}: {e}")
+    return HTTPException(status_code=500, detail=str(e))
+
+# --- Analysis Helper ---
+
+def build_analysis_input(request: AnalyzeRequest) -> dict:
+    """Builds the input variables for the analysis prompt."""
+    restaurant_location_context = f"located in {request.restaurant_location}" if request.restaurant_location else ""
+    chain_input = {
+        "input": request.restaurant_name,
+        "analysis_type": request.analysis_type,
+        "restaurant_location_context": restaurant_location_context
+    }
+    if isinstance(request, MenuAnalyzeRequest):
+        chain_input["menu_text"] = request.menu_text
+    return chain_input
+
+def resolve_analysis_fields(request: AnalyzeRequest) -> list | None:
+    """
+    Returns the fields to generate for a request, in schema order, or None for the full analysis.
+    Explicit `fields` win; otherwise the analysis type's default field set is used.
+    """
+    if request.fields is None:
+        return ANALYSIS_TYPE_DEFAULT_FIELDS.get(normalize_key_part(request.analysis_type))
+    if not request.fields:
+        raise HTTPException(status_code=422, detail=f"fields must name at least one field, or be omitted. Available: {', '.join(ANALYSIS_FIELD_SCHEMA)}")
+    unknown_fields = [field for field in request.fields if field not in ANALYSIS_FIELD_SCHEMA]
+    if unknown_fields:
+        raise HTTPException(status_code=422, detail=f"Unknown analysis fields: {', '.join(unknown_fields)}. Available: {', '.join(ANALYSIS_FIELD_SCHEMA)}")
+    return [field for field in ANALYSIS_FIELD_SCHEMA if field in request.fields]
+
+def analysis_token_estimate(fields: list | None) -> int:
+    """Scales the expected output size by how many fields are requested."""
+    if fields is None:
+        return ANALYSIS_TOKEN_ESTIMATE
+    share = len(fields) / len(ANALYSIS_FIELD_SCHEMA)
+    return estimate_tokens(ANALYSIS_PROMPT) + int(ANALYSIS_OUTPUT_TOKEN_ESTIMATE * share)
+
+def parse_analysis_response(response_content: str, fields: list | None) -> tuple:
+    """
+    Extracts and validates the analysis from raw model output.
+    Returns (analysis, missing_fields); raises HTTPException if nothing can be recovered.
+    """
+    try:
+        with timed_stage("json_parse"):
+            return extract_analysis(response_content, fields)
+    except ExtractionError as e:
+        print(f"Warning: AI did not return valid JSON. Error: {e}. Raw content: {response_content}")
+        raise HTTPException(status_code=500, detail=f"Failed to parse AI response. Raw content: {response_content}")
+
+async def fill_missing_fields(request: AnalyzeRequest, analysis: dict, missing_fields: list,
+                              priority: int, wanted_fields: list | None) -> dict:
+    """
+    Last resort for output that parsed but left fields out: asks the model again for just those
+    fields. Anything still missing afterwards is set to None. Returns the analysis in schema order.
+    """
+    if missing_fields:
+        print(f"Warning: AI response is missing fields: {', '.join(missing_fields)}. Asking for them again.")
+        try:
+            analysis.update(await run_analysis(request, priority, missing_fields, allow_reask=False))
+        except Exception as e:
+            print(f"Warning: Re-asking for missing fields failed: {e}")
+    wanted = list(ANALYSIS_FIELD_SCHEMA) if wanted_fields is None else wanted_fields
+    return {field: analysis.get(field) for field in wanted}
+
+async def run_analysis(request: AnalyzeRequest, priority: int = PRIORITY_ANALYSIS, fields: list | None = None,
+                       allow_reask: bool = True) -> dict:
+    """
+    Runs the analysis chain for a single request and returns the validated analysis.
+    With `fields`, only those fields are generated and returned.
+    Raises HTTPException if the AI response cannot be parsed.
+    """
+    with_menu = isinstance(request, MenuAnalyzeRequest)
+    analysis_chain = get_restaurant_analysis_chain(fields, with_menu)
+    chain_input = build_analysis_input(request)
+    token_estimate = analysis_token_estimate(fields)
+    if with_menu:
+        token_estimate += estimate_tokens(request.menu_text)
+
+    print(f"[{time.ctime()}] Starting LLM analysis for: {request.restaurant_name}")
+    start_time = time.time()
+
+    async with llm_scheduler.slot(priority, token_estimate):
+        response = await ainvoke_chain(analysis_chain, chain_input)
+    response_content = response.content
+    usage = getattr(response, "usage_metadata", None) or {}
+    llm_scheduler.record_usage(token_estimate, usage.get("total_tokens"))
+
+    end_time = time.time()
+    print(f"[{time.ctime()}] LLM analysis completed in {end_time - start_time:.2f} seconds.")
+
+    parsed_analysis, missing_fields = parse_analysis_response(response_content, fields)
+    if not allow_reask:
+        return parsed_analysis
+    return await fill_missing_fields(request, parsed_analysis, missing_fields, priority, fields)
+
+async def load_or_run_analysis(request: AnalyzeRequest, cache_key: tuple, refresh: bool = False,
+                               priority: int = PRIORITY_ANALYSIS) -> dict:
+    """
+    Checks the on-disk store shared by all workers before paying for an LLM call,
+    and saves fresh results back to it.
+    """
+    if not refresh:
+        stored = await asyncio.to_thread(analysis_store.get, cache_key)
+        if stored is not None:
+            return stored
+
+    parsed_analysis = await run_analysis(request, priority)
+    await asyncio.to_thread(analysis_store.put, cache_key, parsed_analysis)
+    await asyncio.to_thread(restaurant_index.add, request.restaurant_name, request.restaurant_location, parsed_analysis)
+    return parsed_analysis
+
+# Field-selective results for a restaurant are merged into one record under this analysis type,
+# so fields generated for different requests add up instead of being generated again.
+PARTIAL_ANALYSIS_TYPE = "__fields__"
+FULL_ANALYSIS_TYPE = "Overall Analysis"
+
+async def lookup_known_fields(request: AnalyzeRequest, fields: list) -> dict:
+    """
+    Collects every field already known for the restaurant from full and partial analyses.
+    Counts a cache hit if that covers all of `fields`; the miss is counted where the rest are generated.
+    """
+    known = {}
+    for analysis_type in (FULL_ANALYSIS_TYPE, PARTIAL_ANALYSIS_TYPE):
+        key = make_analysis_key(request.restaurant_name, request.restaurant_location, analysis_type)
+        entry = analysis_cache.get(key) or await asyncio.to_thread(analysis_store.get, key)
+        if entry:
+            known.update(entry)
+    if all(field in known for field in fields):
+        analysis_cache.record_lookup(hit=True)
+    return known
+
+async def save_known_fields(request: AnalyzeRequest, fresh_fields: dict):
+    """Merges freshly generated fields into the restaurant's partial analysis record."""
+    key = make_analysis_key(request.restaurant_name, request.restaurant_location, PARTIAL_ANALYSIS_TYPE)
+    merged = {**(analysis_cache.get(key) or await asyncio.to_thread(analysis_store.get, key) or {}), **fresh_fields}
+    await asyncio.to_thread(analysis_store.put, key, merged)
+    analysis_cache.set(key, merged)
+    await asyncio.to_thread(restaurant_index.add, request.restaurant_name, request.restaurant_location, fresh_fields)
+
+async def generate_known_fields(request: AnalyzeRequest, fields: list, priority: int) -> dict:
+    """Asks the LLM for `fields` and merges them into the restaurant's partial analysis record."""
+    fresh_fields = await run_analysis(request, priority, fields)
+    await save_known_fields(request, fresh_fields)
+    return fresh_fields
+
+async def analyze_fields(request: AnalyzeRequest, fields: list, priority: int = PRIORITY_ANALYSIS) -> dict:
     """
-    Cleans the raw text output from the LLM to extract a valid JSON string.
+    Serves the requested fields, only asking the LLM for the ones not already known.
+    Concurrent requests missing the same fields share one LLM call.
     """
-    match = re.search(r'```json\s*([\s\S]*?)\s*```', text)
-    if match:
-        return match.group(1).strip()
-    return text.strip()
+    use_cached = not (request.bypass_cache or request.refresh_cache)
+    known = await lookup_known_fields(request, fields) if use_cached else {}
+    missing_fields = [field for field in fields if field not in known]
+    if missing_fields:
+        if request.bypass_cache:
+            fresh_fields = await run_analysis(request, priority, missing_fields)
+        else:
+            partial_key = make_analysis_key(request.restaurant_name, request.restaurant_location, PARTIAL_ANALYSIS_TYPE)
+            fresh_fields = await analysis_cache.get_or_compute(
+                (*partial_key, tuple(missing_fields)),
+                lambda: generate_known_fields(request, missing_fields, priority),
+                refresh=request.refresh_cache,
+            )
+        known.update(fresh_fields)
+    return {field: known[field] for field in fields}
+
+async def analyze_with_cache(request: AnalyzeRequest, priority: int = PRIORITY_ANALYSIS) -> dict:
+    """Serves an analysis from the cache layers, honouring the request's cache flags."""
+    fields = resolve_analysis_fields(request)
+    if fields is not None:
+        return await analyze_fields(request, fields, priority)
+
+    if request.bypass_cache:
+        return await run_analysis(request, priority)
+
+    cache_key = make_analysis_key(request.restaurant_name, request.restaurant_location, request.analysis_type)
+    return await analysis_cache.get_or_compute(
+        cache_key,
+        lambda: load_or_run_analysis(request, cache_key, refresh=request.refresh_cache, priority=priority),
+        refresh=request.refresh_cache,
+    )
+
+async def with_analysis_id(analysis: dict) -> dict:
+    """Registers a session for the analysis and returns a copy carrying its analysis_id."""
+    session = await analysis_sessions.create(analysis)
+    return {"analysis_id": session.analysis_id, **analysis}
+
+async def resolve_analysis_session(analysis_id: str | None, analysis_text_raw: str | None):
+    """
+    Finds the session a follow-up request refers to, preferring the analysis_id.
+    A raw analysis is validated like model output, so ratings such as "3/5" become numbers.
+    Raises HTTPException: 404 if the id is unknown, 422 if the raw analysis is not a valid analysis object.
+    """
+    if analysis_id:
+        session = await analysis_sessions.get(analysis_id)
+        if session is None:
+            raise HTTPException(status_code=404, detail="Analysis session not found or expired. Please run the analysis again.")
+        return session
+    if analysis_text_raw:
+        try:
+            parsed_analysis = json.loads(analysis_text_raw)
+        except ValueError as e:
+            raise HTTPException(status_code=422, detail=f"analysis_text_raw is not valid JSON: {e}")
+        if not isinstance(parsed_analysis, dict):
+            raise HTTPException(status_code=422, detail="analysis_text_raw must be a JSON object.")
+        try:
+            parsed_analysis, _ = validate_analysis(parsed_analysis)
+        except ExtractionError as e:
+            raise HTTPException(status_code=422, detail=f"analysis_text_raw is not a valid analysis: {e}")
+        return await analysis_sessions.create(parsed_analysis)
+    raise HTTPException(status_code=422, detail="Either analysis_id or analysis_text_raw is required.")
 
 # --- API Endpoints ---
 
@@ -64,74 +468,400 @@ def clean_json_response(text: str):
 async def analyze_restaurant(request: AnalyzeRequest):
     """
     API endpoint for initial restaurant analysis.
+    Results are served from the in-memory cache when possible.
     """
     try:
-        restaurant_location_context = f"located in {request.restaurant_location}" if request.restaurant_location else ""
-        analysis_chain = get_restaurant_analysis_chain()
-
-        chain_input = {
-            "input": request.restaurant_name,
-            "analysis_type": request.analysis_type,
-            "restaurant_location_context": restaurant_location_context
-        }
-        
-        print(f"[{time.ctime()}] Starting LLM analysis for: {request.restaurant_name}")
-        start_time = time.time()
+        return await with_analysis_id(await analyze_with_cache(request))
+    except Exception as e:
+        raise llm_error_to_http(e, "/analyze")
 
-        response = analysis_chain.invoke(chain_input)
-        response_content = response.content
+@app.post('/analyze/stream')
+async def analyze_restaurant_stream(request: AnalyzeRequest):
+    """
+    Streaming variant of /analyze using Server-Sent Events.
+    Emits a `field` event for each top-level field as soon as the model has finished writing it,
+    then a `complete` event with the full parsed analysis (or an `error` event).
+    """
+    cache_key = make_analysis_key(request.restaurant_name, request.restaurant_location, request.analysis_type)
+    fields = resolve_analysis_fields(request)
 
-        end_time = time.time()
-        print(f"[{time.ctime()}] LLM analysis completed in {end_time - start_time:.2f} seconds.")
+    async def event_stream():
+        cached = None
+        known = {}
+        if not (request.bypass_cache or request.refresh_cache):
+            if fields is None:
+                cached = analysis_cache.get(cache_key) or await asyncio.to_thread(analysis_store.get, cache_key)
+                analysis_cache.record_lookup(hit=cached is not None)
+            else:
+                known = await lookup_known_fields(request, fields)
+                if all(field in known for field in fields):
+                    cached = {field: known[field] for field in fields}
+                else:
+                    analysis_cache.record_lookup(hit=False)
+        if cached is not None:
+            for field, value in cached.items():
+                yield format_sse("field", {"field": field, "value": value})
+            yield format_sse("complete", await with_analysis_id(cached))
+            return
 
-        cleaned_json_string = clean_json_response(response_content)
+        # Fields that are already known are sent straight away; only the rest are generated
+        missing_fields = None
+        if fields is not None:
+            missing_fields = [field for field in fields if field not in known]
+            for field in fields:
+                if field in known:
+                    yield format_sse("field", {"field": field, "value": known[field]})
 
         try:
-            parsed_analysis = json.loads(cleaned_json_string)
-            return parsed_analysis
-        except json.JSONDecodeError as e:
-            print(f"Warning: AI did not return valid JSON. Error: {e}. Cleaned content: {cleaned_json_string}")
-            raise HTTPException(status_code=500, detail=f"Failed to parse AI response. Raw content: {response_content}")
+            analysis_chain = get_restaurant_analysis_chain(missing_fields)
+            chain_input = build_analysis_input(request)
+            print(f"[{time.ctime()}] Starting streamed LLM analysis for: {request.restaurant_name}")
+            start_time = time.time()
 
+            parser = IncrementalJSONFieldParser()
+            chunks = []
+            streamed_fields = set()
+            async with llm_scheduler.slot(PRIORITY_ANALYSIS, analysis_token_estimate(missing_fields)):
+                async for chunk in astream_chain(analysis_chain, chain_input):
+                    chunks.append(chunk.content)
+                    for field, value in parser.feed(chunk.content):
+                        if field in (missing_fields or ANALYSIS_FIELD_SCHEMA):
+                            try:
+                                value = normalize_field(field, value)
+                            except ExtractionError:
+                                continue  # Left to the full parse below, which also decides the error
+                            streamed_fields.add(field)
+                            yield format_sse("field", {"field": field, "value": value})
+
+            print(f"[{time.ctime()}] Streamed LLM analysis completed in {time.time() - start_time:.2f} seconds.")
+            response_content = "".join(chunks)
+            parsed_analysis, reask_fields = parse_analysis_response(response_content, missing_fields)
+            parsed_analysis = await fill_missing_fields(request, parsed_analysis, reask_fields, PRIORITY_ANALYSIS, missing_fields)
+            # Send whatever the incremental parser could not (repaired or re-asked fields)
+            for field, value in parsed_analysis.items():
+                if field not in streamed_fields:
+                    yield format_sse("field", {"field": field, "value": value})
+
+            if fields is None:
+                if not request.bypass_cache:
+                    await asyncio.to_thread(analysis_store.put, cache_key, parsed_analysis)
+                    analysis_cache.set(cache_key, parsed_analysis)
+                    await asyncio.to_thread(restaurant_index.add, request.restaurant_name, request.restaurant_location, parsed_analysis)
+            else:
+                if not request.bypass_cache:
+                    await save_known_fields(request, parsed_analysis)
+                known.update(parsed_analysis)
+                parsed_analysis = {field: known[field] for field in fields}
+            yield format_sse("complete", await with_analysis_id(parsed_analysis))
+
+        except Exception as e:
+            http_error = llm_error_to_http(e, "/analyze/stream")
+            yield format_sse("error", {
+                "status_code": http_error.status_code,
+                "detail": http_error.detail,
+                "retry_after": (http_error.headers or {}).get("Retry-After"),
+            })
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+async def read_upload(upload: UploadFile) -> bytes:
+    """Reads an uploaded page, rejecting it if it is over MAX_MENU_IMAGE_BYTES (UploadSizeLimit caps the whole body)."""
+    chunks = []
+    size = 0
+    while chunk := await upload.read(UPLOAD_CHUNK_BYTES):
+        size += len(chunk)
+        if size > MAX_MENU_IMAGE_BYTES:
+            raise HTTPException(status_code=413, detail=f"{upload.filename} is larger than {MAX_MENU_IMAGE_BYTES // (1024 * 1024)} MB.")
+        chunks.append(chunk)
+    return b"".join(chunks)
+
+@app.post('/analyze/menu')
+async def analyze_menu(
+    restaurant_name: str = Form(...),
+    analysis_type: str = Form("Overall Analysis"),
+    restaurant_location: str | None = Form(None),
+    fields: str | None = Form(None),  # Comma-separated, as for /analyze
+    menu_images: list[UploadFile] = File(...),
+):
+    """
+    Analyses a restaurant from uploaded photos of its menu (multipart/form-data, one file per page).
+    Pages are OCR'd in parallel in a process pool; text is cached by image hash, and the analysis
+    by the combination of pages, so re-uploading the same menu makes no OCR or LLM call.
+    """
+    if len(menu_images) > MAX_MENU_PAGES:
+        raise HTTPException(status_code=413, detail=f"At most {MAX_MENU_PAGES} menu pages can be uploaded at once.")
+    pages = [await read_upload(upload) for upload in menu_images]
+
+    try:
+        with timed_stage("ocr"):
+            page_texts = await menu_ocr.extract_text(pages)
+    except OCRError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except OCRUnavailableError as e:
+        raise HTTPException(status_code=503, detail=f"Menu OCR is not available on this server: {e}")
+    menu_text = "\n\n".join(text for text in page_texts if text)[:MAX_MENU_TEXT_CHARS]
+    if not menu_text.strip():
+        raise HTTPException(status_code=422, detail="No text could be read from the menu images.")
+
+    request = MenuAnalyzeRequest(
+        restaurant_name=restaurant_name,
+        analysis_type=analysis_type,
+        restaurant_location=restaurant_location,
+        fields=[field.strip() for field in fields.split(",") if field.strip()] if fields else None,
+        menu_text=menu_text,
+    )
+    analysis_fields = resolve_analysis_fields(request)
+    menu_hash = image_hash("".join(image_hash(page) for page in pages).encode())
+    cache_key = (*make_analysis_key(restaurant_name, restaurant_location, analysis_type), tuple(analysis_fields or ()), menu_hash)
+    try:
+        analysis = await analysis_cache.get_or_compute(cache_key, lambda: run_analysis(request, PRIORITY_ANALYSIS, analysis_fields))
     except Exception as e:
-        print(f"[{time.ctime()}] Error in /analyze: {e}")
-        error_message = str(e)
-        if "quota" in error_message.lower():
-            error_message = "You have exceeded the API quota. Please check your billing status or try again later."
-        raise HTTPException(status_code=500, detail=error_message)
+        raise llm_error_to_http(e, "/analyze/menu")
+    await asyncio.to_thread(restaurant_index.add, restaurant_name, restaurant_location, analysis)
+    return await with_analysis_id(analysis)
+
+@app.post('/analyze/batch')
+async def analyze_restaurant_batch(request: BatchAnalyzeRequest):
+    """
+    Analyses a list of restaurants in parallel and streams one NDJSON line per restaurant
+    in completion order. A failing item is reported on its own line and does not stop the batch.
+    """
+    concurrency = max(1, min(request.concurrency, MAX_BATCH_CONCURRENCY))
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def analyze_item(index: int, item: AnalyzeRequest) -> dict:
+        result = {"index": index, "restaurant_name": item.restaurant_name}
+        async with semaphore:
+            try:
+                result["analysis"] = await with_analysis_id(await analyze_with_cache(item, PRIORITY_BATCH))
+                result["ok"] = True
+            except Exception as e:
+                http_error = llm_error_to_http(e, "/analyze/batch")
+                result.update(ok=False, status_code=http_error.status_code, error=http_error.detail)
+                if http_error.headers:
+                    result["retry_after"] = http_error.headers.get("Retry-After")
+        return result
+
+    async def ndjson_stream():
+        print(f"[{time.ctime()}] Starting batch analysis of {len(request.items)} restaurants (concurrency {concurrency})")
+        start_time = time.time()
+        tasks = [asyncio.ensure_future(analyze_item(i, item)) for i, item in enumerate(request.items)]
+        try:
+            for next_done in asyncio.as_completed(tasks):
+                yield json.dumps(await next_done) + "\n"
+        finally:
+            # If the client disconnects, stop the work that is still pending
+            for task in tasks:
+                task.cancel()
+        print(f"[{time.ctime()}] Batch analysis completed in {time.time() - start_time:.2f} seconds.")
+
+    return StreamingResponse(ndjson_stream(), media_type="application/x-ndjson")
+
+@app.get('/cache/stats')
+async def cache_stats():
+    """Reports hit/miss counters and size of the analysis cache."""
+    return {**analysis_cache.stats(), "stored_entries": await asyncio.to_thread(analysis_store.count)}
 
 
 @app.post('/chatbot')
 async def chatbot_query(request: ChatbotRequest):
     """
     API endpoint for chatbot follow-up questions.
+    Replies carry a conversation_id; sending it back lets the chatbot follow up on earlier turns.
     """
     try:
         print(f"[{time.ctime()}] Starting chatbot query for user: '{request.user_question}'")
-        bot_response = get_chatbot_response(request.analysis_text_raw, request.user_question)
+        session = await resolve_analysis_session(request.analysis_id, request.analysis_text_raw)
+        conversation = await chatbot_conversations.get_or_create(request.conversation_id, session.analysis_id)
+
+        # Simple lookups are answered straight from the analysis without calling the LLM
+        fast_answer = fast_path_answerer.answer(request.user_question, session.analysis)
+        if fast_answer is not None:
+            print(f"[{time.ctime()}] Chatbot query answered from analysis data.")
+            conversation.add_turn(request.user_question, fast_answer)
+            await chatbot_conversations.save(conversation)
+            return {"response": fast_answer, "conversation_id": conversation.conversation_id}
+
+        context = session.chatbot_context()
+        history = conversation.render()
+        # The previous question helps place follow-ups like "and for kids?" in context
+        details = session.chatbot_details(f"{conversation.last_question()} {request.user_question}")
+        token_estimate = estimate_tokens(context + history + details + request.user_question) + FOLLOW_UP_OUTPUT_TOKEN_ESTIMATE
+        try:
+            async with llm_scheduler.slot(PRIORITY_INTERACTIVE, token_estimate):
+                bot_response = await aget_chatbot_response(context, request.user_question, history, details)
+        except ChatbotError as e:
+            # Apologise, but keep the failed turn out of the history later prompts carry
+            return {"response": e.reply, "conversation_id": conversation.conversation_id}
+        conversation.add_turn(request.user_question, bot_response)
+        await chatbot_conversations.save(conversation)
         print(f"[{time.ctime()}] Chatbot query completed.")
-        return {"response": bot_response}
+        return {"response": bot_response, "conversation_id": conversation.conversation_id}
 
     except Exception as e:
-        print(f"[{time.ctime()}] Error in /chatbot: {e}")
-        error_message = str(e)
-        if "quota" in error_message.lower():
-            error_message = "You have exceeded the API quota for the chatbot. Please try again later."
-        raise HTTPException(status_code=500, detail=error_message)
+        raise llm_error_to_http(e, "/chatbot")
+
+@app.post('/enrich')
+async def enrich_analysis(request: EnrichRequest):
+    """
+    Runs several enrichment generators (dish recommendations, slogan, ...) for one analysis
+    concurrently, sharing the formatted context. Returns all results together, or streams
+    one NDJSON line per kind as each finishes when `stream` is set.
+    """
+    unknown_kinds = [kind for kind in request.kinds if kind not in ENRICHERS]
+    if unknown_kinds:
+        raise HTTPException(status_code=422, detail=f"Unknown enrichment kinds: {', '.join(unknown_kinds)}. Available: {', '.join(ENRICHERS)}")
+    kinds = list(dict.fromkeys(request.kinds))  # Drop duplicates, keep order
+
+    try:
+        session = await resolve_analysis_session(request.analysis_id, request.analysis_text_raw)
+    except Exception as e:
+        raise llm_error_to_http(e, "/enrich")
+    token_estimate = estimate_tokens(session.context) + FOLLOW_UP_OUTPUT_TOKEN_ESTIMATE
+
+    async def run_enricher(kind: str) -> dict:
+        try:
+            async with llm_scheduler.slot(PRIORITY_BATCH, token_estimate):
+                return {"kind": kind, "ok": True, "result": await ENRICHERS[kind](session.context)}
+        except Exception as e:
+            http_error = llm_error_to_http(e, f"/enrich ({kind})")
+            return {"kind": kind, "ok": False, "status_code": http_error.status_code, "error": http_error.detail}
+
+    if not request.stream:
+        outcomes = await asyncio.gather(*(run_enricher(kind) for kind in kinds))
+        return {
+            "analysis_id": session.analysis_id,
+            "results": {o["kind"]: o["result"] for o in outcomes if o["ok"]},
+            "errors": {o["kind"]: {"status_code": o["status_code"], "detail": o["error"]} for o in outcomes if not o["ok"]},
+        }
+
+    async def ndjson_stream():
+        tasks = [asyncio.ensure_future(run_enricher(kind)) for kind in kinds]
+        try:
+            for next_done in asyncio.as_completed(tasks):
+                yield json.dumps(await next_done) + "\n"
+        finally:
+            for task in tasks:
+                task.cancel()
+
+    return StreamingResponse(ndjson_stream(), media_type="application/x-ndjson")
+
+@app.post('/search')
+async def search_restaurants(request: SearchRequest):
+    """
+    Filters and ranks every analysed restaurant from the in-memory columnar index.
+    No LLM call is made; only restaurants that were analysed before are found.
+    """
+    unknown_diets = [diet for diet in request.diets if diet not in DIET_FLAGS]
+    if unknown_diets:
+        raise HTTPException(status_code=400, detail=f"Unknown diets: {', '.join(unknown_diets)}. Expected any of: {', '.join(DIET_FLAGS)}.")
+    if request.rank_by not in SEARCH_RANK_COLUMNS:
+        raise HTTPException(status_code=400, detail=f"rank_by must be one of: {', '.join(SEARCH_RANK_COLUMNS)}.")
+    if not 1 <= request.limit <= 100:
+        raise HTTPException(status_code=400, detail="limit must be between 1 and 100.")
+
+    with timed_stage("index_sync"):
+        if time.time() - restaurant_index.last_sync_time >= SEARCH_INDEX_SYNC_SECONDS:
+            await asyncio.to_thread(restaurant_index.sync, analysis_store)
+    with timed_stage("index_query"):
+        results = await asyncio.to_thread(
+            restaurant_index.search,
+            location=request.location,
+            diets=request.diets,
+            dish=request.dish,
+            min_healthiness=request.min_healthiness,
+            min_hygiene=request.min_hygiene,
+            max_price=request.max_price,
+            rank_by=SEARCH_RANK_COLUMNS[request.rank_by],
+            ascending=request.ascending,
+            limit=request.limit,
+        )
+    return {"results": results, "indexed_restaurants": len(restaurant_index)}
+
+@app.get('/metrics')
+async def metrics():
+    """Prometheus scrape endpoint: request/stage latency histograms, token counts and cache stats."""
+    cache = analysis_cache.stats()
+    fast_path = fast_path_answerer.stats()
+    scheduler = llm_scheduler.stats()
+    hedging = hedged_caller.stats().values()
+    warmup = startup_warmup.status()
+    gauges = {
+        "restaurant_worker_ready": ("1 once startup warm-up has finished.", int(warmup["ready"])),
+        "restaurant_worker_import_seconds": ("Time taken to import the app.", warmup["import_seconds"] or 0),
+        "restaurant_worker_warmup_seconds": ("Time taken by startup warm-up.", warmup["warmup_seconds"] or 0),
+        "restaurant_worker_first_success_seconds": ("Time from startup to the first successful request.", warmup["first_success_seconds"] or 0),
+        "restaurant_analysis_cache_hits": ("Analysis cache hits.", cache["hits"]),
+        "restaurant_analysis_cache_misses": ("Analysis cache misses.", cache["misses"]),
+        "restaurant_analysis_cache_coalesced": ("Requests that joined an in-flight analysis.", cache["coalesced"]),
+        "restaurant_analysis_cache_hit_ratio": ("Analysis cache hit ratio.", cache["hit_rate"]),
+        "restaurant_analysis_cache_entries": ("Entries in the analysis cache.", cache["entries"]),
+        "restaurant_chatbot_questions": ("Chatbot questions received.", fast_path["questions"]),
+        "restaurant_chatbot_fast_path_answers": ("Chatbot questions answered without the LLM.", fast_path["answered_without_llm"]),
+        "restaurant_search_index_rows": ("Restaurants in the search index.", len(restaurant_index)),
+        "restaurant_llm_in_flight": ("LLM calls in progress.", scheduler["in_flight"]),
+        "restaurant_llm_waiting": ("LLM calls queued for a slot.", scheduler["waiting"]),
+        "restaurant_llm_rate_limited": ("Calls rejected by the local rate budget.", scheduler["rate_limited"]),
+        "restaurant_llm_provider_quota_errors": ("Quota errors returned by the provider.", scheduler["provider_quota_errors"]),
+        "restaurant_llm_hedged_calls": ("LLM calls hedged or retried on the fallback model.", sum(kind["hedged"] + kind["fallbacks"] for kind in hedging)),
+        "restaurant_llm_hedge_wins": ("Hedged calls where the hedge answered first.", sum(kind["hedge_wins"] for kind in hedging)),
+        "restaurant_llm_hedges_denied": ("Hedges skipped because of the hedge or rate budget.", sum(kind["budget_denied"] for kind in hedging)),
+        "restaurant_llm_deadline_exceeded": ("LLM calls that missed their deadline.", sum(kind["deadline_exceeded"] for kind in hedging)),
+    }
+    return PlainTextResponse(render_prometheus(gauges), media_type="text/plain; version=0.0.4")
+
+@app.get('/scheduler/stats')
+async def scheduler_stats():
+    """Reports remaining rate budgets, queue depth and rate-limit counters."""
+    return llm_scheduler.stats()
+
+@app.get('/ready')
+async def readiness():
+    """
+    Readiness probe: 200 once startup warm-up has finished, 503 before that.
+    Also reports import time, warm-up time per step and time to the first successful request.
+    """
+    status = startup_warmup.status()
+    return JSONResponse(status, status_code=200 if status["ready"] else 503)
+
+@app.get('/hedging/stats')
+async def hedging_stats():
+    """Reports, per kind of LLM call, hedge and fallback rates, hedge win rate and deadline misses."""
+    return hedged_caller.stats()
+
+@app.get('/ocr/stats')
+async def ocr_stats():
+    """Reports OCR pool size, pages recognised and the OCR text cache hit rate."""
+    return menu_ocr.stats()
+
+@app.get('/chatbot/stats')
+async def chatbot_stats():
+    """Reports how many chatbot questions were answered without an LLM call, per intent."""
+    return fast_path_answerer.stats()
 
 @app.post('/recommend_dishes')
 async def recommend_dishes(request: DishRecommendRequest):
     try:
-        recommendations = get_dish_recommendation(request.analysis_text_raw)
+        session = await resolve_analysis_session(request.analysis_id, request.analysis_text_raw)
+        token_estimate = estimate_tokens(session.context) + FOLLOW_UP_OUTPUT_TOKEN_ESTIMATE
+        async with llm_scheduler.slot(PRIORITY_BATCH, token_estimate):
+            recommendations = await aget_dish_recommendation(session.context)
         return {"recommendations": recommendations}
     except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+        raise llm_error_to_http(e, "/recommend_dishes")
 
 @app.post('/generate_slogan')
 async def generate_slogan(request: SloganGenerateRequest):
     try:
-        slogan = get_slogan_generation(request.analysis_text_raw)
+        session = await resolve_analysis_session(request.analysis_id, request.analysis_text_raw)
+        token_estimate = estimate_tokens(session.context) + FOLLOW_UP_OUTPUT_TOKEN_ESTIMATE
+        async with llm_scheduler.slot(PRIORITY_BATCH, token_estimate):
+            slogan = await aget_slogan_generation(session.context)
         return {"slogan": slogan}
     except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+        raise llm_error_to_http(e, "/generate_slogan")
 
@@ -0,0 +1,138 @@
+import os
+import time
+import threading
+import contextvars
+from contextlib import contextmanager
+
+# --- Metrics ---
+# A small in-process registry of counters and histograms rendered in the Prometheus text
+# format by /metrics. Request handlers record how long each stage took (chain construction,
+# prompt rendering, LLM wait, JSON parsing, context formatting) and how many tokens were used,
+# so slowness can be attributed to our code or to the provider.
+
+# Latency buckets in seconds, from sub-millisecond parsing up to long LLM generations
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+# Whether every response carries a Server-Timing header; clients can also ask per request
+SERVER_TIMING_ALWAYS = os.getenv("ENABLE_SERVER_TIMING", "0") == "1"
+
+def _format_labels(label_names: tuple, label_values: tuple, extra: str = "") -> str:
+    parts = [f'{name}="{str(value)}"' for name, value in zip(label_names, label_values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+class Counter:
+    def __init__(self, name: str, help_text: str, label_names: tuple = ()):
+        self.name = name
+        self.help_text = help_text
+        self.label_names = label_names
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *label_values, amount: float = 1):
+        with self._lock:
+            self._values[label_values] = self._values.get(label_values, 0) + amount
+
+    def render(self) -> list:
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            for label_values, value in sorted(self._values.items()):
+                lines.append(f"{self.name}{_format_labels(self.label_names, label_values)} {value}")
+        return lines
+
+class Histogram:
+    def __init__(self, name: str, help_text: str, label_names: tuple = (), buckets: tuple = DEFAULT_BUCKETS):
+        self.name = name
+        self.help_text = help_text
+        self.label_names = label_names
+        self.buckets = buckets
+        self._series = {}  # label values -> [bucket counts..., sum, count]
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, *label_values):
+        with self._lock:
+            series = self._series.get(label_values)
+            if series is None:
+                series = self._series[label_values] = [0] * (len(self.buckets) + 2)
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[i] += 1
+            series[-2] += value
+            series[-1] += 1
+
+    def render(self) -> list:
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            for label_values, series in sorted(self._series.items()):
+                for bound, count in zip(self.buckets, series):
+                    labels = _format_labels(self.label_names, label_values, 'le="%s"' % bound)
+                    lines.append(f"{self.name}_bucket{labels} {count}")
+                labels = _format_labels(self.label_names, label_values, 'le="+Inf"')
+                lines.append(f"{self.name}_bucket{labels} {series[-1]}")
+                lines.append(f"{self.name}_sum{_format_labels(self.label_names, label_values)} {series[-2]}")
+                lines.append(f"{self.name}_count{_format_labels(self.label_names, label_values)} {series[-1]}")
+        return lines
+
+REQUEST_LATENCY = Histogram("restaurant_request_duration_seconds", "End-to-end request latency.", ("endpoint", "status"))
+STAGE_LATENCY = Histogram("restaurant_stage_duration_seconds", "Time spent in each stage of a request.", ("endpoint", "stage"))
+LLM_TOKENS = Counter("restaurant_llm_tokens_total", "Tokens sent to and received from the LLM.", ("endpoint", "kind"))
+LLM_CALLS = Counter("restaurant_llm_calls_total", "LLM calls made, by outcome.", ("endpoint", "outcome"))
+
+# --- Per-Request Timing ---
+# The middleware in main.py stores the endpoint and a dict of stage timings here, so code deep
+# in the call stack can attribute what it measures to the request it is serving.
+_current_endpoint = contextvars.ContextVar("current_endpoint", default="none")
+_current_timings = contextvars.ContextVar("current_timings", default=None)
+
+def start_request(endpoint: str) -> dict:
+    """Begins collecting stage timings for a request; returns the dict they are added to."""
+    timings = {}
+    _current_endpoint.set(endpoint)
+    _current_timings.set(timings)
+    return timings
+
+def current_endpoint() -> str:
+    return _current_endpoint.get()
+
+def record_stage(stage: str, seconds: float):
+    STAGE_LATENCY.observe(seconds, _current_endpoint.get(), stage)
+    timings = _current_timings.get()
+    if timings is not None:
+        timings[stage] = timings.get(stage, 0.0) + seconds
+
+@contextmanager
+def timed_stage(stage: str):
+    """Times the enclosed block as one stage of the current request."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        record_stage(stage, time.perf_counter() - start)
+
+def record_llm_usage(usage: dict | None):
+    """Counts prompt/completion tokens from a LangChain usage_metadata dict."""
+    endpoint = _current_endpoint.get()
+    LLM_CALLS.inc(endpoint, "ok")
+    if usage:
+        LLM_TOKENS.inc(endpoint, "prompt", amount=usage.get("input_tokens", 0))
+        LLM_TOKENS.inc(endpoint, "completion", amount=usage.get("output_tokens", 0))
+
+def record_llm_failure():
+    LLM_CALLS.inc(_current_endpoint.get(), "error")
+
+def format_server_timing(timings: dict) -> str:
+    """Formats stage timings as a Server-Timing header value (durations in milliseconds)."""
+    return ", ".join(f"{stage};dur={seconds * 1000:.1f}" for stage, seconds in timings.items())
+
+def render_prometheus(gauges: dict | None = None) -> str:
+    """
+    Renders every metric in the Prometheus text format. `gauges` adds point-in-time values
+    (e.g. cache hit counts) as {name: (help text, value)}.
+    """
+    lines = []
+    for metric in (REQUEST_LATENCY, STAGE_LATENCY, LLM_TOKENS, LLM_CALLS):
+        lines.extend(metric.render())
+    for name, (help_text, value) in (gauges or {}).items():
+        lines.extend([f"# HELP {name} {help_text}", f"# TYPE {name} gauge", f"{name} {value}"])
+    return "\n".join(lines) + "\n"
@@ -0,0 +1,138 @@
+import io
+import os
+import asyncio
+import hashlib
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from cache import AnalysisCache
+
+# --- Menu OCR ---
+# Turns uploaded menu photos into text for the analysis prompt. Decoding, downscaling, binarising
+# and Tesseract all run in a process pool, so OCR neither blocks the event loop nor holds the GIL,
+# and the pages of a multi-page menu are recognised in parallel. Results are cached by the hash
+# of the image bytes, so re-uploading the same photo costs nothing.
+
+# Longest side, in pixels, images are downscaled to before OCR
+OCR_MAX_IMAGE_SIDE = int(os.getenv("OCR_MAX_IMAGE_SIDE", "2000"))
+# OCR processes per app worker. Every gunicorn/uvicorn worker starts its own pool, so by default
+# the cores are split between the WEB_CONCURRENCY app workers instead of each taking all of them.
+WEB_CONCURRENCY = max(1, int(os.getenv("WEB_CONCURRENCY", "1")))
+OCR_WORKERS = int(os.getenv("OCR_WORKERS", str(max(1, (os.cpu_count() or 1) // WEB_CONCURRENCY))))
+OCR_LANGUAGE = os.getenv("OCR_LANGUAGE", "eng")
+OCR_CACHE_MAX_ENTRIES = int(os.getenv("OCR_CACHE_MAX_ENTRIES", "1024"))
+OCR_CACHE_TTL_SECONDS = float(os.getenv("OCR_CACHE_TTL_SECONDS", str(7 * 24 * 3600)))
+
+class OCRError(Exception):
+    """Raised when an uploaded page cannot be read as an image."""
+
+class OCRUnavailableError(Exception):
+    """Raised when pytesseract or the tesseract binary is not installed on this host."""
+
+def image_hash(data: bytes) -> str:
+    return hashlib.sha256(data).hexdigest()
+
+def _otsu_threshold(histogram: list) -> int:
+    """Picks the grey level that best separates ink from paper (Otsu's method)."""
+    total = sum(histogram)
+    weighted_total = sum(level * count for level, count in enumerate(histogram))
+    background = background_sum = 0
+    best_threshold, best_variance = 127, -1.0
+    for level, count in enumerate(histogram):
+        background += count
+        if background == 0:
+            continue
+        foreground = total - background
+        if foreground == 0:
+            break
+        background_sum += level * count
+        background_mean = background_sum / background
+        foreground_mean = (weighted_total - background_sum) / foreground
+        variance = background * foreground * (background_mean - foreground_mean) ** 2
+        if variance > best_variance:
+            best_threshold, best_variance = level, variance
+    return best_threshold
+
+def preprocess_image(data: bytes, max_side: int = OCR_MAX_IMAGE_SIDE):
+    """Decodes an image, downscales it to at most `max_side` pixels and binarises it to black on white."""
+    from PIL import Image, ImageOps
+
+    try:
+        image = Image.open(io.BytesIO(data))
+        # For JPEGs this decodes straight to greyscale at a reduced scale, which is much cheaper
+        image.draft("L", (max_side, max_side))
+        image = ImageOps.exif_transpose(image).convert("L")
+    except Exception:
+        raise OCRError("An uploaded page is not a readable image.")
+    image.thumbnail((max_side, max_side))
+    image = ImageOps.autocontrast(image)
+    threshold = _otsu_threshold(image.histogram())
+    return image.point(lambda level: 255 if level > threshold else 0, mode="1")
+
+def ocr_page(data: bytes) -> str:
+    """Runs in a pool process: preprocesses one page and returns its text."""
+    try:
+        import pytesseract
+    except ImportError:
+        raise OCRUnavailableError("pytesseract is not installed.")
+    image = preprocess_image(data)
+    try:
+        # psm 4: a single column of text of variable sizes, which suits most menus
+        return pytesseract.image_to_string(image, lang=OCR_LANGUAGE, config="--psm 4").strip()
+    except pytesseract.TesseractNotFoundError:
+        raise OCRUnavailableError("The tesseract binary is not installed.")
+
+class MenuOCR:
+    def __init__(self, workers: int = OCR_WORKERS, cache: AnalysisCache | None = None):
+        self.workers = max(1, workers)
+        self.cache = cache
+        self._executor = None
+        self.pages_recognised = 0
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        if self._executor is None:
+            # spawn rather than fork: forking a process that runs an event loop and threads is unsafe
+            self._executor = ProcessPoolExecutor(self.workers, mp_context=multiprocessing.get_context("spawn"))
+        return self._executor
+
+    async def _recognise(self, data: bytes) -> str:
+        loop = asyncio.get_running_loop()
+        executor = self._get_executor()
+        try:
+            text = await loop.run_in_executor(executor, ocr_page, data)
+        except BrokenProcessPool:
+            # A worker died (e.g. killed for memory); start a fresh pool for the next request
+            if self._executor is executor:
+                self._executor = None
+            raise OCRUnavailableError("An OCR worker process crashed.")
+        self.pages_recognised += 1
+        return text
+
+    async def extract_text(self, pages: list) -> list:
+        """Returns the text of each page (raw image bytes), recognising uncached pages in parallel."""
+        async def page_text(data: bytes) -> str:
+            if self.cache is None:
+                return await self._recognise(data)
+            # Identical pages uploaded at the same time share one OCR run
+            return await self.cache.get_or_compute(image_hash(data), lambda: self._recognise(data))
+
+        return list(await asyncio.gather(*(page_text(data) for data in pages)))
+
+    def warm_up(self):
+        """Starts the pool processes ahead of the first upload."""
+        executor = self._get_executor()
+        for future in [executor.submit(os.getpid) for _ in range(self.workers)]:
+            future.result()
+
+    def stats(self) -> dict:
+        cache = self.cache.stats() if self.cache is not None else {}
+        return {"workers": self.workers, "pages_recognised": self.pages_recognised, **{f"cache_{k}": v for k, v in cache.items()}}
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(cancel_futures=True)
+            self._executor = None
+
+# Shared OCR pool and cache for this worker
+menu_ocr = MenuOCR(cache=AnalysisCache(max_entries=OCR_CACHE_MAX_ENTRIES, ttl_seconds=OCR_CACHE_TTL_SECONDS))
@@ -0,0 +1,82 @@
+"""
+Benchmark for the menu OCR pool behind /analyze/menu.
+
+Renders synthetic menu pages, then OCRs them with pools of increasing size and reports wall time,
+pages per second and speedup over a single worker. Pages are independent, so the speedup should
+stay close to the worker count until it reaches the number of cores.
+
+Needs Pillow, pytesseract and the tesseract binary.
+
+Usage:
+    python ocr_benchmark.py [--pages 8] [--workers 1,2,4,8] [--rounds 3]
+"""
+import io
+import os
+import time
+import random
+import asyncio
+import argparse
+
+from ocr import MenuOCR
+
+DISHES = ["Chicken Biryani", "Masala Dosa", "Paneer Tikka", "Butter Chicken", "Veg Thali", "Haleem",
+          "Pav Bhaji", "Idli Sambar", "Chole Bhature", "Gobi Manchurian", "Mango Lassi", "Gulab Jamun"]
+
+def render_menu_page(rng: random.Random, page: int) -> bytes:
+    """Draws a photo-sized menu page (dish names and prices) and returns it as JPEG bytes."""
+    from PIL import Image, ImageDraw, ImageFont
+
+    image = Image.new("RGB", (2480, 3508), (250, 246, 235))
+    draw = ImageDraw.Draw(image)
+    font = ImageFont.load_default(size=64)
+    draw.text((200, 150), f"MENU - PAGE {page + 1}", fill=(20, 20, 20), font=font)
+    for line in range(30):
+        dish = rng.choice(DISHES)
+        draw.text((200, 350 + line * 100), f"{dish:<30} Rs. {rng.randint(80, 600)}", fill=(30, 30, 30), font=font)
+    buffer = io.BytesIO()
+    image.save(buffer, "JPEG", quality=90)
+    return buffer.getvalue()
+
+async def time_pool(workers: int, pages: list, rounds: int) -> float:
+    """Returns the best wall time, in seconds, to OCR all pages with a pool of `workers` processes."""
+    # No cache, so every round really runs OCR
+    ocr = MenuOCR(workers=workers, cache=None)
+    ocr.warm_up()
+    try:
+        best = float("inf")
+        for _ in range(rounds):
+            start = time.perf_counter()
+            await ocr.extract_text(pages)
+            best = min(best, time.perf_counter() - start)
+        return best
+    finally:
+        ocr.shutdown()
+
+def main():
+    parser = argparse.ArgumentParser(description="OCR throughput of the menu OCR pool by worker count.")
+    parser.add_argument("--pages", type=int, default=8, help="Menu pages per run.")
+    parser.add_argument("--workers", default=None, help="Comma-separated pool sizes (default: 1, 2, 4, ... up to the core count).")
+    parser.add_argument("--rounds", type=int, default=3, help="Runs per pool size; the best one is reported.")
+    args = parser.parse_args()
+
+    if args.workers:
+        # A single worker is always measured; it is the baseline for the speedup
+        worker_counts = sorted({1, *[int(count) for count in args.workers.split(",")]})
+    else:
+        cores = os.cpu_count() or 1
+        worker_counts = sorted({1, cores, *[2 ** i for i in range(1, 8) if 2 ** i < cores]})
+
+    rng = random.Random(42)
+    pages = [render_menu_page(rng, page) for page in range(args.pages)]
+    print(f"{args.pages} pages, {sum(len(page) for page in pages) / len(pages) / 1024:.0f} KB each, {os.cpu_count()} cores\n")
+
+    print(f"{'workers':>7} {'seconds':>8} {'pages/s':>8} {'speedup':>8} {'efficiency':>10}")
+    for workers in worker_counts:
+        seconds = asyncio.run(time_pool(workers, pages, args.rounds))
+        if workers == 1:
+            baseline = seconds
+        speedup = baseline / seconds
+        print(f"{workers:>7} {seconds:8.2f} {args.pages / seconds:8.1f} {speedup:8.2f} {speedup / workers:10.0%}")
+
+if __name__ == "__main__":
+    main()
@@ -1,146 +1,3 @@
-# # prompts.py
-# # Define your prompt templates here
-
-# # General restaurant/menu analysis prompt
-# ANALYSIS_PROMPT = """
-# You are an expert restaurant and food critic. Your task is to analyze the provided
-# information about a restaurant or its menu and provide a comprehensive review.
-# Focus on the following aspects, providing as much detail as possible.
-
-# Your output MUST be a JSON object. Use the following structure, providing "N/A" if information
-# for a field is not available from your knowledge base.
-# Ensure all fields are present, even if empty.
-
-# Example JSON structure for output:
-# {{
-#     "restaurant_name": "Pista House",
-#     "summary": "Concise overall summary of the restaurant, explicitly mentioning its location if provided, e.g., 'Pista House, located in Hyderabad...'.",
-#     "healthiness_rating": "X/5",
-#     "hygiene_rating": "X/5",
-#     "price_rating": "X/5",
-#     "food_quality": "Detailed assessment of food quality and taste.",
-#     "dietary_options": {{
-#         "vegetarian": "Yes/No, details",
-#         "vegan": "Yes/No, details",
-#         "gluten_free": "Yes/No, details",
-#         "other_diets": "Details, or N/A"
-#     }},
-#     "ambiance": "Description of atmosphere, decor, suitability for occasions.",
-#     "private_space_for_parties": "Yes/No, details about private dining areas or party facilities.",
-#     "popular_dishes": ["Dish 1", "Dish 2", "Dish 3"],
-#     "service_experience": "General impression of service, attentiveness, staff efficiency. (e.g., Excellent, Good, Average, Poor)",
-#     "service_time": "Typical waiting/service times (e.g., Fast, Moderate, Slow, or specific minutes).",
-#     "portion_quantity": "Comment on typical portion sizes (e.g., Generous, Standard, Small).",
-#     "rush_hours": "Typical busy hours or days (e.g., Weekends evenings, Lunch weekdays).",
-#     "branches": {{
-#         "count": "Number of branches, or N/A if single location",
-#         "first_branch_location": "Location of the first/flagship branch, or N/A"
-#     }},
-#     "total_reviews": "Total number of reviews or ratings found, or N/A.",
-#     "parking_availability": "Availability of parking space or valet service (e.g., Yes, No, Limited, Valet Available)."
-# }}
-
-# Analyze the restaurant: {input}
-# {restaurant_location_context}
-# The user has requested an analysis focusing on: {analysis_type}.
-
-# If 'Overall Analysis' is selected, provide comprehensive details for all fields.
-# For other specific types (Hygiene, Cleanliness, Affordability, Healthiness), still fill out all JSON fields,
-# but make sure to emphasize details relevant to the selected analysis_type in the `summary` and specific fields.
-
-# Your JSON output:
-# """
-
-# # Prompt for analyzing a menu for a diabetic person
-# DIABETIC_ANALYSIS_PROMPT = """
-# You are a dietary expert specializing in diabetes management.
-# Analyze the provided menu information for a diabetic individual.
-# Your analysis should cover:
-
-# 1.  **Carbohydrate Content:** Identify dishes that are likely high or low in
-#     carbohydrates.
-# 2.  **Sugar Content:** Point out items that are high in added sugars (desserts,
-#     sweetened beverages).
-# 3.  **Fat Content:** Comment on dishes that might be high in unhealthy fats.
-# 4.  **Fiber Content:** Highlight options rich in fiber.
-# 5.  **Portion Control:** Advise on how to manage portions for various dishes.
-# 6.  **Recommendations:** Suggest specific menu items that would be suitable
-#     for a diabetic, and items to avoid or modify.
-
-# Provide a clear, actionable summary for a diabetic.
-# """
-
-# # Prompt for extracting structured ratings (This will be simplified later to just parse JSON)
-# RATING_EXTRACTION_PROMPT = """
-# From the following text, extract the Healthiness Rating, Hygiene Rating,
-# and Price Rating. Assign a rating on a scale of 1 to 5, where 1 is very poor
-# and 5 is excellent. If a rating cannot be determined, state "N/A".
-# Also, provide a brief overall summary based on the text.
-
-# Output format:
-# Healthiness Rating: [1-5 or N/A]
-# Hygiene Rating: [1-5 or N/A]
-# Price Rating: [1-5 or N/A]
-# Summary: [Overall summary of the restaurant/menu]
-# """
-
-# # Updated chatbot prompt for direct LLM interaction (no search tool)
-# CHATBOT_PROMPT = """
-# You are a helpful, knowledgeable, and concise AI assistant, acting like a restaurant
-# staff member (e.g., a waiter). You have been provided with an initial, detailed
-# analysis of a restaurant in a formatted, human-readable key-value pair format:
-
-# ---
-# {analysis_content}
-# ---
-
-# The user has a follow-up question. Your primary goal is to answer the question
-# briefly and accurately, drawing *only* from the provided analysis content and your
-# general knowledge about restaurants. Do NOT perform any external searches.
-
-# If the information needed to answer the question is not explicitly present in the
-# provided analysis, state clearly and politely that you cannot find that information
-# in the details you have. Your answer MUST be short and to the point, directly
-# addressing the user's question without unnecessary elaboration. Aim for 1-2 sentences.
-
-# User's Question: {question}
-
-# Your Answer:
-# """
-
-# # New prompt for Dish Recommendation
-# DISH_RECOMMENDATION_PROMPT = """
-# You are a helpful AI assistant specializing in culinary recommendations.
-# Based on the following restaurant analysis and general knowledge about restaurant cuisines,
-# suggest 3-5 popular or highly recommended dishes from this restaurant.
-# If specific dishes are not mentioned in the analysis, suggest typical popular dishes for the cuisine implied by the restaurant's name or known reputation.
-# Focus on variety and appeal.
-
-# Restaurant Analysis:
-# ---
-# {analysis_content}
-# ---
-
-# Dish Recommendations:
-# """
-
-# # New prompt for Slogan Generation
-# SLOGAN_GENERATION_PROMPT = """
-# You are a creative marketing expert. Based on the following restaurant analysis,
-# generate 3-5 catchy, concise, and attractive marketing slogans or review snippets
-# that highlight the restaurant's best aspects. Aim for positive, memorable phrases.
-
-# Restaurant Analysis:
-# ---
-# {analysis_content}
-# ---
-
-# Marketing Slogans/Review Snippets:
-# """
-
-# prompts.py
-# prompts.py
-
 # This prompt is designed to guide the AI to perform a detailed, location-specific analysis
 # and return the output in a structured JSON format.
 ANALYSIS_PROMPT = """
@@ -181,26 +38,96 @@ Now, generate the JSON response based on this request.
 """
 
 
+# Field-by-field version of the schema above, used to build reduced prompts that only ask the
+# model for the fields a request needs. Keep it in sync with ANALYSIS_PROMPT.
+ANALYSIS_FIELD_SCHEMA = {
+    "restaurant_name": "The name of the restaurant",
+    "summary": "A detailed, objective summary of the restaurant, its history, and what it's known for, specifically in the provided location.",
+    "healthiness_rating": "A rating out of 5 (e.g., '4/5').",
+    "hygiene_rating": "A rating out of 5 (e.g., '4/5').",
+    "price_rating": "A rating out of 5, where 5 is very expensive (e.g., '3/5').",
+    "food_quality": "A detailed paragraph about the quality of the food, ingredients, popular dishes, and taste.",
+    "dietary_options": {
+        "vegetarian": "Yes/No, with a brief explanation.",
+        "vegan": "Yes/No, with a brief explanation.",
+        "gluten_free": "Yes/No, with a brief explanation.",
+    },
+    "ambiance": "A description of the restaurant's atmosphere and decor.",
+    "private_space_for_parties": "Yes/No, with details if available.",
+    "popular_dishes": ["A list of 3-5 popular or must-try dishes."],
+    "service_experience": "A description of the typical customer service.",
+    "service_time": "Estimated service time (e.g., 'Fast', 'Moderate', 'Slow').",
+    "portion_quantity": "Description of portion sizes (e.g., 'Generous', 'Moderate', 'Small').",
+    "rush_hours": "Typical busy times (e.g., 'Weekday evenings, Weekend afternoons').",
+}
+
+# Fields generated by default for each analysis type. Types not listed here (e.g. 'Overall Analysis')
+# use the full ANALYSIS_PROMPT. The three ratings and the summary are always shown by the UI.
+ANALYSIS_TYPE_DEFAULT_FIELDS = {
+    "hygiene": ["restaurant_name", "summary", "healthiness_rating", "hygiene_rating", "price_rating", "ambiance", "service_experience"],
+    "cleanliness": ["restaurant_name", "summary", "healthiness_rating", "hygiene_rating", "price_rating", "ambiance", "service_experience"],
+    "affordability": ["restaurant_name", "summary", "healthiness_rating", "hygiene_rating", "price_rating", "portion_quantity", "popular_dishes"],
+    "healthiness": ["restaurant_name", "summary", "healthiness_rating", "hygiene_rating", "price_rating", "dietary_options", "food_quality", "popular_dishes"],
+}
+
+# Same instructions as ANALYSIS_PROMPT, but the schema is filled in with only the requested fields.
+# [[SCHEMA]] is replaced before the template is handed to LangChain.
+FIELD_SELECTIVE_ANALYSIS_PROMPT = """
+You are an expert restaurant reviewer AI. Your task is to analyze a given restaurant based on the user's focus
+and location. You must base your analysis on publicly available information, reviews, and articles.
+
+**CRITICAL INSTRUCTION:** You MUST format your entire response as a single, valid JSON object containing ONLY the
+fields in the schema below. Do not include any text, explanations, or markdown formatting like ```json before or after the JSON object, as your output will be directly parsed.
+
+Here is the JSON schema you must follow:
+[[SCHEMA]]
+
+---
+**USER REQUEST:**
+Restaurant Name: {input}
+Location Context: {restaurant_location_context}
+Analysis Focus: {analysis_type}
+
+Now, generate the JSON response based on this request.
+"""
+
+# Inserted into either analysis prompt when the user uploaded photos of the menu.
+# The text comes from OCR, so the model is told to expect recognition errors.
+ANALYSIS_REQUEST_END = "Now, generate the JSON response based on this request."
+MENU_CONTEXT_SECTION = """Menu (text read from photos of the restaurant's menu; it may contain OCR errors):
+{menu_text}
+
+Use the menu as the primary source for dishes, dietary options, prices and healthiness.
+
+"""
+
 # This prompt gives the chatbot a strict persona. It must only answer questions relevant
-# to the provided restaurant analysis.
+# to the provided restaurant analysis. Instructions and analysis come first and the per-turn
+# parts last, so the start of the prompt is the same on every turn of a conversation.
 CHATBOT_PROMPT = """
 You are a helpful and concise AI assistant for a restaurant analysis tool.
 Your ONLY function is to answer questions based on the restaurant analysis provided below.
 
+**YOUR INSTRUCTIONS:**
+1.  Read the user's question carefully. Use the conversation so far to understand follow-up questions (e.g. "what about vegan?").
+2.  Check if the question is related to the restaurant information provided in the CONTEXT below.
+3.  **If the question is related:** Answer it concisely using ONLY the information from the CONTEXT and the MORE DETAIL section. Do not invent new information.
+4.  **If the question is NOT related** (e.g., "hello", "what is the meaning of life?", "tell me about another restaurant"): You MUST politely decline. Respond with a message like: "I can only answer questions about the analysis of this specific restaurant. Please ask a question related to the details provided."
+5.  Keep your answers brief and to the point.
+
 **CONTEXT: RESTAURANT ANALYSIS**
 ---
 {analysis_content}
 ---
 
+**CONVERSATION SO FAR:**
+{conversation_history}
+
+**MORE DETAIL FROM THE ANALYSIS FOR THIS QUESTION:**
+{question_details}
+
 **USER'S QUESTION:**
 {question}
-
-**YOUR INSTRUCTIONS:**
-1.  Read the user's question carefully.
-2.  Check if the question is related to the restaurant information provided in the CONTEXT above.
-3.  **If the question is related:** Answer it concisely using ONLY the information from the CONTEXT. Do not invent new information.
-4.  **If the question is NOT related** (e.g., "hello", "what is the meaning of life?", "tell me about another restaurant"): You MUST politely decline. Respond with a message like: "I can only answer questions about the analysis of this specific restaurant. Please ask a question related to the details provided."
-5.  Keep your answers brief and to the point.
 """
 
 
@@ -0,0 +1,170 @@
+"""
+Offline check of the LLM scheduler against a fake provider that enforces its own RPM/TPM limits.
+
+Drives LLMScheduler in simulated time (its injectable clock and sleep) with a burst of batch
+analyses plus a steady trickle of interactive chatbot questions, all sent to a FakeChatModel whose
+FakeProviderLimits use the same clock. The same workload is then sent without the scheduler, to
+show what the provider would have rejected. Clients retry after the Retry-After they are given.
+
+Usage:
+    python scheduler_benchmark.py [--rpm 60] [--tpm 60000] [--batch 200] [--minutes 5]
+Exits non-zero if the provider rejected any scheduled call, if interactive calls waited longer
+than batch ones, or if an oversized call was not rejected up front.
+"""
+import sys
+import heapq
+import asyncio
+import argparse
+import itertools
+
+from limits import (
+    LLMScheduler, RateLimitedError, BudgetTooSmallError, estimate_tokens,
+    PRIORITY_INTERACTIVE, PRIORITY_BATCH
+)
+from fake_llm import FakeChatModel, FakeProviderLimits, FakeQuotaError
+
+OUTPUT_TOKEN_ESTIMATE = 50
+CALL_SECONDS = 2.0  # Simulated time each provider call takes
+
+class SimulatedTime:
+    """A clock and sleep for the scheduler and the fake provider; time only moves when every task waits."""
+    def __init__(self):
+        self.now = 0.0
+        self._sleepers = []  # heap of (wake time, sequence, future)
+        self._sequence = itertools.count()
+
+    def clock(self) -> float:
+        return self.now
+
+    async def sleep(self, seconds: float):
+        future = asyncio.get_running_loop().create_future()
+        # A real clock always moves on; tiny waits must too, or now + wait rounds back to now
+        step = max(seconds, 0.001) if seconds > 0 else 0.0
+        heapq.heappush(self._sleepers, (self.now + step, next(self._sequence), future))
+        await future
+
+    async def run(self, tasks: list):
+        while not all(task.done() for task in tasks):
+            for _ in range(20):
+                await asyncio.sleep(0)  # Let every runnable task get to its next wait
+            if not self._sleepers:
+                continue
+            # Jump to the next wake-up and release everyone due then
+            self.now = max(self.now, self._sleepers[0][0])
+            while self._sleepers and self._sleepers[0][0] <= self.now:
+                _, _, future = heapq.heappop(self._sleepers)
+                if not future.done():
+                    future.set_result(None)
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Simulated-time check of the LLM scheduler against a rate-limited fake provider.")
+    parser.add_argument("--rpm", type=float, default=60, help="Requests per minute, for the provider and the scheduler.")
+    parser.add_argument("--tpm", type=float, default=60000, help="Tokens per minute, for the provider and the scheduler.")
+    parser.add_argument("--batch", type=int, default=200, help="Batch analyses sent in a burst at the start.")
+    parser.add_argument("--batch-tokens", type=int, default=1500, help="Prompt tokens per batch analysis.")
+    parser.add_argument("--interactive-every", type=float, default=5.0, help="Seconds between chatbot questions.")
+    parser.add_argument("--interactive-tokens", type=int, default=400, help="Prompt tokens per chatbot question.")
+    parser.add_argument("--minutes", type=float, default=5.0, help="Simulated minutes of interactive traffic.")
+    return parser.parse_args()
+
+def percentile(values: list, q: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+async def simulate(args, scheduled: bool) -> dict:
+    sim = SimulatedTime()
+    provider = FakeProviderLimits(args.rpm, args.tpm, clock=sim.clock)
+    model = FakeChatModel(latency_ms=0, chunks_per_second=float("inf"), limits=provider)
+    scheduler = LLMScheduler(args.rpm, args.tpm, max_concurrent=8, max_queued=10_000,
+                             clock=sim.clock, sleep=sim.sleep)
+    waits = {PRIORITY_INTERACTIVE: [], PRIORITY_BATCH: []}
+    outcome = {"completed": 0, "provider_rejections": 0, "local_retries": 0, "too_large": 0}
+
+    async def call(priority: int, prompt_tokens: int, start_at: float):
+        await sim.sleep(start_at)
+        prompt = "word " * (prompt_tokens * 4 // 5)
+        estimated = estimate_tokens(prompt) + OUTPUT_TOKEN_ESTIMATE
+        arrived = sim.now
+        while True:
+            try:
+                if scheduled:
+                    async with scheduler.slot(priority, estimated):
+                        waits[priority].append(sim.now - arrived)
+                        response = await model.ainvoke(prompt)
+                        await sim.sleep(CALL_SECONDS)
+                    scheduler.record_usage(estimated, response.usage_metadata["total_tokens"])
+                else:
+                    await model.ainvoke(prompt)
+                    waits[priority].append(sim.now - arrived)
+                    await sim.sleep(CALL_SECONDS)
+                outcome["completed"] += 1
+                return
+            except RateLimitedError as e:
+                # Our own 429 (or a provider one the scheduler translated): wait as told
+                outcome["local_retries"] += 1
+                await sim.sleep(e.retry_after)
+            except BudgetTooSmallError:
+                # Could never be admitted; the client gets a clear error instead of a Retry-After
+                outcome["too_large"] += 1
+                return
+            except FakeQuotaError:
+                # Unscheduled clients only see the provider's 429, with no hint how long to wait
+                outcome["provider_rejections"] += 1
+                await sim.sleep(10)
+
+    tasks = [asyncio.ensure_future(call(PRIORITY_BATCH, args.batch_tokens, 0.0)) for _ in range(args.batch)]
+    questions = int(args.minutes * 60 / args.interactive_every)
+    tasks += [asyncio.ensure_future(call(PRIORITY_INTERACTIVE, args.interactive_tokens, i * args.interactive_every))
+              for i in range(questions)]
+    await sim.run(tasks)
+
+    oversized_rejected = False
+    if scheduled:
+        try:
+            async with scheduler.slot(PRIORITY_BATCH, int(args.tpm)):
+                pass
+        except BudgetTooSmallError:
+            oversized_rejected = True
+
+    return {
+        **outcome,
+        "provider_rejections": outcome["provider_rejections"] + provider.rejected * scheduled,
+        "simulated_seconds": sim.now,
+        "interactive_p50_wait": percentile(waits[PRIORITY_INTERACTIVE], 0.5),
+        "interactive_p95_wait": percentile(waits[PRIORITY_INTERACTIVE], 0.95),
+        "batch_p50_wait": percentile(waits[PRIORITY_BATCH], 0.5),
+        "batch_p95_wait": percentile(waits[PRIORITY_BATCH], 0.95),
+        "oversized_rejected": oversized_rejected,
+    }
+
+def main():
+    args = parse_args()
+    results = {
+        "scheduled": asyncio.run(simulate(args, scheduled=True)),
+        "unscheduled": asyncio.run(simulate(args, scheduled=False)),
+    }
+    print(f"Provider limits: {args.rpm:g} RPM, {args.tpm:g} TPM; {args.batch} batch calls at t=0, "
+          f"a chatbot question every {args.interactive_every:g}s for {args.minutes:g} min (simulated time)")
+    print(f"{'':>12} {'completed':>10} {'too big':>8} {'429s':>6} {'retries':>8} {'minutes':>8} "
+          f"{'chat p50':>9} {'chat p95':>9} {'batch p50':>10} {'batch p95':>10}")
+    for name, r in results.items():
+        print(f"{name:>12} {r['completed']:>10} {r['too_large']:>8} {r['provider_rejections']:>6} {r['local_retries']:>8} "
+              f"{r['simulated_seconds'] / 60:>8.1f} {r['interactive_p50_wait']:>8.1f}s {r['interactive_p95_wait']:>8.1f}s "
+              f"{r['batch_p50_wait']:>9.1f}s {r['batch_p95_wait']:>9.1f}s")
+
+    scheduled = results["scheduled"]
+    failures = []
+    if scheduled["provider_rejections"]:
+        failures.append(f"the provider rejected {scheduled['provider_rejections']} scheduled calls")
+    if scheduled["interactive_p95_wait"] > scheduled["batch_p50_wait"]:
+        failures.append("interactive calls waited longer than batch calls")
+    if not scheduled["oversized_rejected"]:
+        failures.append("a call larger than the budget was not rejected with BudgetTooSmallError")
+    for failure in failures:
+        print(f"FAIL: {failure}")
+    sys.exit(1 if failures else 0)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,135 @@
+"""
+Benchmark for the columnar restaurant index behind /search.
+
+Fills a RestaurantIndex with synthetic analyses (1M restaurants by default), then times a set of
+typical filter-and-rank queries against the index and against a plain scan over the analysis
+dicts, which is what answering the same question from stored JSON would cost. Dish names are
+built from a realistic vocabulary: common dishes in many variants plus a house special per
+restaurant, so the number of distinct dishes grows with the number of restaurants.
+
+Usage:
+    python search_benchmark.py [--rows 1000000] [--repeat 20] [--max-p95-ms 50]
+Exits non-zero if any query's p95 latency is above --max-p95-ms.
+"""
+import sys
+import time
+import random
+import argparse
+
+from search_index import RestaurantIndex
+
+LOCATIONS = ["Hyderabad", "Bengaluru", "Mumbai", "Delhi", "Chennai", "Pune", "Kolkata", "Jaipur"]
+DISH_STYLES = ["Hyderabadi", "Lucknowi", "Kolkata", "Malabar", "Ambur", "Dum", "Tandoori", "Achari",
+               "Kadai", "Butter", "Masala", "Chettinad", "Afghani", "Kashmiri", "Goan", "Punjabi",
+               "Spicy", "Smoked", "Special", "Royal"]
+DISH_BASES = ["Chicken", "Mutton", "Paneer", "Prawn", "Fish", "Egg", "Veg", "Mushroom", "Gobi", "Aloo",
+              "Dal", "Chana", "Keema", "Lamb", "Soya"]
+DISH_TYPES = ["Biryani", "Curry", "Tikka", "Kebab", "Korma", "Pulao", "Dosa", "Thali", "Roll", "Fry",
+              "Haleem", "Manchurian", "Pakora", "Bhuna", "Vindaloo", "Sambar", "Bhaji", "Paratha"]
+
+QUERY_DISHES = ["Mutton Haleem", "Hyderabadi Chicken Biryani"]
+
+QUERIES = {
+    "vegan_hygiene_price_in_city": dict(location="Hyderabad", diets=["vegan"], min_hygiene=4, max_price=3),
+    "healthiest_overall": dict(),
+    "cheapest_vegetarian": dict(diets=["vegetarian"], rank_by="price_rating", ascending=True),
+    "dish_in_city": dict(location="Mumbai", dish="biryani", min_healthiness=3.5),
+    "dish_broad": dict(dish="chicken"),
+    "dish_narrow": dict(dish="mutton haleem", rank_by="hygiene_rating"),
+    "dish_house_special": dict(dish="restaurant 12345 special"),
+    "gluten_free_hygiene": dict(diets=["gluten_free"], min_hygiene=4.5, rank_by="hygiene_rating"),
+}
+
+def random_dish(rng: random.Random) -> str:
+    if rng.random() < 0.05:
+        return rng.choice(QUERY_DISHES)
+    return f"{rng.choice(DISH_STYLES)} {rng.choice(DISH_BASES)} {rng.choice(DISH_TYPES)}"
+
+def synthetic_analysis(rng: random.Random, i: int) -> tuple:
+    def yes_no():
+        return "Yes, a few options." if rng.random() < 0.4 else "No"
+    analysis = {
+        "restaurant_name": f"Restaurant {i}",
+        "healthiness_rating": round(rng.uniform(1, 5), 1),
+        "hygiene_rating": round(rng.uniform(1, 5), 1),
+        "price_rating": rng.randint(1, 5),
+        "dietary_options": {"vegetarian": yes_no(), "vegan": yes_no(), "gluten_free": yes_no()},
+        "popular_dishes": [random_dish(rng), random_dish(rng), f"Restaurant {i} Special {rng.choice(DISH_TYPES)}"],
+    }
+    return analysis["restaurant_name"], rng.choice(LOCATIONS), analysis
+
+def scan(rows: list, location=None, diets=(), dish=None, min_healthiness=None, min_hygiene=None,
+         max_price=None, rank_by="healthiness_rating", ascending=False, limit=20) -> list:
+    """The same query answered by looping over analysis dicts."""
+    matches = []
+    for name, row_location, analysis in rows:
+        if location and row_location != location:
+            continue
+        if any(not analysis["dietary_options"][diet].startswith("Yes") for diet in diets):
+            continue
+        if dish and not all(word in " ".join(analysis["popular_dishes"]).lower().split() for word in dish.split()):
+            continue
+        if min_healthiness is not None and analysis["healthiness_rating"] < min_healthiness:
+            continue
+        if min_hygiene is not None and analysis["hygiene_rating"] < min_hygiene:
+            continue
+        if max_price is not None and analysis["price_rating"] > max_price:
+            continue
+        matches.append(analysis)
+    matches.sort(key=lambda a: a[rank_by], reverse=not ascending)
+    return matches[:limit]
+
+def percentile(values: list, fraction: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+def main():
+    parser = argparse.ArgumentParser(description="Query latency of the columnar search index.")
+    parser.add_argument("--rows", type=int, default=1_000_000, help="Synthetic restaurants to index.")
+    parser.add_argument("--repeat", type=int, default=20, help="Runs per query when timing.")
+    parser.add_argument("--max-p95-ms", type=float, default=50.0, help="Fail if a query's p95 exceeds this.")
+    parser.add_argument("--skip-scan", action="store_true", help="Do not time the plain scan baseline.")
+    args = parser.parse_args()
+
+    rng = random.Random(42)
+    rows = [synthetic_analysis(rng, i) for i in range(args.rows)]
+
+    index = RestaurantIndex()
+    start = time.perf_counter()
+    for name, location, analysis in rows:
+        index.add(name, location, analysis)
+    build_seconds = time.perf_counter() - start
+    distinct_dishes = len({dish for _, _, analysis in rows for dish in analysis["popular_dishes"]})
+    print(f"Indexed {len(index):,} restaurants ({distinct_dishes:,} distinct dishes) in {build_seconds:.1f}s "
+          f"({len(index) / build_seconds:,.0f} rows/s)")
+
+    # Incremental updates to existing rows
+    start = time.perf_counter()
+    for i in range(1000):
+        name, location, analysis = rows[rng.randrange(args.rows)]
+        index.add(name, location, {"hygiene_rating": rng.uniform(1, 5)})
+    print(f"In-place update: {(time.perf_counter() - start) / 1000 * 1e6:.1f} us per row\n")
+
+    failed = False
+    print(f"{'query':<30} {'hits':>5} {'p50 ms':>8} {'p95 ms':>8} {'scan ms':>9}")
+    for label, query in QUERIES.items():
+        latencies = []
+        for _ in range(args.repeat):
+            start = time.perf_counter()
+            results = index.search(**query)
+            latencies.append((time.perf_counter() - start) * 1000)
+        scan_ms = "-"
+        if not args.skip_scan:
+            start = time.perf_counter()
+            scan(rows, **query)
+            scan_ms = f"{(time.perf_counter() - start) * 1000:9.1f}"
+        p95 = percentile(latencies, 0.95)
+        failed |= p95 > args.max_p95_ms
+        print(f"{label:<30} {len(results):>5} {percentile(latencies, 0.5):8.2f} {p95:8.2f} {scan_ms:>9}")
+
+    if failed:
+        print(f"\nAt least one query has a p95 above {args.max_p95_ms:g} ms.")
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,201 @@
+import re
+import time
+import threading
+
+import numpy as np
+
+from cache import normalize_key_part
+from extraction import normalize_rating
+
+# --- Columnar Restaurant Index ---
+# Answers filter-and-rank questions ("vegan-friendly, hygiene >= 4, price <= 3 in Hyderabad,
+# ranked by healthiness") over every analysed restaurant without calling the LLM. Ratings live in
+# NumPy columns, dietary options in a bitmask column and locations in a dictionary-encoded column,
+# so filters are vectorised; the words of dish names go in an inverted index (word -> rows), so a
+# dish filter costs a few set lookups however large the dish vocabulary gets. One row per
+# (name, location); new analyses update rows in place. A lock guards the columns, so the index
+# can be synced, searched and updated from threads, keeping the work off the event loop.
+
+VEGETARIAN = 1
+VEGAN = 2
+GLUTEN_FREE = 4
+DIET_FLAGS = {"vegetarian": VEGETARIAN, "vegan": VEGAN, "gluten_free": GLUTEN_FREE}
+
+RATING_COLUMNS = ("healthiness_rating", "hygiene_rating", "price_rating")
+NO_LOCATION = -1
+
+_WORD_PATTERN = re.compile(r"\w+")
+
+def _says_yes(value) -> bool:
+    return isinstance(value, str) and value.strip().lower().startswith("yes")
+
+def _dish_words(text: str) -> set:
+    return set(_WORD_PATTERN.findall(normalize_key_part(text)))
+
+class RestaurantIndex:
+    def __init__(self, initial_capacity: int = 1024):
+        self._size = 0
+        self._capacity = initial_capacity
+        self._ratings = {column: np.full(initial_capacity, np.nan, dtype=np.float32) for column in RATING_COLUMNS}
+        self._diets = np.zeros(initial_capacity, dtype=np.uint8)
+        self._locations = np.full(initial_capacity, NO_LOCATION, dtype=np.int32)
+        self._names = []                 # display name per row
+        self._location_names = []        # location id -> normalised location
+        self._location_ids = {}          # normalised location -> location id
+        self._rows = {}                  # (name, location) key -> row
+        self._word_rows = {}             # word of a dish name -> set of rows
+        self._row_dishes = []            # row -> set of normalised dishes
+        self._row_words = []             # row -> set of words in its dishes
+        self.synced_at = 0.0             # created_at of the newest stored analysis seen
+        self.last_sync_time = 0.0
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return self._size
+
+    def _grow(self):
+        self._capacity *= 2
+        for column, values in self._ratings.items():
+            grown = np.full(self._capacity, np.nan, dtype=np.float32)
+            grown[:self._size] = values[:self._size]
+            self._ratings[column] = grown
+        diets = np.zeros(self._capacity, dtype=np.uint8)
+        diets[:self._size] = self._diets[:self._size]
+        self._diets = diets
+        locations = np.full(self._capacity, NO_LOCATION, dtype=np.int32)
+        locations[:self._size] = self._locations[:self._size]
+        self._locations = locations
+
+    def _location_id(self, location: str) -> int:
+        if not location:
+            return NO_LOCATION
+        location_id = self._location_ids.get(location)
+        if location_id is None:
+            location_id = self._location_ids[location] = len(self._location_names)
+            self._location_names.append(location)
+        return location_id
+
+    def add(self, restaurant_name: str, restaurant_location: str | None, analysis: dict):
+        """
+        Inserts or updates the row for a restaurant. Only fields present in `analysis` are
+        changed, so partial (field-selective) analyses can be merged in.
+        """
+        with self._lock:
+            self._add(restaurant_name, restaurant_location, analysis)
+
+    def _add(self, restaurant_name: str, restaurant_location: str | None, analysis: dict):
+        key = (normalize_key_part(restaurant_name), normalize_key_part(restaurant_location))
+        row = self._rows.get(key)
+        if row is None:
+            if self._size == self._capacity:
+                self._grow()
+            row = self._rows[key] = self._size
+            self._size += 1
+            self._names.append(restaurant_name)
+            self._row_dishes.append(set())
+            self._row_words.append(set())
+            self._locations[row] = self._location_id(key[1])
+
+        if analysis.get("restaurant_name"):
+            self._names[row] = analysis["restaurant_name"]
+        for column in RATING_COLUMNS:
+            if column in analysis:
+                rating = normalize_rating(analysis[column])
+                self._ratings[column][row] = np.nan if rating is None else rating
+        dietary_options = analysis.get("dietary_options")
+        if isinstance(dietary_options, dict):
+            mask = 0
+            for diet, flag in DIET_FLAGS.items():
+                if _says_yes(dietary_options.get(diet)):
+                    mask |= flag
+            self._diets[row] = mask
+        if isinstance(analysis.get("popular_dishes"), list):
+            self._set_dishes(row, {normalize_key_part(str(dish)) for dish in analysis["popular_dishes"] if dish})
+
+    def _set_dishes(self, row: int, dishes: set):
+        words = set().union(*(_dish_words(dish) for dish in dishes))
+        for word in self._row_words[row] - words:
+            self._word_rows[word].discard(row)
+            if not self._word_rows[word]:
+                del self._word_rows[word]
+        for word in words - self._row_words[row]:
+            self._word_rows.setdefault(word, set()).add(row)
+        self._row_dishes[row] = dishes
+        self._row_words[row] = words
+
+    def sync(self, store):
+        """Adds analyses written to the shared store (by any worker) since the last sync."""
+        rows = list(store.iter_analyses(since=self.synced_at))
+        for name, location, analysis, created_at in rows:
+            with self._lock:
+                self._add(name, location, analysis)
+                self.synced_at = max(self.synced_at, created_at)
+        self.last_sync_time = time.time()
+
+    def search(self, location: str | None = None, diets: list | None = None, dish: str | None = None,
+               min_healthiness: float | None = None, min_hygiene: float | None = None,
+               max_price: float | None = None, rank_by: str = "healthiness_rating",
+               ascending: bool = False, limit: int = 20) -> list:
+        """Returns up to `limit` matching restaurants, best first by `rank_by`."""
+        with self._lock:
+            return self._search(location, diets, dish, min_healthiness, min_hygiene, max_price, rank_by, ascending, limit)
+
+    def _search(self, location, diets, dish, min_healthiness, min_hygiene, max_price, rank_by, ascending, limit) -> list:
+        size = self._size
+        mask = np.ones(size, dtype=bool)
+
+        if location:
+            location_id = self._location_ids.get(normalize_key_part(location))
+            if location_id is None:
+                return []
+            mask &= self._locations[:size] == location_id
+        if diets:
+            required = 0
+            for diet in diets:
+                required |= DIET_FLAGS[diet]
+            mask &= (self._diets[:size] & required) == required
+        if min_healthiness is not None:
+            mask &= self._ratings["healthiness_rating"][:size] >= min_healthiness
+        if min_hygiene is not None:
+            mask &= self._ratings["hygiene_rating"][:size] >= min_hygiene
+        if max_price is not None:
+            mask &= self._ratings["price_rating"][:size] <= max_price
+        words = _dish_words(dish) if dish else set()
+        if words:
+            # Restaurants whose popular dishes mention every word, e.g. "biryani" finds "chicken biryani"
+            row_sets = sorted((self._word_rows.get(word, set()) for word in words), key=len)
+            rows = set.intersection(*row_sets)
+            if not rows:
+                return []
+            dish_mask = np.zeros(size, dtype=bool)
+            dish_mask[np.fromiter(rows, dtype=np.int64, count=len(rows))] = True
+            mask &= dish_mask
+
+        candidates = np.flatnonzero(mask)
+        if len(candidates) == 0:
+            return []
+        scores = self._ratings[rank_by][candidates].astype(np.float64)
+        # Higher score ranks first; unknown ratings always sort last
+        scores = np.where(np.isnan(scores), -np.inf, -scores if ascending else scores)
+        if len(candidates) > limit:
+            top = np.argpartition(-scores, limit - 1)[:limit]
+        else:
+            top = np.arange(len(candidates))
+        top = top[np.argsort(-scores[top], kind="stable")]
+        return [self._row_summary(int(row)) for row in candidates[top]]
+
+    def _row_summary(self, row: int) -> dict:
+        location_id = int(self._locations[row])
+        summary = {
+            "restaurant_name": self._names[row],
+            "location": self._location_names[location_id] if location_id != NO_LOCATION else None,
+        }
+        for column in RATING_COLUMNS:
+            value = float(self._ratings[column][row])
+            summary[column] = None if np.isnan(value) else round(value, 1)
+        summary["dietary_options"] = {diet: bool(self._diets[row] & flag) for diet, flag in DIET_FLAGS.items()}
+        summary["popular_dishes"] = sorted(self._row_dishes[row])
+        return summary
+
+# Shared index for this worker, filled from the analysis store on first search
+restaurant_index = RestaurantIndex()
@@ -0,0 +1,102 @@
+import os
+import json
+import time
+import asyncio
+import hashlib
+from collections import OrderedDict
+
+from chains import format_analysis_data_for_chatbot
+from store import analysis_store
+from metrics import timed_stage
+from conversation import select_context_fields, render_context, question_details
+
+# --- Analysis Sessions ---
+# /analyze hands out an analysis_id so follow-up endpoints (chatbot, dish recommendations,
+# slogans) can refer to the analysis instead of re-sending the whole JSON. Each session keeps
+# the parsed analysis and its pre-rendered chatbot context, so that formatting happens once
+# per analysis rather than once per question. Sessions live in a bounded, expiring in-memory
+# map and are mirrored to the shared store so any worker can resume them.
+
+def make_analysis_id(analysis: dict) -> str:
+    """Derives a stable id from the analysis content, so identical analyses share a session."""
+    canonical = json.dumps(analysis, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()[:32]
+
+class AnalysisSession:
+    __slots__ = ("analysis_id", "analysis", "context", "expires_at", "_chatbot_fields", "_chatbot_context")
+
+    def __init__(self, analysis_id: str, analysis: dict, expires_at: float):
+        self.analysis_id = analysis_id
+        self.analysis = analysis
+        with timed_stage("context_format"):
+            self.context = format_analysis_data_for_chatbot(analysis)
+        self.expires_at = expires_at
+        self._chatbot_fields = None   # (field, brief) pairs shown in the compact context
+        self._chatbot_context = None  # Rendered on the first chatbot question
+
+    def chatbot_context(self) -> str:
+        """
+        Returns the compact, token-budgeted analysis context for the chatbot. It is rendered once
+        and is the same for every question, so every turn sends the same prompt prefix.
+        """
+        if self._chatbot_context is None:
+            with timed_stage("context_format"):
+                self._chatbot_fields = select_context_fields(self.analysis)
+                self._chatbot_context = render_context(self.analysis, self._chatbot_fields)
+        return self._chatbot_context
+
+    def chatbot_details(self, question: str) -> str:
+        """Returns full text for fields the question is about that the compact context shortened."""
+        self.chatbot_context()
+        return question_details(self.analysis, self._chatbot_fields, question)
+
+class AnalysisSessionStore:
+    def __init__(self, max_sessions: int = 4096, ttl_seconds: float = 6 * 3600):
+        self.max_sessions = max_sessions
+        self.ttl_seconds = ttl_seconds
+        self._sessions = OrderedDict()  # analysis_id -> AnalysisSession
+
+    async def create(self, analysis: dict) -> AnalysisSession:
+        """Returns the session for this analysis, creating it (or extending its expiry) as needed."""
+        analysis_id = make_analysis_id(analysis)
+        expires_at = time.time() + self.ttl_seconds
+        session = self._sessions.get(analysis_id)
+        if session is None:
+            session = AnalysisSession(analysis_id, analysis, expires_at)
+            await asyncio.to_thread(analysis_store.put_session, analysis_id, analysis, expires_at)
+        else:
+            session.expires_at = expires_at
+        self._remember(session)
+        return session
+
+    async def get(self, analysis_id: str) -> AnalysisSession | None:
+        """Looks a session up in this worker first, then in the shared store."""
+        session = self._sessions.get(analysis_id)
+        if session is not None:
+            if session.expires_at > time.time():
+                self._sessions.move_to_end(analysis_id)
+                return session
+            del self._sessions[analysis_id]
+
+        stored = await asyncio.to_thread(analysis_store.get_session, analysis_id)
+        if stored is None:
+            return None
+        analysis, expires_at = stored
+        session = AnalysisSession(analysis_id, analysis, expires_at)
+        self._remember(session)
+        return session
+
+    def _remember(self, session: AnalysisSession):
+        self._sessions[session.analysis_id] = session
+        self._sessions.move_to_end(session.analysis_id)
+        while len(self._sessions) > self.max_sessions:
+            self._sessions.popitem(last=False)
+
+    def __len__(self) -> int:
+        return len(self._sessions)
+
+# Shared session map for this worker
+analysis_sessions = AnalysisSessionStore(
+    max_sessions=int(os.getenv("ANALYSIS_SESSION_MAX_ENTRIES", "4096")),
+    ttl_seconds=float(os.getenv("ANALYSIS_SESSION_TTL_SECONDS", str(6 * 3600))),
+)
@@ -0,0 +1,111 @@
+"""
+Startup benchmark for a single worker.
+
+Starts fresh interpreters that import the app, run its startup warm-up and send a first /analyze
+request against the fake chat model, and reports the median import time, time until /ready
+returns 200 and time until the first successful request. It also checks that importing the app
+did not pull in LangChain or the provider SDK. Results can be saved as a baseline and compared
+on later runs.
+
+Usage:
+    python startup_benchmark.py --runs 5 --output startup_baseline.json
+    python startup_benchmark.py --compare startup_baseline.json
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import statistics
+import subprocess
+import tempfile
+
+# Run in a fresh interpreter so nothing is imported or cached beforehand
+CHILD_SCRIPT = """
+import sys, json, time
+started = time.perf_counter()
+import main
+imported = time.perf_counter()
+heavy_modules = sorted(name for name in ("langchain_core", "langchain_google_genai") if name in sys.modules)
+client_import_start = time.perf_counter()
+from fastapi.testclient import TestClient
+# The test client's own import is not part of the app's startup
+offset = time.perf_counter() - client_import_start
+with TestClient(main.app) as client:
+    while client.get("/ready").status_code != 200:
+        time.sleep(0.005)
+    ready = time.perf_counter()
+    response = client.post("/analyze", json={"restaurant_name": "Startup Bench", "analysis_type": "Overall Analysis"})
+    response.raise_for_status()
+    first_success = time.perf_counter()
+    warmup = client.get("/ready").json()
+print(json.dumps({
+    "import_s": imported - started,
+    "ready_s": ready - started - offset,
+    "first_success_s": first_success - started - offset,
+    "warmup_s": warmup["warmup_seconds"],
+    "heavy_modules_at_import": heavy_modules,
+}))
+"""
+
+METRICS = ["import_s", "warmup_s", "ready_s", "first_success_s"]
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Worker cold-start benchmark for the restaurant analyser backend.")
+    parser.add_argument("--runs", type=int, default=5, help="Fresh interpreters to start.")
+    parser.add_argument("--latency-ms", type=float, default=200.0, help="Fake LLM latency for the first request.")
+    parser.add_argument("--output", help="Write results to this JSON file.")
+    parser.add_argument("--compare", help="Compare results with a previous JSON baseline.")
+    parser.add_argument("--threshold", type=float, default=0.2, help="Allowed relative regression (0.2 = 20%%).")
+    return parser.parse_args()
+
+def run_once(latency_ms: float) -> dict:
+    env = {
+        **os.environ,
+        "LLM_PROVIDER": "fake",
+        "FAKE_LLM_LATENCY_MS": str(latency_ms),
+        "ANALYSIS_STORE_PATH": os.path.join(tempfile.mkdtemp(), "startup_store.db"),
+    }
+    result = subprocess.run(
+        [sys.executable, "-c", CHILD_SCRIPT], env=env, cwd=os.path.dirname(os.path.abspath(__file__)),
+        capture_output=True, text=True, check=True,
+    )
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+def main():
+    args = parse_args()
+    runs = [run_once(args.latency_ms) for _ in range(args.runs)]
+    results = {metric: statistics.median(run[metric] for run in runs) for metric in METRICS}
+    heavy_modules = sorted({name for run in runs for name in run["heavy_modules_at_import"]})
+
+    for metric in METRICS:
+        print(f"{metric:<16} {results[metric] * 1000:8.1f} ms (median of {args.runs})")
+    print(f"Provider modules loaded at import: {', '.join(heavy_modules) or 'none'}")
+
+    report = {
+        "created_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "config": {key: value for key, value in vars(args).items() if key not in ("output", "compare")},
+        "results": results,
+    }
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"Results written to {args.output}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f).get("results", {})
+        regressions = [
+            f"{metric}: {baseline[metric] * 1000:.1f} -> {results[metric] * 1000:.1f} ms"
+            for metric in METRICS
+            if metric in baseline and results[metric] > baseline[metric] * (1 + args.threshold)
+        ]
+        if regressions:
+            print("Regressions against baseline:")
+            for line in regressions:
+                print(f"  {line}")
+            sys.exit(1)
+        print("No regressions against baseline.")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,261 @@
+import os
+import sys
+import json
+import time
+import sqlite3
+import threading
+
+# --- Persistent Analysis Store ---
+# A small SQLite database (in WAL mode) that keeps parsed /analyze results on disk, so they
+# survive restarts and are shared by every gunicorn worker on the node. Each worker opens its
+# own connection; WAL lets readers and a writer work concurrently.
+# Calls block on SQLite (up to the busy timeout while another process holds the write lock), so
+# async code runs them with asyncio.to_thread. Each worker prunes expired rows every
+# STORE_PRUNE_INTERVAL_SECONDS; reclaiming disk space is left to a cron job running
+# `python store.py compact` off-peak, since its VACUUM locks the database while it runs.
+
+SCHEMA_VERSION = 4
+
+_ANALYSES_TABLE = """
+CREATE TABLE IF NOT EXISTS analyses (
+    restaurant_name TEXT NOT NULL,
+    restaurant_location TEXT NOT NULL,
+    analysis_type TEXT NOT NULL,
+    analysis_json TEXT NOT NULL,
+    created_at REAL NOT NULL,
+    expires_at REAL NOT NULL,
+    PRIMARY KEY (restaurant_name, restaurant_location, analysis_type)
+);
+CREATE INDEX IF NOT EXISTS idx_analyses_expires_at ON analyses (expires_at);
+"""
+
+_SESSIONS_TABLE = """
+CREATE TABLE IF NOT EXISTS analysis_sessions (
+    analysis_id TEXT PRIMARY KEY,
+    analysis_json TEXT NOT NULL,
+    expires_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_analysis_sessions_expires_at ON analysis_sessions (expires_at);
+"""
+
+# Schema changes, applied in order from the version a database is at. Steps only add tables,
+# so stored analyses survive a redeploy; a step drops tables only when the format of the
+# stored analysis JSON itself changes.
+_MIGRATIONS = {
+    1: _ANALYSES_TABLE,
+    2: _SESSIONS_TABLE,
+    # Ratings became numbers instead of "3/5" strings. Stored analyses are only a cache of LLM output,
+    # and sessions are short-lived, so both are cleared rather than converted
+    3: "DROP TABLE IF EXISTS analyses; DROP TABLE IF EXISTS analysis_sessions;" + _ANALYSES_TABLE + _SESSIONS_TABLE,
+    4: """
+CREATE TABLE IF NOT EXISTS chatbot_conversations (
+    conversation_id TEXT PRIMARY KEY,
+    conversation_json TEXT NOT NULL,
+    expires_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_chatbot_conversations_expires_at ON chatbot_conversations (expires_at);
+""",
+}
+
+class AnalysisStore:
+    def __init__(self, path: str, ttl_seconds: float = 7 * 24 * 3600):
+        self.path = path
+        self.ttl_seconds = ttl_seconds
+        self._lock = threading.Lock()
+        # isolation_level=None puts the connection in autocommit mode; we manage transactions ourselves
+        self._conn = sqlite3.connect(path, timeout=30, isolation_level=None, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute("PRAGMA busy_timeout=30000")
+        self._migrate()
+
+    def _migrate(self):
+        """Brings the schema up to SCHEMA_VERSION by applying the missing _MIGRATIONS steps."""
+        with self._lock:
+            version = self._conn.execute("PRAGMA user_version").fetchone()[0]
+            if version >= SCHEMA_VERSION:
+                return
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                # Re-check inside the write lock in case another worker migrated first
+                version = self._conn.execute("PRAGMA user_version").fetchone()[0]
+                for step in range(version + 1, SCHEMA_VERSION + 1):
+                    for statement in _MIGRATIONS[step].strip().split(";"):
+                        if statement.strip():
+                            self._conn.execute(statement)
+                if version < SCHEMA_VERSION:
+                    print(f"[{time.ctime()}] Migrated analysis store from schema version {version} to {SCHEMA_VERSION}.")
+                    self._conn.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+
+    def get(self, key: tuple) -> dict | None:
+        """Returns the stored analysis for a normalised key, or None if missing or expired."""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT analysis_json FROM analyses WHERE restaurant_name = ? AND restaurant_location = ? "
+                "AND analysis_type = ? AND expires_at > ?",
+                (*key, time.time()),
+            ).fetchone()
+        if row is None:
+            return None
+        return json.loads(row[0])
+
+    def put(self, key: tuple, analysis: dict, ttl_seconds: float | None = None):
+        now = time.time()
+        ttl = self.ttl_seconds if ttl_seconds is None else ttl_seconds
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO analyses VALUES (?, ?, ?, ?, ?, ?)",
+                (*key, json.dumps(analysis), now, now + ttl),
+            )
+
+    def delete(self, key: tuple):
+        with self._lock:
+            self._conn.execute(
+                "DELETE FROM analyses WHERE restaurant_name = ? AND restaurant_location = ? AND analysis_type = ?",
+                key,
+            )
+
+    def put_session(self, analysis_id: str, analysis: dict, expires_at: float):
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO analysis_sessions VALUES (?, ?, ?)",
+                (analysis_id, json.dumps(analysis), expires_at),
+            )
+
+    def get_session(self, analysis_id: str) -> tuple | None:
+        """Returns (analysis, expires_at) for a live session, or None."""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT analysis_json, expires_at FROM analysis_sessions WHERE analysis_id = ? AND expires_at > ?",
+                (analysis_id, time.time()),
+            ).fetchone()
+        if row is None:
+            return None
+        return json.loads(row[0]), row[1]
+
+    def put_conversation(self, conversation_id: str, conversation: dict, expires_at: float):
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO chatbot_conversations VALUES (?, ?, ?)",
+                (conversation_id, json.dumps(conversation), expires_at),
+            )
+
+    def get_conversation(self, conversation_id: str) -> dict | None:
+        """Returns a live chatbot conversation's state, or None."""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT conversation_json FROM chatbot_conversations WHERE conversation_id = ? AND expires_at > ?",
+                (conversation_id, time.time()),
+            ).fetchone()
+        if row is None:
+            return None
+        return json.loads(row[0])
+
+    def prune_expired(self) -> int:
+        """Deletes expired analyses, sessions and conversations. Returns rows removed."""
+        with self._lock:
+            now = time.time()
+            removed = self._conn.execute("DELETE FROM analyses WHERE expires_at <= ?", (now,)).rowcount
+            removed += self._conn.execute("DELETE FROM analysis_sessions WHERE expires_at <= ?", (now,)).rowcount
+            removed += self._conn.execute("DELETE FROM chatbot_conversations WHERE expires_at <= ?", (now,)).rowcount
+        return removed
+
+    def compact(self) -> int:
+        """Deletes expired rows, checkpoints the WAL and reclaims free pages. Returns rows removed."""
+        removed = self.prune_expired()
+        with self._lock:
+            self._conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+            self._conn.execute("VACUUM")
+        return removed
+
+    def count(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM analyses WHERE expires_at > ?", (time.time(),)).fetchone()[0]
+
+    def iter_analyses(self, since: float = 0.0):
+        """Yields (name, location, analysis, created_at) for live entries written at or after `since`, oldest first."""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT restaurant_name, restaurant_location, analysis_json, created_at FROM analyses "
+                "WHERE created_at >= ? AND expires_at > ? ORDER BY created_at",
+                (since, time.time()),
+            ).fetchall()
+        for name, location, analysis_json, created_at in rows:
+            yield name, location, json.loads(analysis_json), created_at
+
+    def recent(self, limit: int) -> list:
+        """Returns (key, analysis) for the `limit` most recently written live entries."""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT restaurant_name, restaurant_location, analysis_type, analysis_json FROM analyses "
+                "WHERE expires_at > ? ORDER BY created_at DESC LIMIT ?",
+                (time.time(), limit),
+            ).fetchall()
+        return [((name, location, analysis_type), json.loads(analysis_json)) for name, location, analysis_type, analysis_json in rows]
+
+    def export_snapshot(self, path: str) -> int:
+        """Writes every live entry to a JSON Lines file. Returns the number of entries written."""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT restaurant_name, restaurant_location, analysis_type, analysis_json, created_at, expires_at "
+                "FROM analyses WHERE expires_at > ?",
+                (time.time(),),
+            ).fetchall()
+        with open(path, "w", encoding="utf-8") as f:
+            for name, location, analysis_type, analysis_json, created_at, expires_at in rows:
+                f.write(json.dumps({
+                    "key": [name, location, analysis_type],
+                    "analysis": json.loads(analysis_json),
+                    "created_at": created_at,
+                    "expires_at": expires_at,
+                }) + "\n")
+        return len(rows)
+
+    def import_snapshot(self, path: str) -> int:
+        """Loads entries from a JSON Lines snapshot, skipping ones that already expired."""
+        now = time.time()
+        rows = []
+        with open(path, encoding="utf-8") as f:
+            for line in f:
+                if not line.strip():
+                    continue
+                item = json.loads(line)
+                if item["expires_at"] <= now:
+                    continue
+                rows.append((*item["key"], json.dumps(item["analysis"]), item["created_at"], item["expires_at"]))
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                self._conn.executemany("INSERT OR REPLACE INTO analyses VALUES (?, ?, ?, ?, ?, ?)", rows)
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+        return len(rows)
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+# Shared store for this worker; every worker opens the same database file
+analysis_store = AnalysisStore(
+    os.getenv("ANALYSIS_STORE_PATH", os.path.join(os.path.dirname(os.path.abspath(__file__)), "analysis_store.db")),
+    ttl_seconds=float(os.getenv("ANALYSIS_STORE_TTL_SECONDS", str(7 * 24 * 3600))),
+)
+
+if __name__ == "__main__":
+    # Usage: python store.py export|import|compact [snapshot.jsonl]
+    command = sys.argv[1] if len(sys.argv) > 1 else ""
+    if command == "export":
+        print(f"Exported {analysis_store.export_snapshot(sys.argv[2])} analyses.")
+    elif command == "import":
+        print(f"Imported {analysis_store.import_snapshot(sys.argv[2])} analyses.")
+    elif command == "compact":
+        print(f"Removed {analysis_store.compact()} expired rows.")
+    else:
+        print("Usage: python store.py export|import|compact [snapshot.jsonl]")
+        sys.exit(1)
@@ -0,0 +1,88 @@
+import json
+
+# --- Incremental JSON Field Parser ---
+# Consumes the LLM's token stream chunk by chunk and reports each top-level field of the
+# analysis object as soon as its value is complete, so it can be sent to the client right
+# away instead of waiting for the whole response.
+
+class IncrementalJSONFieldParser:
+    def __init__(self):
+        self._buffer = ""
+        self._pos = 0
+        self._depth = 0
+        self._in_string = False
+        self._escape = False
+        self._started = False
+        self._finished = False
+        self._current_key = None
+        self._string_start = None
+        self._value_start = None
+
+    @property
+    def finished(self) -> bool:
+        """True once the closing brace of the top-level object has been seen."""
+        return self._finished
+
+    def feed(self, chunk: str) -> list:
+        """Adds a chunk of text and returns a list of (field, value) pairs completed by it."""
+        completed = []
+        self._buffer += chunk
+        buffer = self._buffer
+
+        while self._pos < len(buffer) and not self._finished:
+            char = buffer[self._pos]
+
+            if not self._started:
+                # Skip anything before the object, e.g. a ```json fence
+                if char == "{":
+                    self._started = True
+                    self._depth = 1
+                self._pos += 1
+                continue
+
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif char == "\\":
+                    self._escape = True
+                elif char == '"':
+                    self._in_string = False
+                    if self._depth == 1 and self._value_start is None:
+                        # A string at the top level that is not a value is a key
+                        self._current_key = json.loads(buffer[self._string_start:self._pos + 1])
+                self._pos += 1
+                continue
+
+            if char == '"':
+                self._in_string = True
+                self._string_start = self._pos
+            elif char in "{[":
+                self._depth += 1
+            elif char in "}]":
+                self._depth -= 1
+                if self._depth == 0:
+                    self._emit(buffer[:self._pos], completed)
+                    self._finished = True
+            elif char == ":" and self._depth == 1:
+                self._value_start = self._pos + 1
+            elif char == "," and self._depth == 1:
+                self._emit(buffer[:self._pos], completed)
+            self._pos += 1
+
+        return completed
+
+    def _emit(self, buffer: str, completed: list):
+        if self._current_key is not None and self._value_start is not None:
+            raw_value = buffer[self._value_start:].strip()
+            if raw_value:
+                try:
+                    completed.append((self._current_key, json.loads(raw_value)))
+                except ValueError:
+                    # Malformed value (e.g. single quotes); the final repaired parse will still include it
+                    pass
+        self._current_key = None
+        self._value_start = None
+
+def format_sse(event: str, data) -> str:
+    """Formats a single Server-Sent Event with a JSON payload."""
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
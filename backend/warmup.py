@@ -0,0 +1,94 @@
+import os
+import time
+import asyncio
+
+from chains import warm_up_chains, aping_llm
+from cache import analysis_cache
+from store import analysis_store
+from search_index import restaurant_index
+from ocr import menu_ocr
+
+# --- Startup Warm-Up ---
+# Runs once when a worker starts: builds the LLM chains (which is when LangChain and the provider
+# SDK are first imported), optionally opens the provider connection, and loads recent analyses
+# into the in-memory cache and search index. /ready returns 503 until it has finished, so a load
+# balancer only routes traffic to warm workers. Blocking steps (imports, client construction,
+# SQLite reads) run in threads, so requests that arrive during warm-up are not stalled.
+
+WARMUP_BLOCKING = os.getenv("WARMUP_BLOCKING", "0") == "1"        # Finish warm-up before accepting connections
+WARMUP_LLM_PING = os.getenv("WARMUP_LLM_PING", "0") == "1"        # One real (billed) call to open the connection
+WARMUP_PRELOAD_ANALYSES = int(os.getenv("WARMUP_PRELOAD_ANALYSES", "256"))
+WARMUP_OCR_POOL = os.getenv("WARMUP_OCR_POOL", "0") == "1"        # Start the OCR processes up front
+WARMUP_PING_TIMEOUT_SECONDS = float(os.getenv("WARMUP_PING_TIMEOUT_SECONDS", "10"))
+
+class StartupWarmup:
+    def __init__(self):
+        self.started = time.perf_counter()  # Replaced by imports_done() with the app's own start time
+        self.import_seconds = None
+        self.ready = False
+        self.warmup_seconds = None
+        self.first_success_seconds = None
+        self.steps = {}
+
+    def imports_done(self, started: float):
+        """Records how long importing the app took, given the perf_counter() value when it began."""
+        self.started = started
+        self.import_seconds = time.perf_counter() - started
+
+    def record_success(self):
+        """Notes the first successful request after startup."""
+        if self.first_success_seconds is None:
+            self.first_success_seconds = time.perf_counter() - self.started
+
+    async def _step(self, name: str, action, required: bool = True) -> bool:
+        start = time.perf_counter()
+        try:
+            result = action()
+            if asyncio.iscoroutine(result):
+                result = await result
+            self.steps[name] = {"ok": True, "seconds": round(time.perf_counter() - start, 4), "result": result}
+            return True
+        except Exception as e:
+            print(f"[{time.ctime()}] Warm-up step '{name}' failed: {e}")
+            self.steps[name] = {"ok": False, "seconds": round(time.perf_counter() - start, 4), "error": str(e)}
+            return not required
+
+    async def _preload_cache(self) -> int:
+        entries = await asyncio.to_thread(analysis_store.recent, WARMUP_PRELOAD_ANALYSES)
+        # Oldest first, so the most recent entries end up most recently used in the LRU
+        for key, analysis in reversed(entries):
+            analysis_cache.set(key, analysis)
+        return len(entries)
+
+    def _sync_index(self) -> int:
+        restaurant_index.sync(analysis_store)
+        return len(restaurant_index)
+
+    async def run(self):
+        start = time.perf_counter()
+        # The chain registry is lock-protected, so requests can build chains at the same time
+        ok = await self._step("chains", lambda: asyncio.to_thread(warm_up_chains))
+        if WARMUP_LLM_PING:
+            ok &= await self._step("llm_connection", lambda: asyncio.wait_for(aping_llm(), WARMUP_PING_TIMEOUT_SECONDS), required=False)
+        ok &= await self._step("analysis_store", lambda: asyncio.to_thread(analysis_store.count))
+        # Only the store read is threaded; the cache itself is only touched from the event loop
+        await self._step("analysis_cache", self._preload_cache, required=False)
+        # RestaurantIndex locks around updates, so request handlers can add rows meanwhile
+        await self._step("search_index", lambda: asyncio.to_thread(self._sync_index), required=False)
+        if WARMUP_OCR_POOL:
+            await self._step("ocr_pool", lambda: asyncio.to_thread(menu_ocr.warm_up), required=False)
+        self.warmup_seconds = time.perf_counter() - start
+        self.ready = ok
+        print(f"[{time.ctime()}] Warm-up finished in {self.warmup_seconds:.2f} seconds; ready: {ok}.")
+
+    def status(self) -> dict:
+        return {
+            "ready": self.ready,
+            "import_seconds": self.import_seconds,
+            "warmup_seconds": self.warmup_seconds,
+            "first_success_seconds": self.first_success_seconds,
+            "steps": self.steps,
+        }
+
+# Warm-up state for this worker
+startup_warmup = StartupWarmup()